@@ -0,0 +1,65 @@
+# Benchmark of the batch mode against one gatorLibrary.py invocation per file
+# Generates a set of small branch command files, runs them one process at a time and then as one batch in a
+# process pool, and checks that both runs write the same output files.
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from workloadGenerator import generate_commands
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "gatorLibrary.py")
+
+
+def write_files(directory, files, books, commands):
+    filenames = []
+    for index in range(files):
+        filename = os.path.join(directory, f"branch{index}.txt")
+        with open(filename, "w") as file:
+            file.writelines(line + "\n" for line in generate_commands(books, commands, seed=index))
+        filenames.append(filename)
+    return filenames
+
+
+def read_outputs(filenames):
+    outputs = []
+    for filename in filenames:
+        with open(os.path.splitext(filename)[0] + "_output_file.txt") as file:
+            outputs.append(file.read())
+    return outputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare one process per input file with the batch mode")
+    parser.add_argument("--files", type=int, default=100, help="number of branch command files")
+    parser.add_argument("--books", type=int, default=500, help="number of books loaded by each file")
+    parser.add_argument("--commands", type=int, default=2000, help="number of commands after the load")
+    parser.add_argument("--workers", type=int, help="worker processes of the batch (default: one per CPU)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        filenames = write_files(directory, args.files, args.books, args.commands)
+
+        start = time.perf_counter()
+        for filename in filenames:
+            subprocess.run([sys.executable, SCRIPT, filename], check=True)
+        single = time.perf_counter() - start
+        expected = read_outputs(filenames)
+
+        command = [sys.executable, SCRIPT, *filenames]
+        if args.workers is not None:
+            command += ["--workers", str(args.workers)]
+        start = time.perf_counter()
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+        batch = time.perf_counter() - start
+        if read_outputs(filenames) != expected:
+            raise SystemExit("the batch wrote different output files")
+
+    print(f"{args.files} files: one process per file {single:.2f}s, batch {batch:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
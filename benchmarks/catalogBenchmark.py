@@ -0,0 +1,52 @@
+# Benchmark of the catalog engines on generated command workloads
+# Each workload runs through run_commands on every engine, and the outputs are checked to be the same
+# apart from ColorFlipCount, which only the red-black engines count.
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gatorLibrary import Library_System, TREE_ENGINES, run_commands
+from workloadGenerator import DEFAULT_MIX, DISTRIBUTIONS, generate_commands
+
+# Command mix with a larger share of range and order statistic queries
+RANGE_MIX = {"InsertBook": 20, "DeleteBook": 10, "PrintBooks": 20, "CountBooks": 20, "FindClosestBook": 20,
+             "PrintBook": 10}
+
+
+def run_workload(engine, lines):
+    library = Library_System(TREE_ENGINES[engine]())
+    start = time.perf_counter()
+    output = "".join(run_commands(library, lines))
+    elapsed = time.perf_counter() - start
+    return elapsed, [line for line in output.split("\n") if not line.startswith("Colour Flip Count")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the catalog engines on generated workloads")
+    parser.add_argument("--catalog", type=int, default=100000, help="number of books loaded by each workload")
+    parser.add_argument("--commands", type=int, default=200000, help="number of commands after the load")
+    parser.add_argument("--engines", default="object,chunks", help="comma separated engines to compare")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    engines = args.engines.split(",")
+    workloads = [(distribution, "default", DEFAULT_MIX) for distribution in DISTRIBUTIONS]
+    workloads.append(("uniform", "range", RANGE_MIX))
+    for distribution, mix_name, mix in workloads:
+        lines = list(generate_commands(args.catalog, args.commands, mix, distribution, seed=args.seed))
+        reference = None
+        rates = []
+        for engine in engines:
+            elapsed, output = run_workload(engine, lines)
+            if reference is None:
+                reference = output
+            elif output != reference:
+                raise SystemExit(f"{engine} output differs on the {distribution} {mix_name} workload")
+            rates.append(f"{engine} {len(lines) / elapsed:,.0f} commands/s")
+        print(f"{distribution} {mix_name}: {', '.join(rates)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+# Benchmark of batch FindClosestBooks lookups against one FindClosestBook tree walk per target
+# The batch runs once on a freshly rebuilt ID mirror and once on a mirror that is already built
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import gatorLibrary
+from gatorLibrary import Library_System
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare batch and per-query closest book lookups")
+    parser.add_argument("--books", type=int, default=200000, help="number of books in the catalog")
+    parser.add_argument("--targets", type=int, default=200000, help="number of target IDs in the batch")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    ids = sorted(rng.sample(range(1, args.books * 10), args.books))
+    targets = [rng.randrange(0, args.books * 10 + 1) for _ in range(args.targets)]
+    library = Library_System()
+    library.bulk_insert_books((bookID, f'"Book{bookID}"', '"Author"', '"Yes"') for bookID in ids)
+
+    start = time.perf_counter()
+    single = [library.find_closest_book(target_id) for target_id in targets]
+    single_time = time.perf_counter() - start
+
+    library.id_mirror = None
+    start = time.perf_counter()
+    batch = library.find_closest_books(targets)
+    cold_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    library.find_closest_books(targets)
+    warm_time = time.perf_counter() - start
+
+    if list(batch) != single:
+        raise SystemExit("batch results differ from single lookups")
+    print(f"mirror: {'numpy' if gatorLibrary.numpy is not None else 'bisect (numpy not installed)'}")
+    print(f"per-query tree walk: {len(targets) / single_time:,.0f} lookups/s")
+    print(f"batch, mirror rebuilt: {len(targets) / cold_time:,.0f} lookups/s")
+    print(f"batch, mirror built: {len(targets) / warm_time:,.0f} lookups/s")
+
+
+if __name__ == "__main__":
+    main()
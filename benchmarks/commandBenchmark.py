@@ -0,0 +1,124 @@
+# Benchmark suite for the library command language
+# Generates a workload, runs it through Library_System command by command to measure per command
+# throughput and latency, runs the same file through main() end to end, and reports peak memory.
+# Results are printed as JSON so runs of different versions can be compared.
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import gatorLibrary
+from gatorLibrary import Library_System, TREE_ENGINES, execute_command, parse_command
+from workloadGenerator import add_workload_arguments, generate_commands, workload_parameters
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def run_commands_timed(lines, engine):
+    # Execute every command and record its latency, including rendering of its output
+    library = Library_System(TREE_ENGINES[engine]())
+    latencies = {}
+    clock = time.perf_counter_ns
+    for line in lines:
+        if line == "Quit()":
+            break
+        command = parse_command(line)[0]
+        start = clock()
+        output_line = execute_command(library, line)
+        if output_line is not None and not isinstance(output_line, str):
+            for _ in output_line:
+                pass
+        latencies.setdefault(command, []).append(clock() - start)
+    return latencies
+
+
+def summarize(latencies):
+    summary = {}
+    for command, values in sorted(latencies.items()):
+        values.sort()
+        total = sum(values)
+        summary[command] = {
+            "count": len(values),
+            "ops_per_sec": len(values) / (total / 1e9) if total else 0.0,
+            "p50_us": percentile(values, 0.50) / 1000,
+            "p99_us": percentile(values, 0.99) / 1000,
+        }
+    return summary
+
+
+def measure_peak_memory(lines, engine):
+    # Peak memory is measured in its own run since tracing allocations slows every command down
+    tracemalloc.start()
+    library = Library_System(TREE_ENGINES[engine]())
+    for output in gatorLibrary.run_commands(library, lines):
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def run_main(lines, engine):
+    # Time the whole file through main(), including parsing and writing the output file
+    with tempfile.TemporaryDirectory() as directory:
+        input_filename = os.path.join(directory, "workload.txt")
+        with open(input_filename, "w") as file:
+            for line in lines:
+                file.write(line + "\n")
+        start = time.perf_counter()
+        gatorLibrary.main(input_filename, engine)
+        return time.perf_counter() - start
+
+
+def compare(results, baseline):
+    # Print the throughput change of every command against an earlier result file
+    for command, current in results["commands"].items():
+        previous = baseline.get("commands", {}).get(command)
+        if previous and previous["ops_per_sec"]:
+            change = (current["ops_per_sec"] / previous["ops_per_sec"] - 1) * 100
+            print(f"{command:>20}: {change:+.1f}% ops/sec, p99 {previous['p99_us']:.1f} -> {current['p99_us']:.1f} us",
+                  file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the library command language")
+    add_workload_arguments(parser)
+    parser.add_argument("--engine", choices=sorted(TREE_ENGINES), default="object")
+    parser.add_argument("--skip-memory", action="store_true", help="do not run the peak memory measurement")
+    parser.add_argument("--output", help="write the JSON results to this file instead of stdout")
+    parser.add_argument("--compare", metavar="RESULTS", help="JSON results of an earlier run to compare against")
+    args = parser.parse_args()
+
+    parameters = workload_parameters(args)
+    lines = list(generate_commands(**parameters))
+    results = {
+        "workload": parameters,
+        "engine": args.engine,
+        "python": sys.version.split()[0],
+        "commands": summarize(run_commands_timed(lines, args.engine)),
+        "main_seconds": run_main(lines, args.engine),
+    }
+    results["main_commands_per_sec"] = len(lines) / results["main_seconds"]
+    if not args.skip_memory:
+        results["peak_memory_bytes"] = measure_peak_memory(lines, args.engine)
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare) as file:
+            compare(results, json.load(file))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# Benchmark of paging through the whole catalog
+# Compares NextBooks on a cursor with PrintBooks pages that list the catalog from the start and skip the pages
+# already shown, and with PrintBooks pages that start after the last book of the previous page.
+import argparse
+import os
+import sys
+import time
+from itertools import islice
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gatorLibrary import Library_System, TREE_ENGINES
+
+
+def page_by_rescan(library, page_size):
+    pages = 0
+    while True:
+        page = list(islice(library.print_books(0, float("inf")), pages * page_size, (pages + 1) * page_size))
+        if not page:
+            return pages
+        pages += 1
+
+
+def page_by_seek(library, page_size):
+    pages = 0
+    next_id = 0
+    while True:
+        page = list(islice(library.book_tree.values_in_range(next_id, float("inf")), page_size))
+        if not page:
+            return pages
+        [library.scan_details(book) for book in page]
+        next_id = page[-1].bookID + 1
+        pages += 1
+
+
+def page_by_cursor(library, page_size):
+    pages = 0
+    library.open_cursor(0)
+    cursorID = library.cursor_count
+    while not isinstance(library.next_books(cursorID, page_size), str):
+        pages += 1
+    library.close_cursor(cursorID)
+    return pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare ways of paging through the catalog")
+    parser.add_argument("--books", type=int, default=200000, help="number of books in the catalog")
+    parser.add_argument("--rescan-books", type=int, default=20000,
+                        help="number of books for the rescanning pages, which take quadratic time")
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--engine", choices=sorted(TREE_ENGINES), default="object")
+    args = parser.parse_args()
+
+    for books, pagers in ((args.rescan_books, (page_by_rescan, page_by_seek, page_by_cursor)),
+                          (args.books, (page_by_seek, page_by_cursor))):
+        results = []
+        for pager in pagers:
+            # A new library for each, so no pager finds records cached by another
+            library = Library_System(TREE_ENGINES[args.engine]())
+            library.bulk_insert_books((bookID, f'"Book{bookID}"', '"Author"', '"Yes"')
+                                      for bookID in range(1, books + 1))
+            start = time.perf_counter()
+            pages = pager(library, args.page_size)
+            results.append(f"{pager.__name__[len('page_by_'):]} {time.perf_counter() - start:.3f}s")
+        print(f"{books} books in {pages} pages: {', '.join(results)}")
+
+
+if __name__ == "__main__":
+    main()
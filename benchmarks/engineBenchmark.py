@@ -0,0 +1,67 @@
+# Benchmark comparing the catalog engines (object, array, persistent and chunks)
+# Each engine runs the same random inserts, lookups and deletes behind Library_System
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gatorLibrary import Library_System, TREE_ENGINES
+
+
+def measure_memory(engine, ids):
+    # Memory is measured in a separate run since tracing allocations slows the engines down
+    tracemalloc.start()
+    library = Library_System(TREE_ENGINES[engine]())
+    for bookID in ids:
+        library.insert_book(bookID, f'"Book{bookID}"', '"Author"', '"Yes"')
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return memory
+
+
+def run_engine(engine, ids, lookups, deletes):
+    library = Library_System(TREE_ENGINES[engine]())
+    timings = {}
+
+    start = time.perf_counter()
+    for bookID in ids:
+        library.insert_book(bookID, f'"Book{bookID}"', '"Author"', '"Yes"')
+    timings["insert"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for bookID in lookups:
+        library.book_tree.get(bookID)
+    timings["search"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for bookID in deletes:
+        library.delete_book(bookID)
+    timings["delete"] = time.perf_counter() - start
+
+    return timings, library.book_tree.color_flip_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the catalog engines")
+    parser.add_argument("--books", type=int, default=200000, help="number of books to insert")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    ids = rng.sample(range(1, args.books * 10), args.books)
+    lookups = [rng.choice(ids) for _ in range(args.books)]
+    deletes = rng.sample(ids, args.books // 2)
+
+    for engine in sorted(TREE_ENGINES):
+        timings, flips = run_engine(engine, ids, lookups, deletes)
+        memory = measure_memory(engine, ids)
+        rates = ", ".join(f"{name} {len(ops) / timings[name]:,.0f} ops/s"
+                          for name, ops in (("insert", ids), ("search", lookups), ("delete", deletes)))
+        print(f"{engine:>10}: {rates}, {memory / args.books:.1f} bytes per book, {flips} color flips")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+# Regression check of the catalog engines
+# Runs generated workloads on every engine and checks that the outputs agree: the object, array and persistent
+# trees including ColorFlipCount, the top-down tree and the chunk map apart from it. Every workload runs with
+# text and JSON lines output, and the engines with a lookup cache must write the same output with --cache.
+# After every workload the trees are checked for the red-black invariants and the chunk map for sorted chunks.
+# Catalog merges, snapshots, restarts from the write-ahead log, sharding and batch mode are compared with a
+# single library as well.
+# Stops with exit status 1 at the first difference.
+import argparse
+import io
+import os
+import random
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import gatorLibrary
+from gatorLibrary import (Array_Red_Black_Tree, CACHED_ENGINES, Library_System, Persistent_Red_Black_Tree,
+                          Red_Black_Tree, Shard_Router, TREE_ENGINES, load_snapshot, new_tree, run_batch,
+                          run_commands, save_snapshot)
+from workloadGenerator import DISTRIBUTIONS, generate_commands
+
+# Engines that count the same color flips as the object tree
+SAME_FLIPS = ("object", "array", "persistent")
+
+# Command mix with every command of the language, weighted towards the ones that change the catalog
+CHECK_MIX = {
+    "InsertBook": 25, "BulkInsertBooks": 1, "DeleteBook": 8, "DeleteBooks": 2, "BorrowBook": 20, "ReturnBook": 15,
+    "CancelReservation": 3, "ChangePriority": 3, "PatronStatus": 3, "PrintBook": 5, "PrintBooks": 3,
+    "FindClosestBook": 5, "FindClosestBooks": 2, "CountBooks": 3, "RankOf": 3, "KthBook": 3, "SearchByAuthor": 2,
+    "SearchTitlePrefix": 2, "OpenCursor": 1, "NextBooks": 3, "CloseCursor": 1, "ColorFlipCount": 8,
+}
+
+
+def fail(message):
+    raise SystemExit(f"FAILED: {message}")
+
+
+def without_flips(output):
+    return [line for line in output.split("\n") if "Colour Flip Count" not in line]
+
+
+# Order, colors, black heights, subtree sizes and parent links of a tree of node objects
+def check_node_tree(tree, name):
+    nil = tree.nil
+    has_parents = not isinstance(tree, Persistent_Red_Black_Tree)
+    if tree.root.red:
+        fail(f"{name}: the root is red")
+    # (node, parent, lowest allowed ID, highest allowed ID), children are checked before their parent
+    stack = [(tree.root, None, float("-inf"), float("inf"), False)]
+    black_heights = {nil: 1}
+    while stack:
+        node, parent, low, high, visited = stack.pop()
+        if node is nil:
+            continue
+        bookID = node.val.bookID
+        if not visited:
+            if not low < bookID < high:
+                fail(f"{name}: book {bookID} is out of order")
+            if has_parents and node.parent is not parent:
+                fail(f"{name}: wrong parent link of book {bookID}")
+            if node.red and (node.left.red or node.right.red):
+                fail(f"{name}: red book {bookID} has a red child")
+            stack.append((node, parent, low, high, True))
+            stack.append((node.left, node, low, bookID, False))
+            stack.append((node.right, node, bookID, high, False))
+            continue
+        if black_heights[node.left] != black_heights[node.right]:
+            fail(f"{name}: black heights differ under book {bookID}")
+        if node.size != node.left.size + node.right.size + 1:
+            fail(f"{name}: wrong subtree size at book {bookID}")
+        black_heights[node] = black_heights[node.left] + (0 if node.red else 1)
+
+
+# The same checks for the handles of an array tree, which must also have freed the handles of deleted books
+def check_array_tree(tree, name):
+    NIL = tree.NIL
+    keys, red, parents, left, right, size = tree.keys, tree.red, tree.parent, tree.left, tree.right, tree.size
+    if red[tree.root] or parents[tree.root] != NIL:
+        fail(f"{name}: the root is red or has a parent")
+    stack = [(tree.root, NIL, float("-inf"), float("inf"), False)]
+    black_heights = {NIL: 1}
+    while stack:
+        node, parent, low, high, visited = stack.pop()
+        if node == NIL:
+            continue
+        bookID = keys[node]
+        if not visited:
+            if not low < bookID < high or tree.vals[node].bookID != bookID:
+                fail(f"{name}: book {bookID} is out of order")
+            if parents[node] != parent:
+                fail(f"{name}: wrong parent link of book {bookID}")
+            if red[node] and (red[left[node]] or red[right[node]]):
+                fail(f"{name}: red book {bookID} has a red child")
+            stack.append((node, parent, low, high, True))
+            stack.append((left[node], node, low, bookID, False))
+            stack.append((right[node], node, bookID, high, False))
+            continue
+        if black_heights[left[node]] != black_heights[right[node]]:
+            fail(f"{name}: black heights differ under book {bookID}")
+        if size[node] != size[left[node]] + size[right[node]] + 1:
+            fail(f"{name}: wrong subtree size at book {bookID}")
+        black_heights[node] = black_heights[left[node]] + (0 if red[node] else 1)
+    if sum(val is not None for val in tree.vals) != size[tree.root]:
+        fail(f"{name}: handles of deleted books were not freed")
+
+
+# Sorted keys, the largest key of every chunk and the entry count of a chunk map
+def check_chunks(chunks, name):
+    previous = None
+    for keys, vals, largest in zip(chunks.keys, chunks.vals, chunks.maxes):
+        if not keys or len(keys) != len(vals) or keys[-1] != largest:
+            fail(f"{name}: malformed chunk")
+        for key in keys:
+            if previous is not None and not previous < key:
+                fail(f"{name}: key {key!r} is out of order")
+            previous = key
+    if sum(len(keys) for keys in chunks.keys) != chunks.count:
+        fail(f"{name}: wrong entry count")
+
+
+def check_library(library, name):
+    tree = library.book_tree
+    if isinstance(tree, Red_Black_Tree):
+        check_node_tree(tree, name)
+    elif isinstance(tree, Array_Red_Black_Tree):
+        check_array_tree(tree, name)
+    else:
+        check_chunks(tree, name)
+        for key, book in zip((key for keys in tree.keys for key in keys), tree.values()):
+            if key != book.bookID:
+                fail(f"{name}: book {book.bookID} is filed under {key}")
+    check_chunks(library.title_index, f"{name} title index")
+    if len(library.title_index) != len(tree) or sum(map(len, library.author_index.values())) != len(tree):
+        fail(f"{name}: the author or title index does not hold every book")
+    check_chunks(library.held_books, f"{name} held book index")
+    held = [book for book in tree.values() if book.borrowedBy is not None or book.has_reservations()]
+    if list(library.held_books.values()) != held:
+        fail(f"{name}: the held book index does not hold every borrowed or reserved book")
+
+
+# Output of a workload on one engine, after which the invariants of the engine are checked
+def run_engine(lines, label, engine, json_output=False, cache=False):
+    library = Library_System(new_tree(engine, cache))
+    library.json_output = json_output
+    errors = []
+    output = "".join(run_commands(library, lines, errors=errors))
+    if errors:
+        fail(f"{label}: {engine}: {errors[0]}")
+    check_library(library, f"{label}: {engine}")
+    return output
+
+
+# Output of every engine on the same workload, and the invariants of every engine after it
+def check_workload(lines, label, json_output=False):
+    outputs = {}
+    for engine in TREE_ENGINES:
+        outputs[engine] = run_engine(lines, label, engine, json_output)
+        if engine in CACHED_ENGINES and run_engine(lines, label, engine, json_output, cache=True) != outputs[engine]:
+            fail(f"{label}: {engine} output differs with the lookup cache")
+    reference = outputs["object"]
+    for engine, output in outputs.items():
+        if engine in SAME_FLIPS:
+            if output != reference:
+                fail(f"{label}: {engine} output or color flip count differs from object")
+        elif without_flips(output) != without_flips(reference):
+            fail(f"{label}: {engine} output differs from object")
+    return reference
+
+
+def catalog_state(library):
+    # Every book as printed, and the color flip count
+    return [library.render_book(book) for book in library.book_tree.values()], library.color_flip_count()
+
+
+# Merge branch catalogs of different sizes into a catalog, small ones take the split and join union
+def check_merges(catalog_size, seed):
+    states = {}
+    for engine in TREE_ENGINES:
+        rng = random.Random(seed)
+        library = Library_System(TREE_ENGINES[engine]())
+        ids = rng.sample(range(1, catalog_size * 4), catalog_size)
+        for bookID in ids:
+            library.insert_book(bookID, f'"Book{bookID}"', f'"Author{bookID % 50}"', '"Yes"')
+        for size in (5, 40, 300, catalog_size // 2, catalog_size * 2):
+            branch = Library_System()
+            branch.bulk_insert_books((bookID, f'"Branch{bookID}"', '"Branch"', '"Yes"')
+                                     for bookID in sorted(rng.sample(range(1, catalog_size * 4), size)))
+            for bookID in rng.sample(list(range(1, catalog_size * 4)), 20):
+                branch.borrow_book(rng.randrange(1, 100), bookID, 1)
+            library.merge_catalog(branch)
+            low = rng.randrange(1, catalog_size * 4)
+            library.delete_books(low, low + rng.randrange(1, catalog_size // 4))
+            check_library(library, f"merge: {engine}")
+        states[engine] = catalog_state(library)
+    for engine, (books, flips) in states.items():
+        if books != states["object"][0]:
+            fail(f"merge: {engine} books differ from object")
+        if engine in SAME_FLIPS and flips != states["object"][1]:
+            fail(f"merge: {engine} color flip count {flips} differs from object {states['object'][1]}")
+
+
+# Snapshots of every engine restored into every engine
+def check_snapshots(lines, directory):
+    for source in TREE_ENGINES:
+        library = Library_System(TREE_ENGINES[source]())
+        for _ in run_commands(library, lines):
+            pass
+        path = os.path.join(directory, f"{source}.bin")
+        save_snapshot(library, path)
+        books, flips = catalog_state(library)
+        for target in TREE_ENGINES:
+            restored, _ = load_snapshot(path, TREE_ENGINES[target]())
+            check_library(restored, f"snapshot: {source} into {target}")
+            if catalog_state(restored) != (books, flips):
+                fail(f"snapshot: {source} restored into {target} differs")
+
+
+# A run split over two restarts from the state directory ends with the catalog of a single run
+def check_restart(lines, directory, engine):
+    state_dir = os.path.join(directory, f"state_{engine}")
+    half = len(lines) // 2
+    for number, part in enumerate((lines[:half], lines[half:])):
+        input_filename = os.path.join(directory, f"restart_{engine}_{number}.txt")
+        with open(input_filename, "w") as file:
+            file.write("\n".join(part) + "\n")
+        if gatorLibrary.main(input_filename, engine, state_dir, checkpoint=number == 1):
+            fail(f"restart: {engine} run {number + 1} failed")
+    # The second run starts from the replayed log of the first, and its checkpoint holds the final catalog
+    restored, _ = load_snapshot(os.path.join(state_dir, gatorLibrary.SNAPSHOT_FILENAME),
+                                TREE_ENGINES[engine]())
+    library = Library_System(TREE_ENGINES[engine]())
+    for _ in run_commands(library, lines):
+        pass
+    if catalog_state(restored) != catalog_state(library):
+        fail(f"restart: {engine} catalog after the restart differs from a single run")
+
+
+# Sharded output matches a single library apart from the color flip count, which every shard keeps for itself
+def check_shards(lines, id_range, engine):
+    reference = "".join(run_commands(Library_System(TREE_ENGINES[engine]()), lines))
+    router = Shard_Router(3, id_range, engine)
+    try:
+        output = "".join(router.run_commands(lines))
+    finally:
+        router.close()
+    if without_flips(output) != without_flips(reference):
+        fail(f"shards: {engine} output differs from a single library")
+
+
+# Files run in batch mode write the output of a single library each, in both output formats
+def check_batch(directory, catalog_size, commands):
+    filenames = []
+    for seed in range(3):
+        filename = os.path.join(directory, f"batch_{seed}.txt")
+        with open(filename, "w") as file:
+            file.write("\n".join(generate_commands(catalog_size, commands, CHECK_MIX, seed=seed)) + "\n")
+        filenames.append(filename)
+    for output_format, engine, cache in (("text", "object", False), ("jsonl", "array", True)):
+        if run_batch(filenames, 2, engine, output_format, cache, summary=io.StringIO()):
+            fail(f"batch: {output_format} run on {engine} failed")
+        for filename in filenames:
+            library = Library_System(new_tree(engine, cache))
+            library.json_output = output_format == "jsonl"
+            with open(filename) as file:
+                expected = "".join(run_commands(library, file))
+            extension = ".jsonl" if output_format == "jsonl" else ".txt"
+            with open(os.path.splitext(filename)[0] + "_output_file" + extension) as file:
+                if file.read() != expected:
+                    fail(f"batch: {output_format} output of {os.path.basename(filename)} differs from a single run")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that the catalog engines agree on generated workloads")
+    parser.add_argument("--catalog", type=int, default=2000, help="number of books loaded by each workload")
+    parser.add_argument("--commands", type=int, default=20000, help="number of commands after the load")
+    parser.add_argument("--seeds", type=int, default=2, help="number of workloads per ID distribution")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for seed in range(args.seeds):
+            for distribution in DISTRIBUTIONS:
+                label = f"{distribution} workload, seed {seed}"
+                lines = list(generate_commands(args.catalog, args.commands, CHECK_MIX, distribution, seed=seed))
+                check_workload(lines, label)
+                check_workload(lines, f"{label}, JSON lines", json_output=True)
+                print(f"{label}: {len(TREE_ENGINES)} engines agree, with and without the lookup cache")
+            check_merges(args.catalog, seed)
+            print(f"merges, seed {seed}: engines agree")
+        lines = list(generate_commands(args.catalog, args.commands, CHECK_MIX, seed=args.seeds))
+        check_snapshots(lines, directory)
+        print("snapshots: every engine restores every engine's snapshot")
+        lines = lines[:-1]  # Without Quit(), so both halves run to their end
+        for engine in ("object", "persistent"):
+            check_restart(lines, directory, engine)
+        print("restarts: the write-ahead log and checkpoint rebuild the catalog")
+        check_shards(lines, args.catalog * 2, "object")
+        print("shards: output matches a single library")
+        check_batch(directory, args.catalog // 4, args.commands // 4)
+        print("batch: every file matches a single run")
+    print("All checks passed")
+
+
+if __name__ == "__main__":
+    main()
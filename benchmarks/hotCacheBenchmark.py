@@ -0,0 +1,48 @@
+# Benchmark of the lookup cache in front of the tree search
+# Runs the same PrintBook lookups with and without the cache, for Zipf distributed and uniform book IDs
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gatorLibrary import Library_System, Lookup_Cache, TREE_ENGINES
+from workloadGenerator import ID_Picker
+
+
+def run_lookups(engine, ids, lookups, cache_size):
+    library = Library_System(TREE_ENGINES[engine]())
+    library.book_tree.lookup_cache = Lookup_Cache(cache_size) if cache_size else None
+    library.bulk_insert_books((bookID, f'"Book{bookID}"', '"Author"', '"Yes"') for bookID in ids)
+    start = time.perf_counter()
+    for bookID in lookups:
+        library.print_book(bookID)
+    elapsed = time.perf_counter() - start
+    return elapsed, library.book_tree.lookup_cache
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare book lookups with and without the lookup cache")
+    parser.add_argument("--books", type=int, default=200000, help="number of books in the catalog")
+    parser.add_argument("--lookups", type=int, default=500000, help="number of PrintBook lookups")
+    parser.add_argument("--cache-size", type=int, default=1024, help="number of cached book IDs")
+    parser.add_argument("--engine", choices=("object", "array"), default="object")
+    parser.add_argument("--zipf-exponent", type=float, default=1.1)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    ids = list(range(1, args.books * 2, 2))
+    for distribution in ("zipf", "uniform"):
+        rng = random.Random(args.seed)
+        picker = ID_Picker(ids, distribution, rng, args.zipf_exponent)
+        lookups = [picker.pick() for _ in range(args.lookups)]
+        uncached, _ = run_lookups(args.engine, ids, lookups, 0)
+        cached, cache = run_lookups(args.engine, ids, lookups, args.cache_size)
+        hit_rate = cache.hits / (cache.hits + cache.misses)
+        print(f"{distribution}: no cache {len(lookups) / uncached:,.0f} lookups/s, "
+              f"cache {len(lookups) / cached:,.0f} lookups/s, hit rate {hit_rate:.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+# Load generator for the library server (gatorLibrary.py --serve)
+# Opens many concurrent connections that pipeline commands, then reports the sustained
+# throughput and latency percentiles of the responses
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "gatorLibrary.py")
+
+
+def raise_file_limit():
+    # Each connection needs a file descriptor
+    try:
+        import resource
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    except (ImportError, ValueError, OSError):
+        pass
+
+
+async def read_response(reader):
+    # A response ends with a line holding a single "."
+    lines = []
+    while True:
+        line = (await reader.readline()).decode()
+        if not line:
+            raise ConnectionError("server closed the connection")
+        line = line.rstrip("\n")
+        if line == ".":
+            return lines
+        lines.append(line[1:] if line.startswith(".") else line)
+
+
+def random_command(rng, catalog, patrons, scan_share=0.0, scan_length=1000):
+    bookID = rng.randrange(1, catalog + 1)
+    if scan_share and rng.random() < scan_share:
+        return f"PrintBooks({bookID}, {bookID + scan_length - 1})"
+    choice = rng.random()
+    if choice < 0.3:
+        return f"BorrowBook({rng.randrange(1, patrons + 1)}, {bookID}, {rng.randrange(1, 6)})"
+    if choice < 0.55:
+        return f"ReturnBook({rng.randrange(1, patrons + 1)}, {bookID})"
+    if choice < 0.8:
+        return f"PrintBook({bookID})"
+    if choice < 0.95:
+        return f"FindClosestBook({bookID})"
+    return "ColorFlipCount()"
+
+
+# Commands whose latency is also reported on its own
+WRITE_COMMANDS = ("BorrowBook", "ReturnBook")
+
+
+async def load_catalog(host, port, catalog):
+    reader, writer = await asyncio.open_connection(host, port)
+    for bookID in range(1, catalog + 1):
+        writer.write(f'InsertBook({bookID}, "Book{bookID}", "Author{bookID % 100}", "Yes")\n'.encode())
+    await writer.drain()
+    for _ in range(catalog):
+        await read_response(reader)
+    writer.close()
+
+
+async def run_client(host, port, requests, depth, catalog, seed, latencies, write_latencies, scan_share,
+                     scan_length):
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    sent = []
+    window = asyncio.Semaphore(depth)
+
+    async def send():
+        for _ in range(requests):
+            await window.acquire()
+            command = random_command(rng, catalog, 1000, scan_share, scan_length)
+            sent.append((time.perf_counter(), command.startswith(WRITE_COMMANDS)))
+            writer.write((command + "\n").encode())
+            await writer.drain()
+
+    sender = asyncio.get_running_loop().create_task(send())
+    for index in range(requests):
+        await read_response(reader)
+        sent_time, is_write = sent[index]
+        latency = time.perf_counter() - sent_time
+        latencies.append(latency)
+        if is_write:
+            write_latencies.append(latency)
+        window.release()
+    await sender
+    writer.write(b"Quit()\n")
+    await writer.drain()
+    await read_response(reader)
+    writer.close()
+
+
+async def run_load(host, port, connections, requests, depth, catalog, scan_share=0.0, scan_length=1000):
+    await load_catalog(host, port, catalog)
+    latencies = []
+    write_latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(run_client(host, port, requests, depth, catalog, seed, latencies, write_latencies,
+                                      scan_share, scan_length)
+                           for seed in range(connections)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    write_latencies.sort()
+
+    def percentile(fraction, latencies=latencies):
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))] * 1000
+
+    return {
+        "connections": connections,
+        "requests": len(latencies),
+        "pipeline_depth": depth,
+        "seconds": elapsed,
+        "requests_per_sec": len(latencies) / elapsed,
+        "p50_ms": percentile(0.50),
+        "p99_ms": percentile(0.99),
+        "p999_ms": percentile(0.999),
+        "scan_share": scan_share,
+        "write_p50_ms": percentile(0.50, write_latencies),
+        "write_p99_ms": percentile(0.99, write_latencies),
+    }
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def wait_for_server(host, port, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"server on {host}:{port} did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure throughput and latency of the library server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, help="port of a running server (default: start one on loopback)")
+    parser.add_argument("--connections", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=100, help="requests per connection")
+    parser.add_argument("--depth", type=int, default=8, help="requests in flight per connection")
+    parser.add_argument("--catalog", type=int, default=10000, help="number of books loaded before the run")
+    parser.add_argument("--scan-share", type=float, default=0.0,
+                        help="fraction of requests that are long PrintBooks scans")
+    parser.add_argument("--scan-length", type=int, default=1000, help="number of book IDs a scan covers")
+    parser.add_argument("--engine", default="object", help="tree engine of the started server")
+    parser.add_argument("--readers", type=int,
+                        help="reader threads of the started server, needs --engine persistent")
+    args = parser.parse_args()
+
+    raise_file_limit()
+    server = None
+    port = args.port
+    if port is None:
+        port = free_port()
+        command = [sys.executable, SCRIPT, "--serve", f"{args.host}:{port}", "--engine", args.engine]
+        if args.readers:
+            command += ["--readers", str(args.readers)]
+        server = subprocess.Popen(command)
+    try:
+        wait_for_server(args.host, port)
+        results = asyncio.run(run_load(args.host, port, args.connections, args.requests, args.depth, args.catalog,
+                                       args.scan_share, args.scan_length))
+        print(json.dumps(results, indent=2))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
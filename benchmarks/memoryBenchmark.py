@@ -0,0 +1,106 @@
+# Memory benchmark for the book catalog
+# Reports the bytes allocated per book by the current node layout and by the
+# previous layout, where every node had a __dict__ and an eagerly created reservation heap
+# Both layouts are measured as the same list of tree nodes holding their books. The author and title indexes,
+# which came after the layout change, are reported on their own next to the tree of a library.
+import argparse
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gatorLibrary import Book_Node, Library_System, Red_Black_Node, Red_Black_Tree
+
+
+# Book node as it was laid out before __slots__ and lazy reservation heaps
+class Legacy_Book_Node:
+    def __init__(self, bookID, bookName, authorName, availabilityStatus):
+        self.bookID = bookID
+        self.bookName = bookName
+        self.authorName = authorName
+        self.availabilityStatus = availabilityStatus
+        self.borrowedBy = None
+        self.reservationHeap = Legacy_Binary_Min_Heap()
+
+
+class Legacy_Binary_Min_Heap:
+    def __init__(self):
+        self.heap = []
+
+
+# Red-Black node as it was laid out before __slots__
+class Legacy_Red_Black_Node:
+    def __init__(self, val):
+        self.val = val
+        self.red = False
+        self.parent = None
+        self.left = None
+        self.right = None
+
+
+def book_fields(i, authors):
+    # Titles are unique, authors repeat and are built as a new string per book as they would be when parsed
+    return i, f'"Book{i}"', f'"Author{i % authors}"', '"Yes"'
+
+
+def measure_nodes(count, authors, node_class, book_class):
+    tracemalloc.start()
+    nodes = []
+    for i in range(1, count + 1):
+        nodes.append(node_class(book_class(*book_fields(i, authors))))
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size
+
+
+def measure_tree(count, authors):
+    # The catalog tree without the indexes of a library
+    tracemalloc.start()
+    tree = Red_Black_Tree()
+    for i in range(1, count + 1):
+        tree.insert(Book_Node(*book_fields(i, authors)))
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size
+
+
+def measure_library(count, authors, scan=False):
+    tracemalloc.start()
+    library = Library_System()
+    for i in range(1, count + 1):
+        library.insert_book(*book_fields(i, authors))
+    if scan:
+        # Print every book once, then look each up, as PrintBooks and PrintBook would
+        for _ in library.print_books(1, count):
+            pass
+        for i in range(1, count + 1):
+            library.print_book(i)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure memory used per book")
+    parser.add_argument("--books", type=int, default=200000, help="number of books to insert")
+    parser.add_argument("--authors", type=int, default=1000, help="number of distinct authors")
+    args = parser.parse_args()
+
+    legacy = measure_nodes(args.books, args.authors, Legacy_Red_Black_Node, Legacy_Book_Node)
+    current = measure_nodes(args.books, args.authors, Red_Black_Node, Book_Node)
+    tree = measure_tree(args.books, args.authors)
+    library = measure_library(args.books, args.authors)
+    scanned = measure_library(args.books, args.authors, scan=True)
+    print(f"Books: {args.books}")
+    print("Node layout, the same list of nodes and books on both sides:")
+    print(f"  Before (dict nodes, eager heaps): {legacy / args.books:.1f} bytes per book")
+    print(f"  After (slotted nodes, lazy heaps): {current / args.books:.1f} bytes per book")
+    print("Library:")
+    print(f"  Catalog tree: {tree / args.books:.1f} bytes per book")
+    print(f"  Author and title indexes: {(library - tree) / args.books:.1f} bytes per book")
+    print(f"  Total: {library / args.books:.1f} bytes per book")
+    print(f"  After printing every book: {scanned / args.books:.1f} bytes per book")
+
+
+if __name__ == "__main__":
+    main()
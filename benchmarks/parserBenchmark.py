@@ -0,0 +1,49 @@
+# Benchmark of the command parser and dispatch
+# Parses a generated workload with parse_command and with the split based parser it replaced, which neither
+# converted arguments nor handled quoted commas, and runs the workload through execute_command.
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gatorLibrary import Library_System, execute_command, parse_command
+from workloadGenerator import generate_commands
+
+
+def split_parse_command(command_string):
+    parts = command_string.split('(')
+    command = parts[0].strip()
+    if len(parts) > 1:
+        arguments = parts[1].rstrip(')').split(',')
+        return command, [arg.strip() for arg in arguments]
+    return command, []
+
+
+def lines_per_second(function, lines):
+    start = time.perf_counter()
+    for line in lines:
+        function(line)
+    return len(lines) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure command parsing and dispatch throughput")
+    parser.add_argument("--books", type=int, default=20000, help="number of books loaded by the workload")
+    parser.add_argument("--commands", type=int, default=200000, help="number of commands after the load")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    lines = [line for line in generate_commands(args.books, args.commands, seed=args.seed) if line != "Quit()"]
+    quoted = [f'InsertBook({bookID}, "Book {bookID}, Volume (2)", "Author, {bookID % 500}", "Yes")'
+              for bookID in range(1, args.books + 1)]
+
+    print(f"split parser: {lines_per_second(split_parse_command, lines):,.0f} lines/s")
+    print(f"parse_command: {lines_per_second(parse_command, lines):,.0f} lines/s")
+    print(f"parse_command, quoted commas: {lines_per_second(parse_command, quoted):,.0f} lines/s")
+    library = Library_System()
+    print(f"execute_command: {lines_per_second(lambda line: execute_command(library, line), lines):,.0f} lines/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# Benchmark of range deletes and catalog merges against one command per book
+# DeleteBooks retires shelf ranges that DeleteBook would delete one book at a time, and merge_catalog merges
+# a branch catalog that would otherwise be inserted one book at a time. Some books carry reservations.
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gatorLibrary import Library_System, TREE_ENGINES
+
+
+def build_library(engine, ids, rng):
+    library = Library_System(TREE_ENGINES[engine]())
+    library.bulk_insert_books((bookID, f'"Book{bookID}"', f'"Author{bookID % 500}"', '"Yes"') for bookID in ids)
+    for bookID in rng.sample(ids, len(ids) // 100):
+        library.borrow_book(1, bookID, 1)
+        library.borrow_book(2, bookID, 3)
+    return library
+
+
+def time_range_deletes(engine, ids, ranges, batch):
+    library = build_library(engine, ids, random.Random(0))
+    start = time.perf_counter()
+    for book_id1, book_id2 in ranges:
+        if batch:
+            library.delete_books(book_id1, book_id2)
+        else:
+            for book in list(library.book_tree.values_in_range(book_id1, book_id2)):
+                library.delete_book(book.bookID)
+    return time.perf_counter() - start, len(library.book_tree)
+
+
+def time_merge(engine, ids, branch_ids, batch):
+    library = build_library(engine, ids, random.Random(0))
+    branch = build_library(engine, branch_ids, random.Random(1))
+    start = time.perf_counter()
+    if batch:
+        library.merge_catalog(branch)
+    else:
+        for book in branch.book_tree.values():
+            library.insert_book(book.bookID, book.bookName, book.authorName, book.availabilityStatus)
+    return time.perf_counter() - start, len(library.book_tree)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare range deletes and merges with per book commands")
+    parser.add_argument("--books", type=int, default=200000, help="number of books in the catalog")
+    parser.add_argument("--ranges", type=int, default=200, help="number of ranges to delete")
+    parser.add_argument("--range-size", type=int, default=500, help="number of book IDs in each range")
+    parser.add_argument("--branch", type=int, default=20000, help="number of books in the merged branch catalog")
+    parser.add_argument("--engine", choices=sorted(TREE_ENGINES), default="object")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    ids = list(range(1, args.books * 2, 2))
+    ranges = []
+    for _ in range(args.ranges):
+        book_id1 = rng.randrange(1, args.books * 2)
+        ranges.append((book_id1, book_id1 + args.range_size))
+    branch_ids = sorted(rng.sample(range(1, args.books * 4), args.branch))
+
+    single, single_size = time_range_deletes(args.engine, ids, ranges, False)
+    batch, batch_size = time_range_deletes(args.engine, ids, ranges, True)
+    if single_size != batch_size:
+        raise SystemExit("range deletes left different catalogs")
+    print(f"delete {len(ranges)} ranges: DeleteBook per book {single:.3f}s, DeleteBooks {batch:.3f}s")
+
+    single, single_size = time_merge(args.engine, ids, branch_ids, False)
+    batch, batch_size = time_merge(args.engine, ids, branch_ids, True)
+    if single_size != batch_size:
+        raise SystemExit("merges left different catalogs")
+    print(f"merge {len(branch_ids)} books: InsertBook per book {single:.3f}s, merge_catalog {batch:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# Benchmark of the top-down and bottom-up Red-Black Tree inserts and deletes
+# Runs an insert heavy and a delete heavy mix of random book IDs on both variants, checks that they end with the
+# same books and reports operations per second, rotations and color flips.
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gatorLibrary import Book_Node, Red_Black_Tree, TREE_COUNTERS
+
+# Share of inserts among the operations after the initial load
+MIXES = {"insert heavy": 0.8, "delete heavy": 0.2}
+
+
+def generate_operations(books, operations, insert_share, seed):
+    rng = random.Random(seed)
+    max_id = books * 4
+    load = rng.sample(range(1, max_id), books)
+    return load, [(rng.random() < insert_share, rng.randrange(1, max_id)) for _ in range(operations)]
+
+
+def run_operations(top_down, load, operations):
+    tree = Red_Black_Tree(top_down=top_down)
+    for bookID in load:
+        tree.insert(Book_Node(bookID, None, None, None))
+    tree.stats = dict.fromkeys(TREE_COUNTERS, 0)
+    flips = tree.color_flip_count
+    books = [Book_Node(bookID, None, None, None) if insert else bookID for insert, bookID in operations]
+    start = time.perf_counter()
+    for (insert, _), book in zip(operations, books):
+        if insert:
+            tree.insert(book)
+        else:
+            tree.delete(book)
+    elapsed = time.perf_counter() - start
+    rotations = tree.stats["left_rotations"] + tree.stats["right_rotations"]
+    return elapsed, rotations, tree.color_flip_count - flips, [book.bookID for book in tree.values()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare top-down and bottom-up Red-Black Tree updates")
+    parser.add_argument("--books", type=int, default=100000, help="number of books loaded before the mix")
+    parser.add_argument("--operations", type=int, default=200000, help="number of inserts and deletes in the mix")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for name, insert_share in MIXES.items():
+        load, operations = generate_operations(args.books, args.operations, insert_share, args.seed)
+        results = []
+        reference = None
+        for top_down in (False, True):
+            elapsed, rotations, flips, books = run_operations(top_down, load, operations)
+            if reference is None:
+                reference = books
+            elif books != reference:
+                raise SystemExit(f"the variants end with different books on the {name} mix")
+            variant = "top-down" if top_down else "bottom-up"
+            results.append(f"{variant} {len(operations) / elapsed:,.0f} ops/s, {rotations:,} rotations, "
+                           f"{flips:,} color flips")
+        print(f"{name}: {'; '.join(results)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+# Synthetic workload generator for the library command language
+# Writes an input file that loads a catalog and then runs a configurable mix of commands
+import argparse
+import bisect
+import random
+
+# Default share of each command in the generated mix
+DEFAULT_MIX = {
+    "InsertBook": 20,
+    "BorrowBook": 25,
+    "ReturnBook": 20,
+    "DeleteBook": 5,
+    "PrintBook": 10,
+    "PrintBooks": 5,
+    "FindClosestBook": 10,
+    "ColorFlipCount": 5,
+}
+
+DISTRIBUTIONS = ("uniform", "sequential", "zipf")
+
+
+def parse_mix(text):
+    # Parse "InsertBook=30,BorrowBook=20" into a mix dictionary
+    mix = {}
+    for part in text.split(","):
+        command, weight = part.split("=")
+        mix[command.strip()] = float(weight)
+    return mix
+
+
+# Picks book IDs from the catalog following the chosen distribution
+class ID_Picker:
+    def __init__(self, ids, distribution, rng, zipf_exponent=1.1):
+        self.ids = ids
+        self.distribution = distribution
+        self.rng = rng
+        self.next_index = 0
+        if distribution == "zipf":
+            # Popularity ranks are assigned to IDs at random
+            self.ranked = ids[:]
+            rng.shuffle(self.ranked)
+            total = 0.0
+            self.cumulative = []
+            for rank in range(1, len(ids) + 1):
+                total += 1.0 / rank ** zipf_exponent
+                self.cumulative.append(total)
+
+    def pick(self):
+        if self.distribution == "sequential":
+            bookID = self.ids[self.next_index % len(self.ids)]
+            self.next_index += 1
+            return bookID
+        if self.distribution == "zipf":
+            index = bisect.bisect_left(self.cumulative, self.rng.random() * self.cumulative[-1])
+            return self.ranked[min(index, len(self.ranked) - 1)]
+        return self.rng.choice(self.ids)
+
+
+def generate_commands(catalog_size=10000, commands=100000, mix=None, distribution="uniform",
+                      reservation_pressure=0.2, patrons=1000, seed=0):
+    # Yield command lines: the catalog load, the command mix and a final Quit()
+    # reservation_pressure is the share of BorrowBook commands aimed at books that are already borrowed
+    rng = random.Random(seed)
+    mix = mix or DEFAULT_MIX
+    ids = list(range(1, catalog_size * 2, 2))
+    load_order = ids[:] if distribution == "sequential" else rng.sample(ids, len(ids))
+    for bookID in load_order:
+        yield f'InsertBook({bookID}, "Book{bookID}", "Author{bookID % 500}", "Yes")'
+
+    picker = ID_Picker(ids, distribution, rng)
+    # Books the generator expects to be borrowed, kept in a list for O(1) random picks
+    borrowed = {}  # Book ID to (patron holding it, index in borrowed_ids)
+    borrowed_ids = []
+    reservations = []  # (patron, book ID) of BorrowBook commands aimed at books the generator expects borrowed
+    open_cursors = []  # Cursor IDs opened and not closed yet
+    cursor_count = 0
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    max_id = ids[-1] + 1
+    for _ in range(commands):
+        command = rng.choices(names, weights)[0]
+        if command == "InsertBook":
+            bookID = rng.randrange(1, max_id)
+            yield f'InsertBook({bookID}, "Book{bookID}", "Author{bookID % 500}", "Yes")'
+        elif command == "BorrowBook":
+            patronID = rng.randrange(1, patrons + 1)
+            if borrowed_ids and rng.random() < reservation_pressure:
+                bookID = rng.choice(borrowed_ids)
+            else:
+                bookID = picker.pick()
+            if bookID not in borrowed:
+                borrowed[bookID] = (patronID, len(borrowed_ids))
+                borrowed_ids.append(bookID)
+            elif borrowed[bookID][0] != patronID:
+                reservations.append((patronID, bookID))
+            yield f"BorrowBook({patronID}, {bookID}, {rng.randrange(1, 6)})"
+        elif command == "ReturnBook":
+            if borrowed_ids:
+                bookID = rng.choice(borrowed_ids)
+                patronID, index = borrowed.pop(bookID)
+                last = borrowed_ids.pop()
+                if last != bookID:
+                    borrowed_ids[index] = last
+                    borrowed[last] = (borrowed[last][0], index)
+            else:
+                bookID, patronID = picker.pick(), rng.randrange(1, patrons + 1)
+            yield f"ReturnBook({patronID}, {bookID})"
+        elif command in ("CancelReservation", "ChangePriority"):
+            if reservations:
+                index = rng.randrange(len(reservations))
+                patronID, bookID = reservations[index]
+                if command == "CancelReservation":
+                    reservations[index] = reservations[-1]
+                    reservations.pop()
+            else:
+                patronID, bookID = rng.randrange(1, patrons + 1), picker.pick()
+            if command == "CancelReservation":
+                yield f"CancelReservation({patronID}, {bookID})"
+            else:
+                yield f"ChangePriority({patronID}, {bookID}, {rng.randrange(1, 6)})"
+        elif command == "PatronStatus":
+            if borrowed_ids and rng.random() < 0.5:
+                patronID = borrowed[rng.choice(borrowed_ids)][0]
+            else:
+                patronID = rng.randrange(1, patrons + 1)
+            yield f"PatronStatus({patronID})"
+        elif command == "SearchByAuthor":
+            yield f'SearchByAuthor("Author{picker.pick() % 500}")'
+        elif command == "SearchTitlePrefix":
+            # Dropping the last digit matches about ten titles
+            yield f'SearchTitlePrefix("Book{str(picker.pick())[:-1]}")'
+        elif command == "BulkInsertBooks":
+            batch = sorted(rng.sample(range(1, max_id), rng.randrange(1, 20)))
+            yield "BulkInsertBooks(" + ", ".join(f'{bookID}, "Book{bookID}", "Author{bookID % 500}", "Yes"'
+                                                 for bookID in batch) + ")"
+        elif command == "FindClosestBooks":
+            yield f"FindClosestBooks({', '.join(str(rng.randrange(1, max_id)) for _ in range(rng.randrange(1, 8)))})"
+        elif command == "OpenCursor":
+            cursor_count += 1
+            open_cursors.append(cursor_count)
+            yield f"OpenCursor({picker.pick()})"
+        elif command == "NextBooks":
+            cursorID = rng.choice(open_cursors) if open_cursors else cursor_count + 1
+            yield f"NextBooks({cursorID}, {rng.randrange(1, 20)})"
+        elif command == "CloseCursor":
+            cursorID = open_cursors.pop(rng.randrange(len(open_cursors))) if open_cursors else cursor_count + 1
+            yield f"CloseCursor({cursorID})"
+        elif command == "DeleteBook":
+            yield f"DeleteBook({picker.pick()})"
+        elif command == "PrintBook":
+            yield f"PrintBook({picker.pick()})"
+        elif command == "PrintBooks":
+            low = picker.pick()
+            yield f"PrintBooks({low}, {low + rng.randrange(1, 100)})"
+        elif command == "CountBooks":
+            low = picker.pick()
+            yield f"CountBooks({low}, {low + rng.randrange(1, 1000)})"
+        elif command == "DeleteBooks":
+            low = picker.pick()
+            yield f"DeleteBooks({low}, {low + rng.randrange(1, 100)})"
+        elif command == "RankOf":
+            yield f"RankOf({picker.pick()})"
+        elif command == "KthBook":
+            yield f"KthBook({rng.randrange(1, catalog_size + 1)})"
+        elif command == "FindClosestBook":
+            yield f"FindClosestBook({rng.randrange(1, max_id)})"
+        elif command == "ColorFlipCount":
+            yield "ColorFlipCount()"
+        else:
+            raise ValueError(f"Unknown command in mix: {command}")
+    yield "Quit()"
+
+
+def add_workload_arguments(parser):
+    parser.add_argument("--catalog", type=int, default=10000, help="number of books loaded first")
+    parser.add_argument("--commands", type=int, default=100000, help="number of commands after the load")
+    parser.add_argument("--mix", type=parse_mix, default=None,
+                        help="command weights, e.g. InsertBook=30,BorrowBook=20 (default: a mixed workload)")
+    parser.add_argument("--distribution", choices=DISTRIBUTIONS, default="uniform",
+                        help="distribution of the book IDs used by commands")
+    parser.add_argument("--reservation-pressure", type=float, default=0.2,
+                        help="share of BorrowBook commands aimed at borrowed books")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def workload_parameters(args):
+    return {
+        "catalog_size": args.catalog,
+        "commands": args.commands,
+        "mix": args.mix or DEFAULT_MIX,
+        "distribution": args.distribution,
+        "reservation_pressure": args.reservation_pressure,
+        "seed": args.seed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a library command file")
+    parser.add_argument("output_filename")
+    add_workload_arguments(parser)
+    args = parser.parse_args()
+    with open(args.output_filename, "w") as file:
+        for line in generate_commands(**workload_parameters(args)):
+            file.write(line + "\n")
+
+
+if __name__ == "__main__":
+    main()
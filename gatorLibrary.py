@@ -1,51 +1,370 @@
 # Import necessary libraries
-import time
+import argparse
+import asyncio
+import bisect
+import concurrent.futures
+import copy
+import glob
+import heapq
+import json
+import mmap
+import multiprocessing
+import os
+import re
+import struct
 import sys
+import time
+from abc import ABC, abstractmethod
+from array import array
+from collections import deque
+from itertools import islice
 from os.path import splitext
 
+# NumPy is optional, batch lookups fall back to bisect without it
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Maximum number of reservations in the waitlist of a book
+MAX_RESERVATIONS = 20
+
+# Number of book IDs kept in the lookup cache of a tree
+LOOKUP_CACHE_SIZE = 1024
+
+# Number of books whose rendered output record is kept
+RENDERED_BOOKS = 1024
+
 # Represents a node in the book structure
 class Book_Node:
+    __slots__ = ('bookID', 'bookName', 'authorName', 'availabilityStatus', 'borrowedBy', 'reservationHeap',
+                 'rendered')
+
     # Constructor to initialize a Book_Node object
     def __init__(self, bookID, bookName, authorName, availabilityStatus):
         # Attributes to store book information
         self.bookID = bookID
         self.bookName = bookName
-        self.authorName = authorName
-        self.availabilityStatus = availabilityStatus
+        # Author names and availability values repeat across books, so share one string object each
+        self.authorName = sys.intern(authorName) if authorName is not None else None
+        self.availabilityStatus = sys.intern(availabilityStatus) if availabilityStatus is not None else None
         self.borrowedBy = None
-        self.reservationHeap = Binary_Min_Heap()
+        self.reservationHeap = None  # Allocated on the first reservation
+        # Output record of the book, cached until its availability, borrower or reservations change, or until
+        # the library drops it to keep the number of cached records bounded
+        self.rendered = None
+
+    # Copy of the book with its own reservation heap, for changing it while a snapshot keeps the original
+    def copy(self):
+        book = Book_Node(self.bookID, self.bookName, self.authorName, self.availabilityStatus)
+        book.borrowedBy = self.borrowedBy
+        book.rendered = self.rendered
+        if self.reservationHeap is not None:
+            book.reservationHeap = Binary_Min_Heap()
+            book.reservationHeap.restore([Reservation_Node(reservation.patronID, reservation.priority,
+                                                           reservation.sequence)
+                                          for reservation in self.reservationHeap.heap],
+                                         self.reservationHeap.next_sequence)
+        return book
+
+    # Check whether the book has pending reservations
+    def has_reservations(self):
+        return self.reservationHeap is not None and len(self.reservationHeap.heap) > 0
+
+    # Patron IDs of the pending reservations, in heap order
+    def reservation_patrons(self):
+        if self.reservationHeap is None:
+            return []
+        return [reservation.patronID for reservation in self.reservationHeap.heap]
 
     # Method to get the reservation heap
     def get_reservationHeap(self):
         reservationHeap = []
+        if self.reservationHeap is None:
+            return reservationHeap
+        self.rendered = None
         # Extracting reservations from the heap
         while True:
             minentry = self.reservationHeap.remove_min()
             if minentry is not None:
-                patronID = minentry[1]
-                reservationHeap.append(patronID)
+                reservationHeap.append(minentry.patronID)
             else:
                 break
         return reservationHeap
 
     # Method to add a reservation for a book
     def make_a_reservation(self, patronID, priorityNum):
-        # Creating a reservation tuple with priority, patronID, and timestamp
-        timestamp = time.time()
-        reservation = (priorityNum, patronID, timestamp)
+        if self.reservationHeap is None:
+            self.reservationHeap = Binary_Min_Heap()
+        # Limit the number of reservations to MAX_RESERVATIONS
+        if len(self.reservationHeap) >= MAX_RESERVATIONS:
+            return "Waitlist full"
         # Inserting the reservation into the reservation heap
-        self.reservationHeap.insert(reservation)
+        self.reservationHeap.insert(patronID, priorityNum)
+        self.rendered = None
 
-        # Limit the number of reservations to 20
-        if len(self.reservationHeap.heap) > 20:
-            return "Waitlist full"
+    # Method to remove the reservations of a patron
+    def cancel_reservation(self, patronID):
+        if self.reservationHeap is None:
+            return None
+        self.rendered = None
+        return self.reservationHeap.remove(patronID)
+
+    # Method to change the priority of a patron's reservations
+    def change_reservation_priority(self, patronID, priorityNum):
+        if self.reservationHeap is None:
+            return None
+        self.rendered = None
+        return self.reservationHeap.update_priority(patronID, priorityNum)
+
+# Bounded map from book ID to the node of the book, kept in front of the search of a tree
+# Eviction is CLOCK: a hit marks the entry as used, and when the cache is full the hand sweeps over the
+# entries, clearing the marks, until it finds an entry that was not used since the last sweep.
+# Only books that are in the tree are cached, so the tree must discard an ID when its node is deleted.
+class Lookup_Cache:
+    __slots__ = ('capacity', 'slots', 'keys', 'nodes', 'used', 'free', 'hand', 'hits', 'misses')
+
+    def __init__(self, capacity=LOOKUP_CACHE_SIZE):
+        self.capacity = capacity
+        self.slots = {}  # Book ID to the index of its entry
+        self.keys = []
+        self.nodes = []
+        self.used = bytearray(capacity)  # Marks set by hits, cleared by the clock hand
+        self.free = []  # Indexes of discarded entries
+        self.hand = 0
+        self.hits = 0
+        self.misses = 0
+
+    # The cached node of a book ID, or None
+    def get(self, bookID):
+        slot = self.slots.get(bookID)
+        if slot is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.used[slot] = 1
+        return self.nodes[slot]
+
+    # Cache the node of a book ID, evicting an entry if the cache is full
+    def put(self, bookID, node):
+        if self.free:
+            slot = self.free.pop()
+            self.keys[slot] = bookID
+            self.nodes[slot] = node
+        elif len(self.keys) < self.capacity:
+            slot = len(self.keys)
+            self.keys.append(bookID)
+            self.nodes.append(node)
+        else:
+            used = self.used
+            slot = self.hand
+            while used[slot]:
+                used[slot] = 0
+                slot = (slot + 1) % self.capacity
+            self.hand = (slot + 1) % self.capacity
+            del self.slots[self.keys[slot]]
+            self.keys[slot] = bookID
+            self.nodes[slot] = node
+        self.slots[bookID] = slot
+
+    # Drop the entry of a book ID if it is cached
+    def discard(self, bookID):
+        slot = self.slots.pop(bookID, None)
+        if slot is not None:
+            self.keys[slot] = None
+            self.nodes[slot] = None
+            self.used[slot] = 0
+            self.free.append(slot)
+
+    # Drop the entries of the book IDs in a range, in O(capacity) whatever the size of the range
+    def discard_range(self, book_id1, book_id2):
+        for bookID in [bookID for bookID in self.slots if book_id1 <= bookID <= book_id2]:
+            self.discard(bookID)
+
+    # Drop all entries, the hit and miss counters are kept
+    def clear(self):
+        self.slots.clear()
+        self.keys.clear()
+        self.nodes.clear()
+        self.used = bytearray(self.capacity)
+        self.free.clear()
+        self.hand = 0
+
+    def __len__(self):
+        return len(self.slots)
+
+# Books of a batch sorted by book ID, without the books whose ID repeats that of the book before them
+def unique_batch(vals):
+    batch = []
+    for val in vals:
+        if not batch or val.bookID > batch[-1].bookID:
+            batch.append(val)
+    return batch
+
+# Books cut out of a catalog by delete_range: their number, known without walking them, and one pass over them
+# in order of book ID
+class Deleted_Range:
+    __slots__ = ('count', 'books')
+
+    def __init__(self, count, books):
+        self.count = count
+        self.books = books
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return iter(self.books)
+
+# Ordered map from book ID to book that holds the catalog of a Library_System
+# The tree engines implement these methods, and Library_System, the commands, snapshots and statistics use
+# nothing else, apart from snapshot() and writable_value() of engines that support snapshots.
+# color_flip_count counts the color flips of the red-black engines and stays 0 for other engines.
+# stats holds TREE_COUNTERS while statistics are enabled, lookup_cache is a Lookup_Cache or None.
+# An engine that leaves out one of the abstract methods cannot be created.
+class Ordered_Catalog(ABC):
+    color_flip_count = 0
+    stats = None
+    lookup_cache = None
 
-    # Method to remove a reservation
-    def cancel_reservation(self):
-        return self.reservationHeap.remove_min() if self.reservationHeap.heap else None
+    # Insert a book, returns False if its book ID is already in the catalog
+    @abstractmethod
+    def insert(self, val):
+        pass
+
+    # Delete the book with the given ID, if there is one
+    @abstractmethod
+    def delete(self, val):
+        pass
+
+    # Find the book with the given ID, or None if it is not in the catalog
+    @abstractmethod
+    def get(self, val):
+        pass
+
+    # Insert books sorted by book ID, skipping IDs that are in the catalog or repeated, returns the inserted books
+    # Batches that inserts_one_by_one accepts go through insert. Larger batches are merged with the entries of
+    # the catalog, with a new entry for every new book, and rebuild builds the catalog from them in O(n).
+    def bulk_insert(self, vals):
+        batch = unique_batch(vals)
+        if not batch:
+            return []
+        if self.inserts_one_by_one(len(batch)):
+            return [val for val in batch if self.insert(val)]
+
+        # Merge the existing entries with the batch
+        entries = []
+        existing = []
+        inserted = []
+        i = 0
+        for bookID, entry in self.sorted_entries():
+            while i < len(batch) and batch[i].bookID < bookID:
+                entries.append(self.new_entry(batch[i]))
+                inserted.append(batch[i])
+                i += 1
+            if i < len(batch) and batch[i].bookID == bookID:
+                i += 1
+            entries.append(entry)
+            existing.append(entry)
+        for val in batch[i:]:
+            entries.append(self.new_entry(val))
+            inserted.append(val)
+        self.rebuild(entries, existing)
+        return inserted
+
+    # Whether a batch of count books is inserted one by one rather than by a rebuild
+    # A rebuild is O(n), count inserts O(count log n).
+    def inserts_one_by_one(self, count):
+        n = len(self)
+        return count * n.bit_length() < n
+
+    # Yield (book ID, entry) for the entries of the catalog in order of book ID, as bulk_insert merges them
+    @abstractmethod
+    def sorted_entries(self):
+        pass
+
+    # New entry for a book of a bulk insert
+    @abstractmethod
+    def new_entry(self, val):
+        pass
+
+    # Rebuild the catalog from entries sorted by book ID, existing lists those that were in the catalog
+    @abstractmethod
+    def rebuild(self, entries, existing):
+        pass
+
+    # Yield the books in order of book ID
+    @abstractmethod
+    def values(self):
+        pass
+
+    # Lazily yield the books with IDs in the range, in order of book ID
+    @abstractmethod
+    def values_in_range(self, book_id1, book_id2):
+        pass
+
+    # Insert books sorted by book ID like bulk_insert, for merging another catalog into this one
+    def union(self, vals):
+        return self.bulk_insert(vals)
+
+    # Delete the books with IDs in the range, returns them in order of book ID
+    # The result has a length and can be iterated once. Engines may walk the deleted books lazily, so iterate it
+    # before the catalog changes again.
+    def delete_range(self, book_id1, book_id2):
+        books = list(self.values_in_range(book_id1, book_id2))
+        for book in books:
+            self.delete(book.bookID)
+        return books
+
+    # Find the book with the largest ID not greater than the given ID
+    @abstractmethod
+    def floor(self, bookID):
+        pass
+
+    # Find the book with the smallest ID not less than the given ID
+    @abstractmethod
+    def ceiling(self, bookID):
+        pass
+
+    # Count the books with an ID smaller than the given ID
+    @abstractmethod
+    def count_less(self, bookID):
+        pass
+
+    # Find the book with the k-th smallest ID, counting from 1
+    @abstractmethod
+    def select_value(self, k):
+        pass
+
+    # Yield (book, red) pairs in the order snapshots store them
+    @abstractmethod
+    def preorder_values(self):
+        pass
+
+    # Rebuild the catalog from (book, red) pairs in preorder, as produced by preorder_values of any engine
+    @abstractmethod
+    def restore_preorder(self, entries):
+        pass
+
+    # Number of books in the catalog
+    @abstractmethod
+    def __len__(self):
+        pass
+
+    # Number of levels on the longest path from the root, for statistics
+    @abstractmethod
+    def height(self):
+        pass
+
+    # Number of black nodes on every path from the root to a leaf, for statistics
+    @abstractmethod
+    def black_height(self):
+        pass
 
 # Represents the node in the Red-Black Tree
 class Red_Black_Node:
+    __slots__ = ('val', 'red', 'parent', 'left', 'right', 'size')
+
     # Constructor to initialize a Red-Black Node
     def __init__(self, val: Book_Node):
         self.val = val
@@ -53,20 +372,35 @@ class Red_Black_Node:
         self.parent = None
         self.left = None
         self.right = None
+        self.size = 1  # Number of nodes in the subtree rooted at this node
+
+# Largest part of a merged batch that Red_Black_Tree.union inserts node by node instead of splitting for it
+UNION_INSERT_SIZE = 32
 
 # Represents the Red-Black Tree structure
-class Red_Black_Tree:
-    def __init__(self):
+# With top_down, insert and delete fix the colors on their way down in a single pass, see insert_top_down.
+class Red_Black_Tree(Ordered_Catalog):
+    top_down = False
+
+    def __init__(self, top_down=False, cache=False):
         # Initialize the nil node with default attributes
         self.nil = Red_Black_Node(Book_Node(0, None, None, None))
         self.nil.red = False
         self.nil.left = None
         self.nil.right = None
+        self.nil.size = 0
         self.root = self.nil  # Initialize root as nil
         self.color_flip_count = 0  # Counter for counting the color flips
+        self.color_changes = None  # Original colors of nodes recolored during a delete
+        self.stats = None  # Rotation and fix-up case counters, only kept when statistics are enabled
+        # Nodes keep their book while the tree is rebalanced, so cached nodes stay valid until deleted
+        self.lookup_cache = Lookup_Cache() if cache else None
+        self.top_down = top_down  # Single pass top-down insert and delete instead of bottom-up fix-ups
 
-    # Insert book node
+    # Insert book node, returns False if the book ID is already in the tree
     def insert(self, val):
+        if self.top_down:
+            return self.insert_top_down(val)
         inserted_node = Red_Black_Node(val)
         inserted_node.red = True  # The inserted node should be red
         inserted_node.parent = None
@@ -83,7 +417,7 @@ class Red_Black_Tree:
             elif inserted_node.val.bookID > current.val.bookID:
                 current = current.right
             else:
-                return  # If the value already exists, do nothing
+                return False  # If the value already exists, do nothing
 
         # Set the parent for the inserted node
         inserted_node.parent = parent
@@ -93,40 +427,45 @@ class Red_Black_Tree:
             parent.left = inserted_node
         else:
             parent.right = inserted_node
+        # Update the subtree sizes of the ancestors of the inserted node
+        ancestor = parent
+        while ancestor is not None:
+            ancestor.size += 1
+            ancestor = ancestor.parent
         # Balance the tree after insertion
         self.balance_after_insert(inserted_node)
+        return True
 
     # Delete book node
     def delete(self, val):
-        # Store red-black node colors in dict_a for comparison
-        dict_a = {}
-        list1 = []
-        node = self.root
-        list1.append(node)
-        while list1:
-            current = list1.pop(0)
-            dict_a[current.val.bookID] = 1 if current.red else 0
-            if current.left:
-                list1.append(current.left)
-            if current.right:
-                list1.append(current.right)
         # Find the node to be deleted
         r = self.search(val)
         if r is None:
             return
+        if self.lookup_cache is not None:
+            self.lookup_cache.discard(r.val.bookID)
+        if self.top_down:
+            self.delete_top_down(r)
+            return
+        # Track the original colors of the nodes recolored by this delete
+        self.color_changes = {}
         q = r
         q_original_color = q.red
         # Re-position nodes after deletion
         if r.left == self.nil:
             p = r.right
+            self.decrement_sizes(r.parent)
             self.reposition(r, r.right)
         elif r.right == self.nil:
             p = r.left
+            self.decrement_sizes(r.parent)
             self.reposition(r, r.left)
         else:
             q = self.get_minimum(r.right)
             q_original_color = q.red
             p = q.right
+            # The successor is removed from its position, r is one of its ancestors
+            self.decrement_sizes(q.parent)
             if q.parent == r:
                 p.parent = q
             else:
@@ -136,34 +475,39 @@ class Red_Black_Tree:
             self.reposition(r, q)
             q.left = r.left
             q.left.parent = q
-            q.red = r.red
+            q.size = r.size
+            self.set_color(q, r.red)
 
         # Balance the tree after deletion based on the original color
         if q_original_color == False:
-            self.balance_after_delete(p, dict_a)
-        else:
-            # Compare red-black node colors before and after deletion
-            dict_b = {}
-            list1 = []
-            node = self.root
-            list1.append(node)
-            while list1:
-                current = list1.pop(0)
-                dict_b[current.val.bookID] = 1 if current.red else 0
-                if current.left:
-                    list1.append(current.left)
-                if current.right:
-                    list1.append(current.right)
-            diff = {p: dict_a[p] == dict_b[p] for p in dict_a if p in dict_b}
-            counter = 0
-            # Count the color flips
-            for ele in diff.values():
-                if ele == False:
-                    counter += 1
-            self.color_flip_count += counter
+            self.balance_after_delete(p)
+        self.count_color_changes()
+
+    # Decrement the subtree sizes from a node up to the root
+    def decrement_sizes(self, node):
+        while node is not None:
+            node.size -= 1
+            node = node.parent
+
+    # Set the color of a node, remembering its color before the current delete
+    def set_color(self, node, red):
+        if self.color_changes is not None and node not in self.color_changes:
+            self.color_changes[node] = node.red
+        node.red = red
+
+    # Count the nodes whose color differs from the color they had before the delete
+    def count_color_changes(self):
+        counter = 0
+        for node, original_red in self.color_changes.items():
+            if node != self.nil and node.red != original_red:
+                counter += 1
+        self.color_flip_count += counter
+        self.color_changes = None
 
     # Left rotation at node p
     def left_rotation(self, p):
+        if self.stats is not None:
+            self.stats["left_rotations"] += 1
         # Perform left rotation at a given node
         q = p.right
         p.right = q.left
@@ -179,9 +523,13 @@ class Red_Black_Tree:
             p.parent.right = q
         q.left = p
         p.parent = q
+        q.size = p.size
+        p.size = p.left.size + p.right.size + 1
 
     # Right rotation at node p
     def right_rotation(self, p):
+        if self.stats is not None:
+            self.stats["right_rotations"] += 1
         # Perform right rotation at a given node
         q = p.left
         p.left = q.right
@@ -197,6 +545,8 @@ class Red_Black_Tree:
             p.parent.left = q
         q.right = p
         p.parent = q
+        q.size = p.size
+        p.size = p.left.size + p.right.size + 1
 
     # Balance tree after insertion
     def balance_after_insert(self, inserted_node):
@@ -206,6 +556,8 @@ class Red_Black_Tree:
                 u = inserted_node.parent.parent.left  # Uncle
                 if u.red:
                     # Case 1: Uncle is red
+                    if self.stats is not None:
+                        self.stats["insert_case_1"] += 1
                     u.red = False
                     inserted_node.parent.red = False
                     inserted_node.parent.parent.red = True
@@ -217,6 +569,8 @@ class Red_Black_Tree:
 
                 else:
                     # Case 2: Uncle is black
+                    if self.stats is not None:
+                        self.stats["insert_case_2"] += 1
                     if inserted_node == inserted_node.parent.left:
                         inserted_node = inserted_node.parent
                         self.right_rotation(inserted_node)
@@ -234,6 +588,8 @@ class Red_Black_Tree:
                 u = inserted_node.parent.parent.right  # Uncle - Sibling of parent
                 if u.red:
                     # Case 3: Uncle is red
+                    if self.stats is not None:
+                        self.stats["insert_case_3"] += 1
                     u.red = False
                     inserted_node.parent.red = False
                     inserted_node.parent.parent.red = True
@@ -245,6 +601,8 @@ class Red_Black_Tree:
 
                 else:
                     # Case 4: Uncle is black
+                    if self.stats is not None:
+                        self.stats["insert_case_4"] += 1
                     if inserted_node == inserted_node.parent.right:
                         inserted_node = inserted_node.parent
                         self.left_rotation(inserted_node)
@@ -262,84 +620,244 @@ class Red_Black_Tree:
         self.root.red = False  # Set the root node to black after balancing
 
     # Balance tree after deletion
-    def balance_after_delete(self, p, dict_a):
+    def balance_after_delete(self, p):
         # Balance the tree after deletion of a node
         while p != self.root and p.red == False:
             if p == p.parent.left:
                 w = p.parent.right
                 if w.red:
                     # Case 1: Sibling (w) is red
-                    w.red = False
-                    p.parent.red = True
+                    if self.stats is not None:
+                        self.stats["delete_case_1"] += 1
+                    self.set_color(w, False)
+                    self.set_color(p.parent, True)
                     self.left_rotation(p.parent)
                     w = p.parent.right
                 if w.left.red == False and w.right.red == False:
                     # Case 2: Both children of sibling are black
-                    w.red = True
+                    if self.stats is not None:
+                        self.stats["delete_case_2"] += 1
+                    self.set_color(w, True)
                     p = p.parent
                 else:
                     if w.right.red == False:
                         # Case 3: Right child of sibling is black
-                        w.left.red = False
-                        w.red = True
+                        if self.stats is not None:
+                            self.stats["delete_case_3"] += 1
+                        self.set_color(w.left, False)
+                        self.set_color(w, True)
                         self.right_rotation(w)
                         w = p.parent.right
-                    w.red = p.parent.red
-                    p.parent.red = False
-                    w.right.red = False
+                    # Case 4: Far child of sibling is red
+                    if self.stats is not None:
+                        self.stats["delete_case_4"] += 1
+                    self.set_color(w, p.parent.red)
+                    self.set_color(p.parent, False)
+                    self.set_color(w.right, False)
                     self.left_rotation(p.parent)
                     p = self.root
             else:
                 w = p.parent.left
                 if w.red:
                     # Case 1: Sibling (w) is red
-                    w.red = False
-                    p.parent.red = True
+                    if self.stats is not None:
+                        self.stats["delete_case_1"] += 1
+                    self.set_color(w, False)
+                    self.set_color(p.parent, True)
                     self.right_rotation(p.parent)
                     w = p.parent.left
                 if w.right.red == False and w.left.red == False:
                     # Case 2: Both children of sibling are black
-                    w.red = True
+                    if self.stats is not None:
+                        self.stats["delete_case_2"] += 1
+                    self.set_color(w, True)
                     p = p.parent
                 else:
                     if w.left.red == False:
                         # Case 3: Left child of sibling is black
-                        w.right.red = False
-                        w.red = True
+                        if self.stats is not None:
+                            self.stats["delete_case_3"] += 1
+                        self.set_color(w.right, False)
+                        self.set_color(w, True)
                         self.left_rotation(w)
                         w = p.parent.left
-                    w.red = p.parent.red
-                    p.parent.red = False
-                    w.left.red = False
+                    # Case 4: Far child of sibling is red
+                    if self.stats is not None:
+                        self.stats["delete_case_4"] += 1
+                    self.set_color(w, p.parent.red)
+                    self.set_color(p.parent, False)
+                    self.set_color(w.left, False)
                     self.right_rotation(p.parent)
                     p = self.root
 
-        p.red = False  # Set the color of the node to black after balancing
-        # Store red-black node colors after deletion in dict_b
-        dict_b = {}
-        list1 = []
+        self.set_color(p, False)  # Set the color of the node to black after balancing
+
+    # Insert book node in one pass from the root, returns False if the book ID is already in the tree
+    # On the way down every black node with two red children is split: it turns red and its children black, and
+    # if its parent is red too, one or two rotations at the grandparent fix the pair. The new leaf then needs at
+    # most one more such fix, so nothing walks back up through the parents. Since nodes are split before it is
+    # known whether they had to be, a top-down insert recolors more nodes than a bottom-up one. Every recolor
+    # counts as a color flip, three for a split below the root, two for its children at the root and two for a fix.
+    def insert_top_down(self, val):
+        nil = self.nil
+        bookID = val.bookID
+        parent = None
         node = self.root
-        list1.append(node)
-        while list1:
-            current = list1.pop(0)
-            dict_b[current.val.bookID] = 1 if current.red else 0
-            if current.left:
-                list1.append(current.left)
-            if current.right:
-                list1.append(current.right)
-        # Compare red-black node colors before and after deletion
-        diff = {p: dict_a[p] == dict_b[p] for p in dict_a if p in dict_b}
-        counter = 0
-        # Count the color flips
-        for ele in diff.values():
-            if ele == False:
-                counter += 1
-        self.color_flip_count += counter
+        if node != nil:
+            node.size += 1
+        # Every node on the path down to node has its size already counting the new book
+        while node != nil:
+            left = node.left
+            right = node.right
+            if left.red and right.red:
+                left.red = False
+                right.red = False
+                if parent is None:
+                    self.color_flip_count += 2
+                else:
+                    node.red = True
+                    self.color_flip_count += 3
+                    if parent.red:
+                        self.fix_red_pair(node)
+                        parent = node.parent
+            key = node.val.bookID
+            if bookID < key:
+                parent = node
+                node = node.left
+            elif bookID > key:
+                parent = node
+                node = node.right
+            else:
+                # Undo the size updates, the splits on the way leave a valid tree
+                self.decrement_sizes(node)
+                return False
+            if node != nil:
+                node.size += 1
+
+        inserted_node = Red_Black_Node(val)
+        inserted_node.red = parent is not None
+        inserted_node.left = nil
+        inserted_node.right = nil
+        inserted_node.parent = parent
+        if parent is None:
+            self.root = inserted_node
+        elif bookID < parent.val.bookID:
+            parent.left = inserted_node
+        else:
+            parent.right = inserted_node
+        if parent is not None and parent.red:
+            self.fix_red_pair(inserted_node)
+        return True
+
+    # Fix a red node with a red parent by rotating at the grandparent, which is black
+    # Sizes of the nodes moved off the search path are recomputed from their children by the rotations.
+    def fix_red_pair(self, node):
+        parent = node.parent
+        grandparent = parent.parent
+        if parent == grandparent.left:
+            if node == parent.right:
+                self.left_rotation(parent)
+                parent = node
+            parent.red = False
+            grandparent.red = True
+            self.right_rotation(grandparent)
+        else:
+            if node == parent.left:
+                self.right_rotation(parent)
+                parent = node
+            parent.red = False
+            grandparent.red = True
+            self.left_rotation(grandparent)
+        self.color_flip_count += 2
+
+    # Delete a node in one pass from the root
+    # On the way down the current node is made red, by a rotation or by recoloring it and its sibling, so the
+    # node finally unlinked, the node itself or its predecessor, is red and removing it needs no fix-up. The
+    # predecessor then takes the place of the deleted node, so nodes keep their books.
+    def delete_top_down(self, target):
+        nil = self.nil
+        bookID = target.val.bookID
+        self.color_changes = {}
+        parent = None
+        went_right = False  # Side of parent that node is on
+        node = self.root
+        while True:
+            key = node.val.bookID
+            # Past the target the search goes on to its predecessor
+            go_right = key < bookID
+            child = node.right if go_right else node.left
+            if not node.red and not child.red:
+                other = node.left if go_right else node.right
+                if other.red:
+                    # Rotate the red child on the other side above node, which turns red
+                    if go_right:
+                        self.right_rotation(node)
+                    else:
+                        self.left_rotation(node)
+                    self.set_color(node, True)
+                    self.set_color(other, False)
+                    parent = other
+                elif parent is not None:
+                    sibling = parent.left if went_right else parent.right
+                    if sibling != nil:
+                        near = sibling.right if went_right else sibling.left
+                        far = sibling.left if went_right else sibling.right
+                        if not near.red and not far.red:
+                            # Merge node, its parent and its sibling
+                            self.set_color(parent, False)
+                            self.set_color(sibling, True)
+                            self.set_color(node, True)
+                        else:
+                            # Borrow a red nephew from the sibling
+                            if near.red:
+                                if went_right:
+                                    self.left_rotation(sibling)
+                                    self.right_rotation(parent)
+                                else:
+                                    self.right_rotation(sibling)
+                                    self.left_rotation(parent)
+                                top = near
+                            else:
+                                if went_right:
+                                    self.right_rotation(parent)
+                                else:
+                                    self.left_rotation(parent)
+                                top = sibling
+                            self.set_color(node, True)
+                            self.set_color(top, True)
+                            self.set_color(top.left, False)
+                            self.set_color(top.right, False)
+            if child == nil:
+                break
+            parent = node
+            node = child
+            went_right = go_right
+
+        # Unlink node, which has at most one child
+        self.decrement_sizes(node.parent)
+        self.reposition(node, node.left if node.right == nil else node.right)
+        if node is not target:
+            self.reposition(target, node)
+            node.left = target.left
+            node.left.parent = node
+            node.right = target.right
+            node.right.parent = node
+            node.size = target.size
+            self.set_color(node, target.red)
+        if self.root != nil:
+            self.set_color(self.root, False)
+        self.color_changes.pop(target, None)
+        self.count_color_changes()
 
     # Find node for given book ID
     def search(self, val):
         # Search for a node with a given book ID
         val = int(val)
+        cache = self.lookup_cache
+        if cache is not None:
+            node = cache.get(val)
+            if node is not None:
+                return node
         current = self.root
         while current != self.nil and val != current.val.bookID:
             if val < current.val.bookID:
@@ -350,8 +868,15 @@ class Red_Black_Tree:
         if current == self.nil:
             return None
         else:
+            if cache is not None:
+                cache.put(val, current)
             return current
 
+    # Find the book with the given ID, or None if it is not in the tree
+    def get(self, val):
+        node = self.search(val)
+        return node.val if node is not None else None
+
     # Reposition a node
     def reposition(self, u, v):
         if u.parent is None:
@@ -368,382 +893,4136 @@ class Red_Black_Tree:
             p = p.left
         return p
 
-class Reservation_Node:
-    def __init__(self, patronID, priorityNum, timeOfReservation):
-        self.patronID = patronID
-        self.priority = priorityNum
-        self.timeOfReservation = timeOfReservation
-
-
-class Binary_Min_Heap:
-    def __init__(self):
-        # Initialize a Binary Min Heap
-        self.heap = []
-
-    def __iter__(self):
-        # Allow iteration over the heap elements
-        return iter(self.heap)
-
-    def insert(self, element):
-        # Insert an element into the heap and perform upward heapification
-        self.heap.append(element)
-        self.upward_heapify(len(self.heap) - 1)
+    # Number of books in the tree
+    def __len__(self):
+        return self.root.size
 
-    def pop(self):
-        # Remove and return the minimum element from the heap and perform downward heapification
-        if not self.heap:
-            return None
-        if len(self.heap) == 1:
-            return self.heap.pop()
-        top = self.heap[0]
-        self.heap[0] = self.heap.pop()
-        self.downward_heapify()
-        return top
-
-    def return_elements(self):
-        # Return all elements in the heap
-        return self.heap
-
-    def swap(self, i, j):
-        self.heap[i], self.heap[j] = self.heap[j], self.heap[i]
-
-    def remove_min(self):
-        # Remove and return the minimum element from the heap and perform heapification
-        if not self.heap:
-            return None
-        min_element = self.heap[0]
-        last_element = self.heap.pop()
-        if self.heap:
-            self.heap[0] = last_element
-            self.downward_heapify()
-        return min_element
+    # Number of nodes on the longest path from the root to a leaf
+    def height(self):
+        height = 0
+        stack = [(self.root, 1)] if self.root != self.nil else []
+        while stack:
+            node, depth = stack.pop()
+            height = max(height, depth)
+            if node.left != self.nil:
+                stack.append((node.left, depth + 1))
+            if node.right != self.nil:
+                stack.append((node.right, depth + 1))
+        return height
 
-    def upward_heapify(self, current_index):
-        # # Perform upward heapification to maintain heap properties
-        while current_index > 0:
-            parent_index = (current_index - 1) // 2
-            if self.heap[parent_index][0]> self.heap[current_index][0] or (
-                    self.heap[parent_index][0] == self.heap[current_index][0] and
-                    self.heap[parent_index][2] > self.heap[current_index][2]):
-                self.swap(parent_index, current_index)
-                current_index = parent_index
-            else:
-                break
-    
-    def downward_heapify(self):
-        # Perform downward heapification to maintain heap properties
-        current_index = 0
-        while True:
-            left_child_index = 2 * current_index + 1
-            right_child_index = 2 * current_index + 2
-            smallest = current_index
+    # Number of black nodes on every path from the root to a leaf
+    def black_height(self):
+        count = 0
+        node = self.root
+        while node != self.nil:
+            if not node.red:
+                count += 1
+            node = node.left
+        return count
 
-            if left_child_index < len(self.heap) and (
-                    self.heap[left_child_index][0] < self.heap[smallest][0] or (
-                    self.heap[left_child_index][0] == self.heap[smallest][0] and
-                    self.heap[left_child_index][2] < self.heap[smallest][2])):
-                smallest = left_child_index
+    # Yield the books in the tree in order of book ID
+    def values(self):
+        for node in self.inorder_nodes():
+            yield node.val
 
-            if right_child_index < len(self.heap) and (
-                    self.heap[right_child_index][0] < self.heap[smallest][0] or (
-                    self.heap[right_child_index][0] == self.heap[smallest][0] and
-                    self.heap[right_child_index][2] < self.heap[smallest][2])):
-                smallest = right_child_index
+    # Yield (book, red) for every node in preorder, which determines the shape of the tree
+    def preorder_values(self):
+        stack = [self.root] if self.root != self.nil else []
+        while stack:
+            node = stack.pop()
+            yield node.val, node.red
+            if node.right != self.nil:
+                stack.append(node.right)
+            if node.left != self.nil:
+                stack.append(node.left)
 
-            if smallest != current_index:
-                self.swap(current_index, smallest)
-                current_index = smallest
+    # Rebuild the tree from (book, red) pairs in preorder, as produced by preorder_values
+    def restore_preorder(self, entries):
+        self.root = self.nil
+        if self.lookup_cache is not None:
+            self.lookup_cache.clear()
+        nodes = []
+        stack = []
+        for val, red in entries:
+            node = Red_Black_Node(val)
+            node.red = red
+            node.left = self.nil
+            node.right = self.nil
+            if not stack:
+                self.root = node
+            elif val.bookID < stack[-1].val.bookID:
+                stack[-1].left = node
+                node.parent = stack[-1]
             else:
-                break
+                # The parent is the last node on the stack with a smaller ID
+                parent = stack.pop()
+                while stack and stack[-1].val.bookID < val.bookID:
+                    parent = stack.pop()
+                parent.right = node
+                node.parent = parent
+            stack.append(node)
+            nodes.append(node)
+        # Every node comes after its descendants in reverse preorder
+        for node in reversed(nodes):
+            node.size = node.left.size + node.right.size + 1
 
-# Represents the library system
-class Library_System:
-    def __init__(self):
-        # Initialize the Library System with a Red-Black Tree for books and an empty patrons dictionary
-        self.book_tree = Red_Black_Tree()
-        self.patrons = {}
-        
-    def add_book(self, bookID, bookName, authorName, availabilityStatus):
-        # Add a new book to the library
-        new_book = Book_Node(bookID, bookName, authorName, availabilityStatus)
-        self.book_tree.insert(new_book)
-        
-    def search_book(self, node, bookID):
-        # Search for a particular book
-        while node != None and bookID != node.bookID:
-            if bookID < node.bookID:
+    # Yield the nodes of the tree, or of the subtree under a node, in order of book ID
+    def inorder_nodes(self, node=None):
+        stack = []
+        if node is None:
+            node = self.root
+        while stack or node != self.nil:
+            if node != self.nil:
+                stack.append(node)
                 node = node.left
             else:
+                node = stack.pop()
+                yield node
                 node = node.right
-        return node
 
-    def color_flip_count(self):
-        # Return the count of color flips in the book tree
-        return self.book_tree.color_flip_count
+    # Nodes of the tree for Ordered_Catalog.bulk_insert
+    def sorted_entries(self):
+        for node in self.inorder_nodes():
+            yield node.val.bookID, node
 
-    def insert_book(self, bookID, bookName, authorName, availabilityStatus, borrowedBy=None,
-                    reservation_heap=None):
-        new_book = Book_Node(bookID, bookName, authorName, availabilityStatus)
-        new_book.availabilityStatus = availabilityStatus
-        new_book.borrowedBy = borrowedBy
-        if reservation_heap:
-            new_book.reservationHeap.heap = reservation_heap
-        self.book_tree.insert(new_book)
+    def new_entry(self, val):
+        return Red_Black_Node(val)
 
-    def return_book(self, patronID, bookID):
-        # Book returned after borrowing
-        node = self.book_tree.search(bookID)
-        opLine = ''
-        if node is not None and node.val.availabilityStatus == '"No"' and node.val.borrowedBy == patronID:
-            if len(node.val.reservationHeap.heap) > 0:
-                reserved_patron_id = node.val.reservationHeap.heap.pop(0)
-                node.val.borrowedBy = reserved_patron_id[1]
-                opLine = f"Book {bookID} Returned by Patron {patronID}\n" \
-                f"Book {bookID} Allotted to Patron {node.val.borrowedBy}" 
-            else:
-                node.val.availabilityStatus = '"Yes"'
-                node.val.borrowedBy = None
-                opLine = f"Book {bookID} Returned by Patron {patronID}"
+    # Rebuild the tree of a bulk insert in O(n) with the nodes on the deepest level colored red
+    # Counts one color flip per existing node whose color changed, like delete, while the new nodes are not counted.
+    def rebuild(self, nodes, existing):
+        original_colors = [node.red for node in existing]
+        self.root = self.build_balanced(nodes, 0, len(nodes) - 1, None, 0, len(nodes).bit_length() - 1)
+        for node, original_red in zip(existing, original_colors):
+            if node.red != original_red:
+                self.color_flip_count += 1
+
+    # Merge a batch of book nodes that is sorted by book ID into the tree with split and join
+    # Books whose ID is already in the tree or repeated in the batch are ignored, as in insert.
+    # The batch is built into a balanced tree, which is then merged in O(m log(n / m + 1)) for m new books.
+    # Parts of the batch of up to UNION_INSERT_SIZE books are inserted node by node, and batches of at least
+    # 2/3 of the tree size go to bulk_insert. Either way one color flip is counted per existing node whose color
+    # changed, like delete. Returns the inserted books.
+    def union(self, vals):
+        batch = unique_batch(vals)
+        if not batch:
+            return []
+        if 3 * len(batch) >= 2 * self.root.size:
+            # For batches this large the linear rebuild of bulk_insert is faster
+            return self.bulk_insert(batch)
+        nodes = [self.new_entry(val) for val in batch]
+        other = self.build_balanced(nodes, 0, len(nodes) - 1, None, 0, len(nodes).bit_length() - 1)
+        self.color_changes = {}
+        inserted = []
+        root, _ = self.union_subtrees(self.root, self.subtree_black_height(self.root),
+                                      other, self.subtree_black_height(other), inserted)
+        self.set_root(root)
+        for node in nodes:
+            self.color_changes.pop(node, None)
+        self.count_color_changes()
+        inserted.sort(key=lambda val: val.bookID)
+        return inserted
+
+    # Union of two subtrees, the nodes of the second whose ID is in the first are dropped
+    def union_subtrees(self, root1, black_height1, root2, black_height2, inserted):
+        if root2 == self.nil:
+            return root1, black_height1
+        if root1 == self.nil:
+            inserted.extend(node.val for node in self.inorder_nodes(root2))
+            return root2, black_height2
+        if root2.size <= UNION_INSERT_SIZE:
+            # Splitting for a few books costs more than inserting them
+            for node in list(self.inorder_nodes(root2)):
+                root1, black_height1 = self.insert_into_subtree(root1, black_height1, node, inserted)
+            return root1, black_height1
+        child_black_height = black_height2 if root2.red else black_height2 - 1
+        left2, right2 = self.detach_children(root2)
+        left1, left_black_height1, found, right1, right_black_height1 = self.split(root1, black_height1,
+                                                                                  root2.val.bookID)
+        if found is None:
+            middle = root2
+            inserted.append(root2.val)
         else:
-            opLine = f"Book {bookID} cannot be returned by Patron {patronID}."
-        return opLine
+            middle = found
+        left, left_black_height = self.union_subtrees(left1, left_black_height1, left2, child_black_height,
+                                                      inserted)
+        right, right_black_height = self.union_subtrees(right1, right_black_height1, right2,
+                                                        child_black_height, inserted)
+        return self.join(left, left_black_height, middle, right, right_black_height)
 
-    def delete_book(self, bookID):
-        # delete book node
-        node = self.book_tree.search(bookID)
-        if node is not None:
-            if node.val.reservationHeap.heap:
-                reservationHeap = node.val.get_reservationHeap()
-                self.cancel_reservations(bookID, reservationHeap)
-                opLine = f"Book {bookID} is no longer available. Reservations made by Patrons {', '.join(str(reservation) for reservation in reservationHeap)} have been cancelled!"
-            else:
-                opLine = f"Book {bookID} is no longer available."
-            self.book_tree.delete(bookID)
+    # Insert a node into the subtree under root unless its book ID is there, fixing colors with set_color
+    # Returns the root and the black height of the subtree.
+    def insert_into_subtree(self, root, black_height, node, inserted):
+        if root.red:
+            self.set_color(root, False)
+            black_height += 1
+        bookID = node.val.bookID
+        parent = None
+        current = root
+        while current != self.nil:
+            if bookID == current.val.bookID:
+                return root, black_height
+            parent = current
+            current = current.left if bookID < current.val.bookID else current.right
+        node.left = self.nil
+        node.right = self.nil
+        node.size = 1
+        node.parent = parent
+        inserted.append(node.val)
+        if parent is None:
+            self.set_color(node, False)
+            return node, 1
+        if bookID < parent.val.bookID:
+            parent.left = node
         else:
-            opLine = f"Book {bookID} not found in the library."
-        return opLine
-    
-    def borrow_book(self, patronID, bookID, patron_reservation_priority):
-        node = self.book_tree.search(bookID)
-        if node is not None:
-            if node.val.availabilityStatus == '"Yes"':
-                node.val.availabilityStatus = '"No"'
-                node.val.borrowedBy = patronID
-                self.patrons
-                return f"Book {bookID} Borrowed by Patron {patronID}"
+            parent.right = node
+        ancestor = parent
+        while ancestor is not None:
+            ancestor.size += 1
+            ancestor = ancestor.parent
+        self.set_color(node, True)
+        saved_root = self.root
+        self.root = root
+        self.balance_after_join(node)
+        root = self.root
+        self.root = saved_root
+        if root.red:
+            self.set_color(root, False)
+            black_height += 1
+        return root, black_height
 
-            else:
-                reservation_added = node.val.make_a_reservation(patronID, patron_reservation_priority)
-                if reservation_added == "Waitlist full":
-                    return f"Waitlist for Book {bookID} is full. Cannot add reservation for Patron {patronID}"
-                else:
-                    return f"Book {bookID} Reserved by Patron {patronID}"
+    # Delete the books with IDs in the range with two splits and a join, returns them in order of book ID
+    # The cut out subtree is dropped whole, so the work is O(log n) however many books are deleted, and the
+    # returned Deleted_Range walks the subtree only when it is iterated. Counts one color flip per remaining
+    # node whose color changed, like delete.
+    def delete_range(self, book_id1, book_id2):
+        if book_id1 > book_id2 or self.root == self.nil:
+            return []
+        self.color_changes = {}
+        left, left_black_height, found, rest, rest_black_height = self.split(
+            self.root, self.subtree_black_height(self.root), book_id1)
+        if found is not None:
+            rest, rest_black_height = self.join(self.nil, 0, found, rest, rest_black_height)
+        middle, middle_black_height, found, right, right_black_height = self.split(rest, rest_black_height,
+                                                                                  book_id2)
+        if found is not None:
+            middle, _ = self.join(middle, middle_black_height, found, self.nil, 0)
+        if left == self.nil:
+            root = right
+        elif right == self.nil:
+            root = left
         else:
-            return f"Book {bookID} is not available for borrowing."
+            # The smallest node on the right joins the two sides
+            first = self.get_minimum(right)
+            _, _, first, right, right_black_height = self.split(right, right_black_height, first.val.bookID)
+            root, _ = self.join(left, left_black_height, first, right, right_black_height)
+        self.set_root(root)
+        # The recolored nodes of the cut out subtree left the tree, only O(log n) nodes were recolored
+        self.color_changes = {node: red for node, red in self.color_changes.items()
+                              if not book_id1 <= node.val.bookID <= book_id2}
+        self.count_color_changes()
+        if self.lookup_cache is not None:
+            self.lookup_cache.discard_range(book_id1, book_id2)
+        return Deleted_Range(middle.size, (node.val for node in self.inorder_nodes(middle)))
 
-    def cancel_reservations(self, bookID, patrons):
-        for patronID in patrons:
-            patron = self.patrons.get(patronID, None)
-            if patron is not None:
-                patron.cancel_reservation(bookID)
-    
-    def print_book(self, bookID):
-        # Print details of a specific book
-        node = self.book_tree.search(bookID)
-        if node is not None:
-            patron_ids = [patronID[1] for patronID in node.val.reservationHeap.heap]
-            details = (
-                f"BookID = {node.val.bookID}\n"
-                f"Title = {node.val.bookName}\n"
-                f"Author = {node.val.authorName}\n"
-                f"Availability = {node.val.availabilityStatus}\n"
-                f"BorrowedBy = {node.val.borrowedBy}\n"
-                f"Reservations = {patron_ids}"
-            )
-            return details
+    # Split the subtree under a node into the subtrees of the books with smaller and larger IDs
+    # Returns (left root, left black height, node with the ID or None, right root, right black height).
+    def split(self, node, black_height, bookID):
+        if node == self.nil:
+            return self.nil, 0, None, self.nil, 0
+        node = self.writable(node)
+        child_black_height = black_height if node.red else black_height - 1
+        left, right = self.detach_children(node)
+        if bookID == node.val.bookID:
+            return left, child_black_height, node, right, child_black_height
+        if bookID < node.val.bookID:
+            left, left_black_height, found, rest, rest_black_height = self.split(left, child_black_height, bookID)
+            right, right_black_height = self.join(rest, rest_black_height, node, right, child_black_height)
         else:
-            return (f"Book {bookID} not found in the library.")
+            rest, rest_black_height, found, right, right_black_height = self.split(right, child_black_height,
+                                                                                  bookID)
+            left, left_black_height = self.join(left, child_black_height, node, rest, rest_black_height)
+        return left, left_black_height, found, right, right_black_height
 
-    def print_books(self, node, book_id1, book_id2):
-        # Print details of multiple books
-        book_details = []
-        def process_book(book_node):
-            patron_ids = [patronID[1] for patronID in book_node.val.reservationHeap.heap]
-            details = (
-                f"BookID = {book_node.val.bookID}\n"
-                f"Title = {book_node.val.bookName}\n"
-                f"Author = {book_node.val.authorName}\n"
-                f"Availability = {book_node.val.availabilityStatus}\n"
-                f"BorrowedBy = {book_node.val.borrowedBy}\n"
-                f"Reservations = {patron_ids}"
-            )
-            book_details.append(details)
-        def inorder_traversal(node):
-            nonlocal book_details
-            if node is not None:
-                inorder_traversal(node.left)
-                if isinstance(node.val, Book_Node) and book_id1 <= node.val.bookID <= book_id2:
-                    process_book(node)
-                inorder_traversal(node.right)
-        inorder_traversal(node)
-        return book_details
+    # Join two subtrees and a node whose ID lies between theirs into one subtree, in O(difference of heights)
+    # The node goes to the spine of the higher subtree where the black heights meet, then the red-red
+    # violation is fixed upwards. Returns the root and the black height of the result.
+    def join(self, left, left_black_height, middle, right, right_black_height):
+        if left.red:
+            self.set_color(left, False)
+            left_black_height += 1
+        if right.red:
+            self.set_color(right, False)
+            right_black_height += 1
+        if left_black_height == right_black_height:
+            self.attach_children(middle, left, right)
+            middle.parent = None
+            self.set_color(middle, False)
+            return middle, left_black_height + 1
 
-    def get_book_details(self, node):
-        patron_ids = [patronID[1] for patronID in node.val.reservationHeap.heap]
-        return (
-            f"BookID = {node.val.bookID}\n"
-            f"Title = {node.val.bookName}\n"
-            f"Author = {node.val.authorName}\n"
-            f"Availability = {node.val.availabilityStatus}\n"
-            f"BorrowedBy = {node.val.borrowedBy}\n"
-            f"Reservations = {patron_ids}"
-        )
-        
-    def find_closest_book(self, node, target_id):
-        closest_lower, closest_higher = self.find_closest_book_helper(node, target_id)
-
-        book_details = []
-
-        if closest_lower is not None and closest_higher is not None:
-            distance_lower = abs(target_id - closest_lower.val.bookID)
-            distance_higher = abs(target_id - closest_higher.val.bookID)
-
-            if distance_lower < distance_higher:
-                details = self.get_book_details(closest_lower)
-                book_details.append(details)
-            elif distance_higher < distance_lower:
-                details = self.get_book_details(closest_higher)
-                book_details.append(details)
-            else:
-                if closest_lower.val.bookID == closest_higher.val.bookID:
-                    details = self.get_book_details(closest_lower)
-                    book_details.append(details)
-                else :
-                    details1 = self.get_book_details(closest_lower)
-                    details2 = self.get_book_details(closest_higher)
-                    book_details.append(details1)
-                    book_details.append(details2)
-
-        elif closest_lower is not None:
-            details = self.get_book_details(closest_lower)
-            book_details.append(details)
-        elif closest_higher is not None:
-            details = self.get_book_details(closest_higher)
-            book_details.append(details)
+        if left_black_height > right_black_height:
+            # The black node on the right spine of left with the black height of right
+            top, black_height = left, left_black_height
+            parent, node = None, left
+            while node.red or black_height > right_black_height:
+                if not node.red:
+                    black_height -= 1
+                parent, node = node, node.right
+            self.attach_children(middle, node, right)
+            parent.right = middle
+            black_height = left_black_height
+        else:
+            top, black_height = right, right_black_height
+            parent, node = None, right
+            while node.red or black_height > left_black_height:
+                if not node.red:
+                    black_height -= 1
+                parent, node = node, node.left
+            self.attach_children(middle, left, node)
+            parent.left = middle
+            black_height = right_black_height
+        middle.parent = parent
+        self.set_color(middle, True)
+        ancestor = parent
+        while ancestor is not None:
+            ancestor.size += middle.size - node.size
+            ancestor = ancestor.parent
 
-        return book_details
+        # Rotations at the top of the subtree set self.root, which is restored afterwards
+        root = self.root
+        self.root = top
+        self.balance_after_join(middle)
+        top = self.root
+        self.root = root
+        if top.red:
+            self.set_color(top, False)
+            black_height += 1
+        return top, black_height
 
-    def find_closest_book_helper(self, node, target_id, closest_lower=None, closest_higher=None):
-        while node.val.bookID != 0:
-            if node.val.bookID == target_id:
-                return node, node
-            elif node.val.bookID < target_id:
-                closest_lower = node
-                node = node.right
+    # Fix a red node with a red parent after a join, recoloring with set_color
+    def balance_after_join(self, node):
+        while node.parent is not None and node.parent.red:
+            parent = node.parent
+            grandparent = parent.parent
+            if parent == grandparent.left:
+                uncle = grandparent.right
+                if uncle.red:
+                    self.set_color(parent, False)
+                    self.set_color(uncle, False)
+                    self.set_color(grandparent, True)
+                    node = grandparent
+                else:
+                    if node == parent.right:
+                        node = parent
+                        self.left_rotation(node)
+                        parent = node.parent
+                    self.set_color(parent, False)
+                    self.set_color(grandparent, True)
+                    self.right_rotation(grandparent)
             else:
-                closest_higher = node
-                node = node.left
-        return closest_lower, closest_higher
-    
-    def quit(self):
-        # Exit the library system
-        exit()
+                uncle = grandparent.left
+                if uncle.red:
+                    self.set_color(parent, False)
+                    self.set_color(uncle, False)
+                    self.set_color(grandparent, True)
+                    node = grandparent
+                else:
+                    if node == parent.left:
+                        node = parent
+                        self.right_rotation(node)
+                        parent = node.parent
+                    self.set_color(parent, False)
+                    self.set_color(grandparent, True)
+                    self.left_rotation(grandparent)
 
-def main(input_filename):
-    library = Library_System()
-    with open(input_filename, "r") as file:
-        lines = file.readlines()
-        output_lines = []
-
-        def parse_command(command_string):
-            parts = command_string.split('(')
-            command = parts[0].strip()
-
-            if len(parts) > 1:
-                arguments = parts[1].rstrip(')').split(',')
-                arguments = [arg.strip() for arg in arguments]
-                return command, arguments
-            else:
-                return command, []
-
-        for line in lines:
-            list1 = []
-            node = library.book_tree.root
-            list1.append(node)
-            while list1:
-                current = list1.pop(0)
-                if current.left:
-                    list1.append(current.left)
-                if current.right:
-                    list1.append(current.right)
+    # Detach the children of a node, which becomes a single node, and return them as separate subtrees
+    def detach_children(self, node):
+        left, right = node.left, node.right
+        if left != self.nil:
+            left.parent = None
+        if right != self.nil:
+            right.parent = None
+        node.left = self.nil
+        node.right = self.nil
+        node.parent = None
+        node.size = 1
+        return left, right
 
-            line = line.strip()
-            output_line = None
+    def attach_children(self, node, left, right):
+        node.left = left
+        node.right = right
+        if left != self.nil:
+            left.parent = node
+        if right != self.nil:
+            right.parent = node
+        node.size = left.size + right.size + 1
 
-            if line == "Quit()":
-                output_line = f"Program Terminated!!"
-                output_lines.append(output_line)
-                break
+    # Nodes of this tree are changed in place, Persistent_Red_Black_Tree copies the nodes shared with snapshots
+    def writable(self, node):
+        return node
 
-            else:
+    # Make a subtree the whole tree, with a black root
+    def set_root(self, root):
+        self.root = root
+        if root != self.nil:
+            root.parent = None
+            if root.red:
+                self.set_color(root, False)
 
-                command, *args = parse_command(line)
-                args = args[0]
+    # Number of black nodes on every path from a node down to a leaf, counting the node if it is black
+    def subtree_black_height(self, node):
+        count = 0
+        while node != self.nil:
+            if not node.red:
+                count += 1
+            node = node.left
+        return count
 
-                if command == "InsertBook":
-                    bookID, title, author, availabilityStatus = args[0],args[1],args[2],args[3]
-                    library.insert_book(int(bookID), title, author, availabilityStatus, None, None)
+    # Build a balanced subtree from sorted nodes, coloring the nodes at max_depth red
+    def build_balanced(self, nodes, lo, hi, parent, depth, max_depth):
+        if lo > hi:
+            return self.nil
+        mid = (lo + hi) // 2
+        node = nodes[mid]
+        node.parent = parent
+        node.red = depth == max_depth and depth > 0
+        node.left = self.build_balanced(nodes, lo, mid - 1, node, depth + 1, max_depth)
+        node.right = self.build_balanced(nodes, mid + 1, hi, node, depth + 1, max_depth)
+        node.size = hi - lo + 1
+        return node
 
-                elif command == "PrintBook":
-                    bookID = args[0]
-                    output_line = library.print_book(bookID)
+    # Lazily yield the books with IDs in the range, in order of book ID
+    # Only subtrees that can overlap the range are visited, using an explicit stack
+    def values_in_range(self, book_id1, book_id2):
+        stack = []
+        node = self.root
+        while stack or node != self.nil:
+            if node != self.nil:
+                if node.val.bookID >= book_id1:
+                    stack.append(node)
+                    node = node.left
+                else:
+                    node = node.right
+            else:
+                node = stack.pop()
+                if node.val.bookID > book_id2:
+                    return
+                yield node.val
+                node = node.right
 
-                elif command == "PrintBooks":
-                    book_id1, book_id2 = args[0], args[1]
-                    books = library.print_books(library.book_tree.root, int(book_id1), int(book_id2))
-                    all_books = [
-                        f"{book}\n" for book in books]
-                    output_line = '\n'.join(all_books)
+    # Find the book with the largest ID not greater than the given ID
+    def floor(self, bookID):
+        closest = None
+        current = self.root
+        while current != self.nil:
+            if current.val.bookID == bookID:
+                return current.val
+            elif current.val.bookID < bookID:
+                closest = current
+                current = current.right
+            else:
+                current = current.left
+        return closest.val if closest is not None else None
 
-                elif command == "FindClosestBook":
-                    target_id = args[0]
-                    closest_books = library.find_closest_book(library.book_tree.root, int(target_id))
-                    all_closest_books = [
-                        f"{book}\n" for book in closest_books]
-                    output_line = '\n'.join(all_closest_books)
+    # Find the book with the smallest ID not less than the given ID
+    def ceiling(self, bookID):
+        closest = None
+        current = self.root
+        while current != self.nil:
+            if current.val.bookID == bookID:
+                return current.val
+            elif current.val.bookID > bookID:
+                closest = current
+                current = current.left
+            else:
+                current = current.right
+        return closest.val if closest is not None else None
 
-                elif command == "BorrowBook":
-                    patronID, bookID, priority = args[0], args[1], args[2]
-                    output_line = library.borrow_book(int(patronID), int(bookID), int(priority))
+    # Count the books with an ID smaller than the given ID
+    def count_less(self, bookID):
+        count = 0
+        current = self.root
+        while current != self.nil:
+            if bookID <= current.val.bookID:
+                current = current.left
+            else:
+                count += current.left.size + 1
+                current = current.right
+        return count
 
-                elif command == "ReturnBook":
-                    patronID, bookID = args
-                    output_line = library.return_book(int(patronID), int(bookID))
+    # Find the node with the k-th smallest book ID, counting from 1
+    def select(self, k):
+        if k < 1 or k > self.root.size:
+            return None
+        current = self.root
+        while current != self.nil:
+            left_size = current.left.size
+            if k <= left_size:
+                current = current.left
+            elif k == left_size + 1:
+                return current
+            else:
+                k -= left_size + 1
+                current = current.right
+        return None
 
-                elif command == "DeleteBook":
-                    bookID = args[0]
-                    output_line = library.delete_book(int(bookID))
+    # Find the book with the k-th smallest ID, counting from 1
+    def select_value(self, k):
+        node = self.select(k)
+        return node.val if node is not None else None
 
-                elif command == "ColorFlipCount":
-                    output_line = f"Colour Flip Count: {library.book_tree.color_flip_count}"
+# Node of a Persistent_Red_Black_Tree
+# It has no parent link, so the versions of a tree can share it
+class Persistent_Node:
+    __slots__ = ('val', 'red', 'left', 'right', 'size', 'edit', 'val_edit')
 
-            if output_line is not None:
-                output_lines.append(output_line)
-                output_lines.append("\n")
+    def __init__(self, val, edit):
+        self.val = val
+        self.red = False
+        self.left = None
+        self.right = None
+        self.size = 1
+        self.edit = edit  # The edit of the tree that may change this node in place
+        self.val_edit = edit  # The edit that may change the book in place
 
-    try:
-        output_filename = splitext(input_filename)[0] + "_output_file.txt"
-        with open(output_filename, 'w') as output_file:
-            for line in output_lines:
-                output_file.write(str(line) + '\n')
+# Red-Black Tree whose versions share nodes, so taking a snapshot of it is O(1)
+# snapshot() starts a new edit and returns the current version as a tree of its own. After that, inserts and
+# deletes copy the older nodes they would change: the root-to-leaf path, and the siblings they recolor or rotate.
+# Nodes created since the last snapshot are changed in place, so there is no copying without snapshots.
+# The balancing is that of Red_Black_Tree, with the path from the root in place of parent links, so the
+# color flip count is the same. A version is freed as soon as no snapshot refers to it.
+class Persistent_Red_Black_Tree(Red_Black_Tree):
+    def __init__(self):
+        super().__init__()
+        self.edit = object()  # Token of the current edit
+        self.lookup_cache = None  # Path copies replace nodes, so nodes are not cached
+
+    def new_node(self, val):
+        node = Persistent_Node(val, self.edit)
+        node.left = self.nil
+        node.right = self.nil
+        return node
+
+    # The node itself if the current edit owns it, otherwise a copy that the current edit owns
+    def writable(self, node):
+        if node.edit is self.edit:
+            return node
+        copy = Persistent_Node(node.val, self.edit)
+        copy.red = node.red
+        copy.left = node.left
+        copy.right = node.right
+        copy.size = node.size
+        copy.val_edit = node.val_edit
+        return copy
+
+    # Freeze the current version and return it as a separate tree
+    # Changes to either tree afterwards are not seen by the other.
+    def snapshot(self):
+        self.edit = object()
+        version = Persistent_Red_Black_Tree.__new__(Persistent_Red_Black_Tree)
+        version.nil = self.nil
+        version.root = self.root
+        version.color_flip_count = self.color_flip_count
+        version.color_changes = None
+        version.stats = None
+        version.lookup_cache = None
+        version.edit = object()
+        return version
+
+    # Range deletes and merges are those of Red_Black_Tree, with the same rotations and color flips.
+    # split makes the nodes it cuts writable, and join and insert_into_subtree below copy the nodes they
+    # change and fix the colors along the path they came down instead of through parent links.
+    def join(self, left, left_black_height, middle, right, right_black_height):
+        if left.red:
+            left = self.writable(left)
+            self.set_color(left, False)
+            left_black_height += 1
+        if right.red:
+            right = self.writable(right)
+            self.set_color(right, False)
+            right_black_height += 1
+        if left_black_height == right_black_height:
+            self.attach_children(middle, left, right)
+            self.set_color(middle, False)
+            return middle, left_black_height + 1
+
+        path = []
+        if left_black_height > right_black_height:
+            # The black node on the right spine of left with the black height of right
+            black_height = left_black_height
+            parent, node = None, left
+            while node.red or black_height > right_black_height:
+                if not node.red:
+                    black_height -= 1
+                node = self.writable(node)
+                if parent is not None:
+                    parent.right = node
+                path.append(node)
+                parent, node = node, node.right
+            self.attach_children(middle, node, right)
+            parent.right = middle
+            black_height = left_black_height
+        else:
+            black_height = right_black_height
+            parent, node = None, right
+            while node.red or black_height > left_black_height:
+                if not node.red:
+                    black_height -= 1
+                node = self.writable(node)
+                if parent is not None:
+                    parent.left = node
+                path.append(node)
+                parent, node = node, node.left
+            self.attach_children(middle, left, node)
+            parent.left = middle
+            black_height = right_black_height
+        self.set_color(middle, True)
+        for ancestor in path:
+            ancestor.size += middle.size - node.size
+        path.append(middle)
+
+        # Rotations at the top of the subtree set self.root, which is restored afterwards
+        root = self.root
+        self.root = path[0]
+        self.balance_after_join(path)
+        top = self.root
+        self.root = root
+        if top.red:
+            self.set_color(top, False)
+            black_height += 1
+        return top, black_height
+
+    # Fix a red node with a red parent after a join, given the writable path from the top of the subtree to it
+    def balance_after_join(self, path):
+        i = len(path) - 1
+        while i > 0 and path[i - 1].red:
+            node, parent, grandparent = path[i], path[i - 1], path[i - 2]
+            great_grandparent = path[i - 3] if i >= 3 else None
+            if parent is grandparent.left:
+                uncle = grandparent.right
+                if uncle.red:
+                    uncle = self.writable(uncle)
+                    grandparent.right = uncle
+                    self.set_color(parent, False)
+                    self.set_color(uncle, False)
+                    self.set_color(grandparent, True)
+                    i -= 2
+                else:
+                    if node is parent.right:
+                        self.left_rotation(parent, grandparent)
+                        parent = node
+                    self.set_color(parent, False)
+                    self.set_color(grandparent, True)
+                    self.right_rotation(grandparent, great_grandparent)
+                    break
+            else:
+                uncle = grandparent.left
+                if uncle.red:
+                    uncle = self.writable(uncle)
+                    grandparent.left = uncle
+                    self.set_color(parent, False)
+                    self.set_color(uncle, False)
+                    self.set_color(grandparent, True)
+                    i -= 2
+                else:
+                    if node is parent.left:
+                        self.right_rotation(parent, grandparent)
+                        parent = node
+                    self.set_color(parent, False)
+                    self.set_color(grandparent, True)
+                    self.left_rotation(grandparent, great_grandparent)
+                    break
+
+    # Insert a node into the subtree under root unless its book ID is there, see Red_Black_Tree.insert_into_subtree
+    def insert_into_subtree(self, root, black_height, node, inserted):
+        if root.red:
+            root = self.writable(root)
+            self.set_color(root, False)
+            black_height += 1
+        bookID = node.val.bookID
+        current = root
+        while current != self.nil:
+            if bookID == current.val.bookID:
+                return root, black_height
+            current = current.left if bookID < current.val.bookID else current.right
+        node.left = self.nil
+        node.right = self.nil
+        node.size = 1
+        inserted.append(node.val)
+        if root == self.nil:
+            self.set_color(node, False)
+            return node, 1
+        # Make the search path writable, from the root down to the parent of the new node
+        path = []
+        parent = None
+        current = root
+        while current != self.nil:
+            current = self.writable(current)
+            if parent is None:
+                root = current
+            elif bookID < parent.val.bookID:
+                parent.left = current
+            else:
+                parent.right = current
+            current.size += 1
+            path.append(current)
+            parent = current
+            current = current.left if bookID < current.val.bookID else current.right
+        if bookID < parent.val.bookID:
+            parent.left = node
+        else:
+            parent.right = node
+        self.set_color(node, True)
+        path.append(node)
+        saved_root = self.root
+        self.root = root
+        self.balance_after_join(path)
+        root = self.root
+        self.root = saved_root
+        if root.red:
+            self.set_color(root, False)
+            black_height += 1
+        return root, black_height
+
+    # The node must be writable
+    def detach_children(self, node):
+        left, right = node.left, node.right
+        node.left = self.nil
+        node.right = self.nil
+        node.size = 1
+        return left, right
+
+    def attach_children(self, node, left, right):
+        node.left = left
+        node.right = right
+        node.size = left.size + right.size + 1
+
+    def set_root(self, root):
+        if root != self.nil and root.red:
+            root = self.writable(root)
+            self.set_color(root, False)
+        self.root = root
+
+    # Make the nodes on the search path of a book ID writable, returns them from the root down
+    def writable_path(self, bookID):
+        path = []
+        parent = None
+        node = self.root
+        while node != self.nil:
+            node = self.writable(node)
+            if parent is None:
+                self.root = node
+            elif bookID < parent.val.bookID:
+                parent.left = node
+            else:
+                parent.right = node
+            path.append(node)
+            if bookID == node.val.bookID:
+                break
+            parent = node
+            node = node.left if bookID < node.val.bookID else node.right
+        return path
+
+    # The book with the given ID, ready to be changed, or None
+    # A book that a snapshot shares is replaced by a copy first, so the snapshot keeps the book as it was.
+    def writable_value(self, bookID):
+        if self.search(bookID) is None:
+            return None
+        node = self.writable_path(bookID)[-1]
+        if node.val_edit is not self.edit:
+            node.val = node.val.copy()
+            node.val_edit = self.edit
+        return node.val
+
+    # Put new in the place of the child old of parent
+    def replace_child(self, parent, old, new):
+        if parent is None:
+            self.root = new
+        elif old is parent.left:
+            parent.left = new
+        else:
+            parent.right = new
+
+    # Insert book node, returns False if the book ID is already in the tree
+    def insert(self, val):
+        if self.search(val.bookID) is not None:
+            return False
+        path = self.writable_path(val.bookID)
+        for node in path:
+            node.size += 1
+        inserted_node = self.new_node(val)
+        inserted_node.red = True
+        if not path:
+            self.root = inserted_node
+        elif val.bookID < path[-1].val.bookID:
+            path[-1].left = inserted_node
+        else:
+            path[-1].right = inserted_node
+        path.append(inserted_node)
+        self.balance_after_insert(path)
+        return True
+
+    # Delete book node
+    def delete(self, val):
+        if self.search(val) is None:
+            return
+        self.color_changes = {}
+        path = self.writable_path(int(val))
+        r = path.pop()
+        parent = path[-1] if path else None
+        q_original_color = r.red
+        for node in path:
+            node.size -= 1
+        if r.left == self.nil or r.right == self.nil:
+            p = r.right if r.left == self.nil else r.left
+            if p != self.nil:
+                p = self.writable(p)  # It may be recolored by the balancing
+            self.replace_child(parent, r, p)
+        else:
+            # Make the path down to the successor writable
+            r.size -= 1
+            q = self.writable(r.right)
+            r.right = q
+            successor_path = []
+            while q.left != self.nil:
+                q.size -= 1
+                successor_path.append(q)
+                q.left = self.writable(q.left)
+                q = q.left
+            q_original_color = q.red
+            if q.right != self.nil:
+                q.right = self.writable(q.right)
+            p = q.right
+            if successor_path:
+                successor_path[-1].left = q.right
+                q.right = r.right
+            self.replace_child(parent, r, q)
+            q.left = r.left
+            q.size = r.size
+            self.set_color(q, r.red)
+            path.append(q)
+            path.extend(successor_path)
+        path.append(p)
+
+        # Balance the tree after deletion based on the original color
+        if q_original_color == False:
+            self.balance_after_delete(path)
+        self.count_color_changes()
+
+    # Left rotation at node p, whose parent is given
+    def left_rotation(self, p, parent):
+        if self.stats is not None:
+            self.stats["left_rotations"] += 1
+        q = self.writable(p.right)
+        p.right = q.left
+        self.replace_child(parent, p, q)
+        q.left = p
+        q.size = p.size
+        p.size = p.left.size + p.right.size + 1
+
+    # Right rotation at node p, whose parent is given
+    def right_rotation(self, p, parent):
+        if self.stats is not None:
+            self.stats["right_rotations"] += 1
+        q = self.writable(p.left)
+        p.left = q.right
+        self.replace_child(parent, p, q)
+        q.right = p
+        q.size = p.size
+        p.size = p.left.size + p.right.size + 1
+
+    # Balance tree after insertion, given the writable path from the root to the inserted node
+    def balance_after_insert(self, path):
+        i = len(path) - 1
+        while i > 0 and path[i - 1].red:
+            inserted_node, parent, grandparent = path[i], path[i - 1], path[i - 2]
+            great_grandparent = path[i - 3] if i >= 3 else None
+            if parent is grandparent.right:
+                u = grandparent.left  # Uncle
+                if u.red:
+                    # Case 1: Uncle is red
+                    if self.stats is not None:
+                        self.stats["insert_case_1"] += 1
+                    u = self.writable(u)
+                    grandparent.left = u
+                    u.red = False
+                    parent.red = False
+                    grandparent.red = True
+                    if u is self.root or parent is self.root or grandparent is self.root:
+                        self.color_flip_count += 2
+                    else:
+                        self.color_flip_count += 3
+                    i -= 2
+                else:
+                    # Case 2: Uncle is black
+                    if self.stats is not None:
+                        self.stats["insert_case_2"] += 1
+                    if inserted_node is parent.left:
+                        self.right_rotation(parent, grandparent)
+                        parent = inserted_node
+                    parent.red = False
+                    grandparent.red = True
+                    if parent is self.root or grandparent is self.root:
+                        self.color_flip_count += 2 if self.root.red else 1
+                    else:
+                        self.color_flip_count += 2
+                    self.left_rotation(grandparent, great_grandparent)
+                    break
+            else:
+                u = grandparent.right  # Uncle
+                if u.red:
+                    # Case 3: Uncle is red
+                    if self.stats is not None:
+                        self.stats["insert_case_3"] += 1
+                    u = self.writable(u)
+                    grandparent.right = u
+                    u.red = False
+                    parent.red = False
+                    grandparent.red = True
+                    if u is self.root or parent is self.root or grandparent is self.root:
+                        self.color_flip_count += 2
+                    else:
+                        self.color_flip_count += 3
+                    i -= 2
+                else:
+                    # Case 4: Uncle is black
+                    if self.stats is not None:
+                        self.stats["insert_case_4"] += 1
+                    if inserted_node is parent.right:
+                        self.left_rotation(parent, grandparent)
+                        parent = inserted_node
+                    parent.red = False
+                    grandparent.red = True
+                    if parent is self.root or grandparent is self.root:
+                        self.color_flip_count += 2 if self.root.red else 1
+                    else:
+                        self.color_flip_count += 2
+                    self.right_rotation(grandparent, great_grandparent)
+                    break
+
+        self.root.red = False
+
+    # Balance tree after deletion, given the writable path from the root to the node that replaced the deleted one
+    def balance_after_delete(self, path):
+        p = path[-1]
+        while len(path) > 1 and p.red == False:
+            parent = path[-2]
+            grandparent = path[-3] if len(path) > 2 else None
+            if p is parent.left:
+                w = self.writable(parent.right)
+                parent.right = w
+                if w.red:
+                    # Case 1: Sibling (w) is red
+                    if self.stats is not None:
+                        self.stats["delete_case_1"] += 1
+                    self.set_color(w, False)
+                    self.set_color(parent, True)
+                    self.left_rotation(parent, grandparent)
+                    path.insert(len(path) - 2, w)
+                    grandparent = w
+                    w = self.writable(parent.right)
+                    parent.right = w
+                if w.left.red == False and w.right.red == False:
+                    # Case 2: Both children of sibling are black
+                    if self.stats is not None:
+                        self.stats["delete_case_2"] += 1
+                    self.set_color(w, True)
+                    path.pop()
+                    p = parent
+                else:
+                    if w.right.red == False:
+                        # Case 3: Right child of sibling is black
+                        if self.stats is not None:
+                            self.stats["delete_case_3"] += 1
+                        w.left = self.writable(w.left)
+                        self.set_color(w.left, False)
+                        self.set_color(w, True)
+                        self.right_rotation(w, parent)
+                        w = parent.right
+                    # Case 4: Far child of sibling is red
+                    if self.stats is not None:
+                        self.stats["delete_case_4"] += 1
+                    w.right = self.writable(w.right)
+                    self.set_color(w, parent.red)
+                    self.set_color(parent, False)
+                    self.set_color(w.right, False)
+                    self.left_rotation(parent, grandparent)
+                    p = self.root
+                    break
+            else:
+                w = self.writable(parent.left)
+                parent.left = w
+                if w.red:
+                    # Case 1: Sibling (w) is red
+                    if self.stats is not None:
+                        self.stats["delete_case_1"] += 1
+                    self.set_color(w, False)
+                    self.set_color(parent, True)
+                    self.right_rotation(parent, grandparent)
+                    path.insert(len(path) - 2, w)
+                    grandparent = w
+                    w = self.writable(parent.left)
+                    parent.left = w
+                if w.right.red == False and w.left.red == False:
+                    # Case 2: Both children of sibling are black
+                    if self.stats is not None:
+                        self.stats["delete_case_2"] += 1
+                    self.set_color(w, True)
+                    path.pop()
+                    p = parent
+                else:
+                    if w.left.red == False:
+                        # Case 3: Left child of sibling is black
+                        if self.stats is not None:
+                            self.stats["delete_case_3"] += 1
+                        w.right = self.writable(w.right)
+                        self.set_color(w.right, False)
+                        self.set_color(w, True)
+                        self.left_rotation(w, parent)
+                        w = parent.left
+                    # Case 4: Far child of sibling is red
+                    if self.stats is not None:
+                        self.stats["delete_case_4"] += 1
+                    w.left = self.writable(w.left)
+                    self.set_color(w, parent.red)
+                    self.set_color(parent, False)
+                    self.set_color(w.left, False)
+                    self.right_rotation(parent, grandparent)
+                    p = self.root
+                    break
+
+        if p != self.nil:
+            self.set_color(p, False)
+
+    # Rebuild the tree from (book, red) pairs in preorder, as produced by preorder_values
+    def restore_preorder(self, entries):
+        self.edit = object()
+        self.root = self.nil
+        nodes = []
+        stack = []
+        for val, red in entries:
+            node = self.new_node(val)
+            node.red = red
+            if not stack:
+                self.root = node
+            elif val.bookID < stack[-1].val.bookID:
+                stack[-1].left = node
+            else:
+                # The parent is the last node on the stack with a smaller ID
+                parent = stack.pop()
+                while stack and stack[-1].val.bookID < val.bookID:
+                    parent = stack.pop()
+                parent.right = node
+            stack.append(node)
+            nodes.append(node)
+        for node in reversed(nodes):
+            node.size = node.left.size + node.right.size + 1
+
+    # Insert a batch of book nodes that is sorted by book ID, like Red_Black_Tree.bulk_insert
+    # The rebuild works on writable copies of the existing nodes, so snapshots keep their own.
+    def sorted_entries(self):
+        for node in self.inorder_nodes():
+            yield node.val.bookID, self.writable(node)
+
+    def new_entry(self, val):
+        return self.new_node(val)
+
+    # Build a balanced subtree from sorted nodes, coloring the nodes at max_depth red
+    # The nodes have no parent link, parent is only there to match Red_Black_Tree.build_balanced.
+    def build_balanced(self, nodes, lo, hi, parent, depth, max_depth):
+        if lo > hi:
+            return self.nil
+        mid = (lo + hi) // 2
+        node = nodes[mid]
+        node.red = depth == max_depth and depth > 0
+        node.left = self.build_balanced(nodes, lo, mid - 1, None, depth + 1, max_depth)
+        node.right = self.build_balanced(nodes, mid + 1, hi, None, depth + 1, max_depth)
+        node.size = hi - lo + 1
+        return node
+
+# Red-Black Tree that keeps its nodes in typed arrays and refers to them by integer handles
+# It has the same operations and color flip counting as Red_Black_Tree, without one Python object per node.
+# Handle 0 is the nil node, so hot loops test handles for truth instead of comparing with NIL.
+# The handles of deleted nodes are reused through a free list. Keys are a 64-bit array until a book ID does not
+# fit in one, then a list.
+class Array_Red_Black_Tree(Ordered_Catalog):
+    NIL = 0
+
+    def __init__(self, cache=False):
+        # Node fields, indexed by handle
+        self.keys = array('q', [0])
+        self.red = bytearray(1)
+        self.parent = array('l', [0])
+        self.left = array('l', [0])
+        self.right = array('l', [0])
+        self.size = array('l', [0])
+        self.vals = [None]  # Book_Node payloads
+        self.free_head = self.NIL  # First handle of the free list, linked through left
+        self.free_subtrees = []  # Roots of subtrees cut out by delete_range, freed a handle at a time
+        self.root = self.NIL
+        self.color_flip_count = 0  # Counter for counting the color flips
+        self.color_changes = None  # Original colors of nodes recolored during a delete
+        self.stats = None  # Rotation and fix-up case counters, only kept when statistics are enabled
+        # Handles keep their book until they are freed, so cached handles stay valid until deleted
+        self.lookup_cache = Lookup_Cache() if cache else None
+
+    # Allocate a red node for a book, reusing a deleted handle when one is free
+    def new_node(self, val):
+        if self.free_head == self.NIL and self.free_subtrees:
+            # Free the root of a cut out subtree, its children stay in free_subtrees for later allocations
+            node = self.free_subtrees.pop()
+            for child in (self.left[node], self.right[node]):
+                if child != self.NIL:
+                    self.free_subtrees.append(child)
+            self.free_node(node)
+        node = self.free_head
+        try:
+            if node != self.NIL:
+                self.keys[node] = val.bookID
+            else:
+                self.keys.append(val.bookID)
+        except OverflowError:
+            # The book ID does not fit in 64 bits, so the keys are kept in a list from now on, like the object tree
+            self.keys = list(self.keys)
+            return self.new_node(val)
+        if node != self.NIL:
+            self.free_head = self.left[node]
+            self.red[node] = 1
+            self.parent[node] = self.NIL
+            self.left[node] = self.NIL
+            self.right[node] = self.NIL
+            self.size[node] = 1
+            self.vals[node] = val
+        else:
+            node = len(self.vals)
+            self.red.append(1)
+            self.parent.append(self.NIL)
+            self.left.append(self.NIL)
+            self.right.append(self.NIL)
+            self.size.append(1)
+            self.vals.append(val)
+        return node
+
+    # Put the handle of a deleted node on the free list
+    def free_node(self, node):
+        self.vals[node] = None
+        self.left[node] = self.free_head
+        self.free_head = node
+
+    # Insert book node, returns False if the book ID is already in the tree
+    def insert(self, val):
+        keys = self.keys
+        left = self.left
+        right = self.right
+        bookID = val.bookID
+        parent = self.NIL
+        current = self.root
+        # Traverse the tree to find the appropriate position for insertion
+        while current:
+            parent = current
+            if bookID < keys[current]:
+                current = left[current]
+            elif bookID > keys[current]:
+                current = right[current]
+            else:
+                return False  # If the value already exists, do nothing
+
+        inserted_node = self.new_node(val)
+        self.parent[inserted_node] = parent
+        if parent == self.NIL:
+            self.root = inserted_node
+        elif bookID < keys[parent]:
+            left[parent] = inserted_node
+        else:
+            right[parent] = inserted_node
+        # Update the subtree sizes of the ancestors of the inserted node
+        size = self.size
+        parents = self.parent
+        ancestor = parent
+        while ancestor:
+            size[ancestor] += 1
+            ancestor = parents[ancestor]
+        # Balance the tree after insertion
+        self.balance_after_insert(inserted_node)
+        return True
+
+    # Delete book node
+    def delete(self, val):
+        # Find the node to be deleted
+        r = self.search(val)
+        if r is None:
+            return
+        if self.lookup_cache is not None:
+            self.lookup_cache.discard(self.keys[r])
+        left = self.left
+        right = self.right
+        parent = self.parent
+        # Track the original colors of the nodes recolored by this delete
+        self.color_changes = {}
+        q = r
+        q_original_color = self.red[q]
+        # Re-position nodes after deletion
+        if left[r] == self.NIL:
+            p = right[r]
+            self.decrement_sizes(parent[r])
+            self.reposition(r, right[r])
+        elif right[r] == self.NIL:
+            p = left[r]
+            self.decrement_sizes(parent[r])
+            self.reposition(r, left[r])
+        else:
+            q = self.get_minimum(right[r])
+            q_original_color = self.red[q]
+            p = right[q]
+            # The successor is removed from its position, r is one of its ancestors
+            self.decrement_sizes(parent[q])
+            if parent[q] == r:
+                parent[p] = q
+            else:
+                self.reposition(q, right[q])
+                right[q] = right[r]
+                parent[right[q]] = q
+            self.reposition(r, q)
+            left[q] = left[r]
+            parent[left[q]] = q
+            self.size[q] = self.size[r]
+            self.set_color(q, self.red[r])
+
+        # Balance the tree after deletion based on the original color
+        if not q_original_color:
+            self.balance_after_delete(p)
+        self.count_color_changes()
+        self.free_node(r)
+
+    # Decrement the subtree sizes from a node up to the root
+    def decrement_sizes(self, node):
+        size = self.size
+        parent = self.parent
+        while node:
+            size[node] -= 1
+            node = parent[node]
+
+    # Set the color of a node, remembering its color before the current delete
+    def set_color(self, node, red):
+        if self.color_changes is not None and node not in self.color_changes:
+            self.color_changes[node] = self.red[node]
+        self.red[node] = red
+
+    # Count the nodes whose color differs from the color they had before the delete
+    def count_color_changes(self):
+        counter = 0
+        for node, original_red in self.color_changes.items():
+            if node != self.NIL and self.red[node] != original_red:
+                counter += 1
+        self.color_flip_count += counter
+        self.color_changes = None
+
+    # Left rotation at node p
+    def left_rotation(self, p):
+        if self.stats is not None:
+            self.stats["left_rotations"] += 1
+        left = self.left
+        right = self.right
+        parent = self.parent
+        q = right[p]
+        right[p] = left[q]
+        if left[q] != self.NIL:
+            parent[left[q]] = p
+
+        parent[q] = parent[p]
+        if parent[p] == self.NIL:
+            self.root = q
+        elif p == left[parent[p]]:
+            left[parent[p]] = q
+        else:
+            right[parent[p]] = q
+        left[q] = p
+        parent[p] = q
+        self.size[q] = self.size[p]
+        self.size[p] = self.size[left[p]] + self.size[right[p]] + 1
+
+    # Right rotation at node p
+    def right_rotation(self, p):
+        if self.stats is not None:
+            self.stats["right_rotations"] += 1
+        left = self.left
+        right = self.right
+        parent = self.parent
+        q = left[p]
+        left[p] = right[q]
+        if right[q] != self.NIL:
+            parent[right[q]] = p
+
+        parent[q] = parent[p]
+        if parent[p] == self.NIL:
+            self.root = q
+        elif p == right[parent[p]]:
+            right[parent[p]] = q
+        else:
+            left[parent[p]] = q
+        right[q] = p
+        parent[p] = q
+        self.size[q] = self.size[p]
+        self.size[p] = self.size[left[p]] + self.size[right[p]] + 1
+
+    # Balance tree after insertion, counting color flips as Red_Black_Tree does
+    def balance_after_insert(self, inserted_node):
+        red = self.red
+        parent = self.parent
+        while inserted_node != self.root and red[parent[inserted_node]]:
+            p = parent[inserted_node]
+            g = parent[p]
+            if p == self.right[g]:
+                u = self.left[g]  # Uncle
+                if red[u]:
+                    # Case 1: Uncle is red
+                    if self.stats is not None:
+                        self.stats["insert_case_1"] += 1
+                    red[u] = 0
+                    red[p] = 0
+                    red[g] = 1
+                    if u == self.root or p == self.root or g == self.root:
+                        self.color_flip_count += 2
+                    else:
+                        self.color_flip_count += 3
+                    inserted_node = g
+                else:
+                    # Case 2: Uncle is black
+                    if self.stats is not None:
+                        self.stats["insert_case_2"] += 1
+                    if inserted_node == self.left[p]:
+                        inserted_node = p
+                        self.right_rotation(inserted_node)
+                    p = parent[inserted_node]
+                    g = parent[p]
+                    red[p] = 0
+                    red[g] = 1
+                    if p == self.root or g == self.root:
+                        if red[self.root]:
+                            self.color_flip_count += 2
+                        else:
+                            self.color_flip_count += 1
+                    else:
+                        self.color_flip_count += 2
+                    self.left_rotation(g)
+            else:
+                u = self.right[g]  # Uncle - Sibling of parent
+                if red[u]:
+                    # Case 3: Uncle is red
+                    if self.stats is not None:
+                        self.stats["insert_case_3"] += 1
+                    red[u] = 0
+                    red[p] = 0
+                    red[g] = 1
+                    if u == self.root or p == self.root or g == self.root:
+                        self.color_flip_count += 2
+                    else:
+                        self.color_flip_count += 3
+                    inserted_node = g
+                else:
+                    # Case 4: Uncle is black
+                    if self.stats is not None:
+                        self.stats["insert_case_4"] += 1
+                    if inserted_node == self.right[p]:
+                        inserted_node = p
+                        self.left_rotation(inserted_node)
+                    p = parent[inserted_node]
+                    g = parent[p]
+                    red[p] = 0
+                    red[g] = 1
+                    if p == self.root or g == self.root:
+                        if red[self.root]:
+                            self.color_flip_count += 2
+                        else:
+                            self.color_flip_count += 1
+                    else:
+                        self.color_flip_count += 2
+                    self.right_rotation(g)
+
+        red[self.root] = 0  # Set the root node to black after balancing
+
+    # Balance tree after deletion
+    def balance_after_delete(self, p):
+        red = self.red
+        parent = self.parent
+        left = self.left
+        right = self.right
+        while p != self.root and not red[p]:
+            if p == left[parent[p]]:
+                w = right[parent[p]]
+                if red[w]:
+                    # Case 1: Sibling (w) is red
+                    if self.stats is not None:
+                        self.stats["delete_case_1"] += 1
+                    self.set_color(w, 0)
+                    self.set_color(parent[p], 1)
+                    self.left_rotation(parent[p])
+                    w = right[parent[p]]
+                if not red[left[w]] and not red[right[w]]:
+                    # Case 2: Both children of sibling are black
+                    if self.stats is not None:
+                        self.stats["delete_case_2"] += 1
+                    self.set_color(w, 1)
+                    p = parent[p]
+                else:
+                    if not red[right[w]]:
+                        # Case 3: Right child of sibling is black
+                        if self.stats is not None:
+                            self.stats["delete_case_3"] += 1
+                        self.set_color(left[w], 0)
+                        self.set_color(w, 1)
+                        self.right_rotation(w)
+                        w = right[parent[p]]
+                    # Case 4: Far child of sibling is red
+                    if self.stats is not None:
+                        self.stats["delete_case_4"] += 1
+                    self.set_color(w, red[parent[p]])
+                    self.set_color(parent[p], 0)
+                    self.set_color(right[w], 0)
+                    self.left_rotation(parent[p])
+                    p = self.root
+            else:
+                w = left[parent[p]]
+                if red[w]:
+                    # Case 1: Sibling (w) is red
+                    if self.stats is not None:
+                        self.stats["delete_case_1"] += 1
+                    self.set_color(w, 0)
+                    self.set_color(parent[p], 1)
+                    self.right_rotation(parent[p])
+                    w = left[parent[p]]
+                if not red[right[w]] and not red[left[w]]:
+                    # Case 2: Both children of sibling are black
+                    if self.stats is not None:
+                        self.stats["delete_case_2"] += 1
+                    self.set_color(w, 1)
+                    p = parent[p]
+                else:
+                    if not red[left[w]]:
+                        # Case 3: Left child of sibling is black
+                        if self.stats is not None:
+                            self.stats["delete_case_3"] += 1
+                        self.set_color(right[w], 0)
+                        self.set_color(w, 1)
+                        self.left_rotation(w)
+                        w = left[parent[p]]
+                    # Case 4: Far child of sibling is red
+                    if self.stats is not None:
+                        self.stats["delete_case_4"] += 1
+                    self.set_color(w, red[parent[p]])
+                    self.set_color(parent[p], 0)
+                    self.set_color(left[w], 0)
+                    self.right_rotation(parent[p])
+                    p = self.root
+
+        self.set_color(p, 0)  # Set the color of the node to black after balancing
+
+    # Find the handle of the node for given book ID, or None if it is not in the tree
+    def search(self, val):
+        val = int(val)
+        cache = self.lookup_cache
+        if cache is not None:
+            node = cache.get(val)
+            if node is not None:
+                return node
+        keys = self.keys
+        left = self.left
+        right = self.right
+        current = self.root
+        while current and val != keys[current]:
+            if val < keys[current]:
+                current = left[current]
+            else:
+                current = right[current]
+        if not current:
+            return None
+        if cache is not None:
+            cache.put(val, current)
+        return current
+
+    # Find the book with the given ID, or None if it is not in the tree
+    def get(self, val):
+        node = self.search(val)
+        return self.vals[node] if node is not None else None
+
+    # Reposition a node
+    def reposition(self, u, v):
+        pu = self.parent[u]
+        if pu == self.NIL:
+            self.root = v
+        elif u == self.left[pu]:
+            self.left[pu] = v
+        else:
+            self.right[pu] = v
+        self.parent[v] = pu
+
+    # Get the minimum value node in a subtree
+    def get_minimum(self, p):
+        while self.left[p] != self.NIL:
+            p = self.left[p]
+        return p
+
+    # Number of books in the tree
+    def __len__(self):
+        return self.size[self.root]
+
+    # Number of nodes on the longest path from the root to a leaf
+    def height(self):
+        height = 0
+        stack = [(self.root, 1)] if self.root else []
+        while stack:
+            node, depth = stack.pop()
+            height = max(height, depth)
+            if self.left[node]:
+                stack.append((self.left[node], depth + 1))
+            if self.right[node]:
+                stack.append((self.right[node], depth + 1))
+        return height
+
+    # Number of black nodes on every path from the root to a leaf
+    def black_height(self):
+        count = 0
+        node = self.root
+        while node:
+            if not self.red[node]:
+                count += 1
+            node = self.left[node]
+        return count
+
+    # Yield the books in the tree in order of book ID
+    def values(self):
+        for node in self.inorder_nodes():
+            yield self.vals[node]
+
+    # Yield (book, red) for every node in preorder, which determines the shape of the tree
+    def preorder_values(self):
+        stack = [self.root] if self.root else []
+        while stack:
+            node = stack.pop()
+            yield self.vals[node], bool(self.red[node])
+            if self.right[node]:
+                stack.append(self.right[node])
+            if self.left[node]:
+                stack.append(self.left[node])
+
+    # Rebuild the tree from (book, red) pairs in preorder, as produced by preorder_values
+    def restore_preorder(self, entries):
+        stats = self.stats
+        lookup_cache = self.lookup_cache
+        self.__init__()
+        self.stats = stats
+        self.lookup_cache = lookup_cache
+        if lookup_cache is not None:
+            lookup_cache.clear()
+        left = self.left
+        right = self.right
+        parent = self.parent
+        vals = self.vals
+        nodes = []
+        stack = []
+        for val, red in entries:
+            node = self.new_node(val)
+            self.red[node] = red
+            if not stack:
+                self.root = node
+            elif val.bookID < vals[stack[-1]].bookID:
+                left[stack[-1]] = node
+                parent[node] = stack[-1]
+            else:
+                # The parent is the last node on the stack with a smaller ID
+                last = stack.pop()
+                while stack and vals[stack[-1]].bookID < val.bookID:
+                    last = stack.pop()
+                right[last] = node
+                parent[node] = last
+            stack.append(node)
+            nodes.append(node)
+        # Every node comes after its descendants in reverse preorder
+        size = self.size
+        for node in reversed(nodes):
+            size[node] = size[left[node]] + size[right[node]] + 1
+
+    # Yield the node handles of the tree, or of the subtree under a handle, in order of book ID
+    def inorder_nodes(self, node=None):
+        stack = []
+        if node is None:
+            node = self.root
+        while stack or node != self.NIL:
+            if node != self.NIL:
+                stack.append(node)
+                node = self.left[node]
+            else:
+                node = stack.pop()
+                yield node
+                node = self.right[node]
+
+    # Handles of the tree for Ordered_Catalog.bulk_insert, listed first since new nodes change the arrays
+    def sorted_entries(self):
+        keys = self.keys
+        return [(keys[node], node) for node in self.inorder_nodes()]
+
+    def new_entry(self, val):
+        return self.new_node(val)
+
+    # Rebuild the tree of a bulk insert, see Red_Black_Tree.rebuild
+    def rebuild(self, nodes, existing):
+        red = self.red
+        original_colors = [red[node] for node in existing]
+        self.root = self.build_balanced(nodes, 0, len(nodes) - 1, self.NIL, 0, len(nodes).bit_length() - 1)
+        for node, original_red in zip(existing, original_colors):
+            if red[node] != original_red:
+                self.color_flip_count += 1
+
+    # Build a balanced subtree from sorted handles, coloring the nodes at max_depth red
+    def build_balanced(self, nodes, lo, hi, parent, depth, max_depth):
+        if lo > hi:
+            return self.NIL
+        mid = (lo + hi) // 2
+        node = nodes[mid]
+        self.parent[node] = parent
+        self.red[node] = depth == max_depth and depth > 0
+        self.left[node] = self.build_balanced(nodes, lo, mid - 1, node, depth + 1, max_depth)
+        self.right[node] = self.build_balanced(nodes, mid + 1, hi, node, depth + 1, max_depth)
+        self.size[node] = hi - lo + 1
+        return node
+
+    # Merge a sorted batch of books into the tree with split and join, see Red_Black_Tree.union
+    # The handles of books whose ID was already in the tree are freed.
+    def union(self, vals):
+        batch = unique_batch(vals)
+        if not batch:
+            return []
+        if 3 * len(batch) >= 2 * self.size[self.root]:
+            # For batches this large the linear rebuild of bulk_insert is faster
+            return self.bulk_insert(batch)
+        nodes = [self.new_node(val) for val in batch]
+        other = self.build_balanced(nodes, 0, len(nodes) - 1, self.NIL, 0, len(nodes).bit_length() - 1)
+        self.color_changes = {}
+        inserted = []
+        root, _ = self.union_subtrees(self.root, self.subtree_black_height(self.root),
+                                      other, self.subtree_black_height(other), inserted)
+        self.set_root(root)
+        for node in nodes:
+            self.color_changes.pop(node, None)
+        self.count_color_changes()
+        inserted_books = set(map(id, inserted))
+        for node in nodes:
+            if id(self.vals[node]) not in inserted_books:
+                self.free_node(node)
+        inserted.sort(key=lambda val: val.bookID)
+        return inserted
+
+    # Union of two subtrees, the nodes of the second whose ID is in the first are dropped
+    def union_subtrees(self, root1, black_height1, root2, black_height2, inserted):
+        if root2 == self.NIL:
+            return root1, black_height1
+        if root1 == self.NIL:
+            inserted.extend(self.vals[node] for node in self.inorder_nodes(root2))
+            return root2, black_height2
+        if self.size[root2] <= UNION_INSERT_SIZE:
+            # Splitting for a few books costs more than inserting them
+            for node in list(self.inorder_nodes(root2)):
+                root1, black_height1 = self.insert_into_subtree(root1, black_height1, node, inserted)
+            return root1, black_height1
+        child_black_height = black_height2 if self.red[root2] else black_height2 - 1
+        left2, right2 = self.detach_children(root2)
+        left1, left_black_height1, found, right1, right_black_height1 = self.split(root1, black_height1,
+                                                                                  self.keys[root2])
+        if found is None:
+            middle = root2
+            inserted.append(self.vals[root2])
+        else:
+            middle = found
+        left, left_black_height = self.union_subtrees(left1, left_black_height1, left2, child_black_height,
+                                                      inserted)
+        right, right_black_height = self.union_subtrees(right1, right_black_height1, right2,
+                                                        child_black_height, inserted)
+        return self.join(left, left_black_height, middle, right, right_black_height)
+
+    # Insert a node into the subtree under root unless its book ID is there, see Red_Black_Tree.insert_into_subtree
+    def insert_into_subtree(self, root, black_height, node, inserted):
+        keys = self.keys
+        left = self.left
+        right = self.right
+        parents = self.parent
+        if self.red[root]:
+            self.set_color(root, False)
+            black_height += 1
+        bookID = keys[node]
+        parent = self.NIL
+        current = root
+        while current:
+            if bookID == keys[current]:
+                return root, black_height
+            parent = current
+            current = left[current] if bookID < keys[current] else right[current]
+        left[node] = self.NIL
+        right[node] = self.NIL
+        self.size[node] = 1
+        parents[node] = parent
+        inserted.append(self.vals[node])
+        if parent == self.NIL:
+            self.set_color(node, False)
+            return node, 1
+        if bookID < keys[parent]:
+            left[parent] = node
+        else:
+            right[parent] = node
+        ancestor = parent
+        while ancestor:
+            self.size[ancestor] += 1
+            ancestor = parents[ancestor]
+        self.set_color(node, True)
+        saved_root = self.root
+        self.root = root
+        self.balance_after_join(node)
+        root = self.root
+        self.root = saved_root
+        if self.red[root]:
+            self.set_color(root, False)
+            black_height += 1
+        return root, black_height
+
+    # Delete the books with IDs in the range with two splits and a join, see Red_Black_Tree.delete_range
+    # The handles of the cut out subtree are freed lazily: new_node takes them one at a time, and iterating the
+    # result drops their books.
+    def delete_range(self, book_id1, book_id2):
+        NIL = self.NIL
+        if book_id1 > book_id2 or self.root == NIL:
+            return []
+        self.color_changes = {}
+        left, left_black_height, found, rest, rest_black_height = self.split(
+            self.root, self.subtree_black_height(self.root), book_id1)
+        if found is not None:
+            rest, rest_black_height = self.join(NIL, 0, found, rest, rest_black_height)
+        middle, middle_black_height, found, right, right_black_height = self.split(rest, rest_black_height,
+                                                                                  book_id2)
+        if found is not None:
+            middle, _ = self.join(middle, middle_black_height, found, NIL, 0)
+        if left == NIL:
+            root = right
+        elif right == NIL:
+            root = left
+        else:
+            # The smallest node on the right joins the two sides
+            first = self.get_minimum(right)
+            _, _, first, right, right_black_height = self.split(right, right_black_height, self.keys[first])
+            root, _ = self.join(left, left_black_height, first, right, right_black_height)
+        self.set_root(root)
+        keys = self.keys
+        self.color_changes = {node: red for node, red in self.color_changes.items()
+                              if not book_id1 <= keys[node] <= book_id2}
+        self.count_color_changes()
+        if self.lookup_cache is not None:
+            self.lookup_cache.discard_range(book_id1, book_id2)
+        if middle == NIL:
+            return []
+        self.free_subtrees.append(middle)
+        return Deleted_Range(self.size[middle], self.drop_books(middle))
+
+    # Yield the books of a cut out subtree in order of book ID, dropping them from their handles
+    def drop_books(self, node):
+        vals = self.vals
+        for node in self.inorder_nodes(node):
+            book = vals[node]
+            vals[node] = None
+            yield book
+
+    # Split the subtree under a handle into the subtrees of the books with smaller and larger IDs
+    # Returns (left root, left black height, handle with the ID or None, right root, right black height).
+    def split(self, node, black_height, bookID):
+        if node == self.NIL:
+            return self.NIL, 0, None, self.NIL, 0
+        child_black_height = black_height if self.red[node] else black_height - 1
+        left, right = self.detach_children(node)
+        key = self.keys[node]
+        if bookID == key:
+            return left, child_black_height, node, right, child_black_height
+        if bookID < key:
+            left, left_black_height, found, rest, rest_black_height = self.split(left, child_black_height, bookID)
+            right, right_black_height = self.join(rest, rest_black_height, node, right, child_black_height)
+        else:
+            rest, rest_black_height, found, right, right_black_height = self.split(right, child_black_height,
+                                                                                  bookID)
+            left, left_black_height = self.join(left, child_black_height, node, rest, rest_black_height)
+        return left, left_black_height, found, right, right_black_height
+
+    # Join two subtrees and a handle whose ID lies between theirs into one subtree, see Red_Black_Tree.join
+    def join(self, left, left_black_height, middle, right, right_black_height):
+        red = self.red
+        if red[left]:
+            self.set_color(left, False)
+            left_black_height += 1
+        if red[right]:
+            self.set_color(right, False)
+            right_black_height += 1
+        if left_black_height == right_black_height:
+            self.attach_children(middle, left, right)
+            self.parent[middle] = self.NIL
+            self.set_color(middle, False)
+            return middle, left_black_height + 1
+
+        if left_black_height > right_black_height:
+            # The black node on the right spine of left with the black height of right
+            top, black_height = left, left_black_height
+            parent, node = self.NIL, left
+            while red[node] or black_height > right_black_height:
+                if not red[node]:
+                    black_height -= 1
+                parent, node = node, self.right[node]
+            self.attach_children(middle, node, right)
+            self.right[parent] = middle
+            black_height = left_black_height
+        else:
+            top, black_height = right, right_black_height
+            parent, node = self.NIL, right
+            while red[node] or black_height > left_black_height:
+                if not red[node]:
+                    black_height -= 1
+                parent, node = node, self.left[node]
+            self.attach_children(middle, left, node)
+            self.left[parent] = middle
+            black_height = right_black_height
+        self.parent[middle] = parent
+        self.set_color(middle, True)
+        size = self.size
+        growth = size[middle] - size[node]
+        ancestor = parent
+        while ancestor:
+            size[ancestor] += growth
+            ancestor = self.parent[ancestor]
+
+        # Rotations at the top of the subtree set self.root, which is restored afterwards
+        root = self.root
+        self.root = top
+        self.balance_after_join(middle)
+        top = self.root
+        self.root = root
+        if red[top]:
+            self.set_color(top, False)
+            black_height += 1
+        return top, black_height
+
+    # Fix a red node with a red parent after a join, recoloring with set_color
+    def balance_after_join(self, node):
+        red = self.red
+        parents = self.parent
+        left = self.left
+        right = self.right
+        while parents[node] and red[parents[node]]:
+            parent = parents[node]
+            grandparent = parents[parent]
+            if parent == left[grandparent]:
+                uncle = right[grandparent]
+                if red[uncle]:
+                    self.set_color(parent, False)
+                    self.set_color(uncle, False)
+                    self.set_color(grandparent, True)
+                    node = grandparent
+                else:
+                    if node == right[parent]:
+                        node = parent
+                        self.left_rotation(node)
+                        parent = parents[node]
+                    self.set_color(parent, False)
+                    self.set_color(grandparent, True)
+                    self.right_rotation(grandparent)
+            else:
+                uncle = left[grandparent]
+                if red[uncle]:
+                    self.set_color(parent, False)
+                    self.set_color(uncle, False)
+                    self.set_color(grandparent, True)
+                    node = grandparent
+                else:
+                    if node == left[parent]:
+                        node = parent
+                        self.right_rotation(node)
+                        parent = parents[node]
+                    self.set_color(parent, False)
+                    self.set_color(grandparent, True)
+                    self.left_rotation(grandparent)
+
+    # Detach the children of a handle, which becomes a single node, and return them as separate subtrees
+    def detach_children(self, node):
+        left, right = self.left[node], self.right[node]
+        if left:
+            self.parent[left] = self.NIL
+        if right:
+            self.parent[right] = self.NIL
+        self.left[node] = self.NIL
+        self.right[node] = self.NIL
+        self.parent[node] = self.NIL
+        self.size[node] = 1
+        return left, right
+
+    def attach_children(self, node, left, right):
+        self.left[node] = left
+        self.right[node] = right
+        if left:
+            self.parent[left] = node
+        if right:
+            self.parent[right] = node
+        self.size[node] = self.size[left] + self.size[right] + 1
+
+    # Make a subtree the whole tree, with a black root
+    def set_root(self, root):
+        self.root = root
+        if root:
+            self.parent[root] = self.NIL
+            if self.red[root]:
+                self.set_color(root, False)
+
+    # Number of black nodes on every path from a handle down to a leaf, counting the handle if it is black
+    def subtree_black_height(self, node):
+        count = 0
+        while node:
+            if not self.red[node]:
+                count += 1
+            node = self.left[node]
+        return count
+
+    # Lazily yield the books with IDs in the range, in order of book ID
+    def values_in_range(self, book_id1, book_id2):
+        keys = self.keys
+        stack = []
+        node = self.root
+        while stack or node != self.NIL:
+            if node != self.NIL:
+                if keys[node] >= book_id1:
+                    stack.append(node)
+                    node = self.left[node]
+                else:
+                    node = self.right[node]
+            else:
+                node = stack.pop()
+                if keys[node] > book_id2:
+                    return
+                yield self.vals[node]
+                node = self.right[node]
+
+    # Find the book with the largest ID not greater than the given ID
+    def floor(self, bookID):
+        keys = self.keys
+        closest = self.NIL
+        current = self.root
+        while current != self.NIL:
+            if keys[current] == bookID:
+                return self.vals[current]
+            elif keys[current] < bookID:
+                closest = current
+                current = self.right[current]
+            else:
+                current = self.left[current]
+        return self.vals[closest]
+
+    # Find the book with the smallest ID not less than the given ID
+    def ceiling(self, bookID):
+        keys = self.keys
+        closest = self.NIL
+        current = self.root
+        while current != self.NIL:
+            if keys[current] == bookID:
+                return self.vals[current]
+            elif keys[current] > bookID:
+                closest = current
+                current = self.left[current]
+            else:
+                current = self.right[current]
+        return self.vals[closest]
+
+    # Count the books with an ID smaller than the given ID
+    def count_less(self, bookID):
+        keys = self.keys
+        count = 0
+        current = self.root
+        while current != self.NIL:
+            if bookID <= keys[current]:
+                current = self.left[current]
+            else:
+                count += self.size[self.left[current]] + 1
+                current = self.right[current]
+        return count
+
+    # Find the book with the k-th smallest ID, counting from 1
+    def select_value(self, k):
+        if k < 1 or k > self.size[self.root]:
+            return None
+        current = self.root
+        while current != self.NIL:
+            left_size = self.size[self.left[current]]
+            if k <= left_size:
+                current = self.left[current]
+            elif k == left_size + 1:
+                return self.vals[current]
+            else:
+                k -= left_size + 1
+                current = self.right[current]
+        return None
+
+# Number of entries a chunk of a Sorted_Chunk_Map holds after a split, chunks split at twice this size
+CHUNK_LOAD = 512
+
+# Ordered map kept as a list of sorted chunks, each a pair of Python lists of keys and values
+# It is a two level B+ tree: a binary search over the largest key of every chunk finds the chunk, and a binary
+# search in the chunk finds the entry, so a lookup touches three lists instead of one node per level.
+# Inserts and deletes shift the entries of one chunk, chunks split when they reach 2 * CHUNK_LOAD entries and
+# are merged with a neighbor when they drop below CHUNK_LOAD / 2. The number of entries before each chunk is
+# rebuilt when a rank is needed after a change.
+# Keys can be any comparable values. As a catalog engine the keys are book IDs and the values books, which
+# have no colors, so the color flip count stays 0.
+class Sorted_Chunk_Map(Ordered_Catalog):
+    def __init__(self):
+        self.keys = []  # Sorted chunks of keys
+        self.vals = []  # Chunks of values, parallel to keys
+        self.maxes = []  # Largest key of every chunk
+        self.offsets = None  # Number of entries before every chunk, None after a change
+        self.count = 0
+
+    # Position (chunk, index) of the first key not less than the given key, chunk is len(keys) past the end
+    def locate(self, key):
+        i = bisect.bisect_left(self.maxes, key)
+        if i == len(self.maxes):
+            return i, 0
+        return i, bisect.bisect_left(self.keys[i], key)
+
+    # Position (chunk, index) of the first key greater than the given key
+    def locate_after(self, key):
+        i = bisect.bisect_right(self.maxes, key)
+        if i == len(self.maxes):
+            return i, 0
+        return i, bisect.bisect_right(self.keys[i], key)
+
+    # Insert a value under a key, returns False if the key is already in the map
+    def insert_item(self, key, val):
+        maxes = self.maxes
+        if not maxes:
+            self.keys.append([key])
+            self.vals.append([val])
+            maxes.append(key)
+        else:
+            i = bisect.bisect_left(maxes, key)
+            if i == len(maxes):
+                i -= 1
+                maxes[i] = key
+            keys = self.keys[i]
+            j = bisect.bisect_left(keys, key)
+            if j < len(keys) and keys[j] == key:
+                return False
+            keys.insert(j, key)
+            self.vals[i].insert(j, val)
+            if len(keys) >= 2 * CHUNK_LOAD:
+                self.split(i)
+        self.count += 1
+        self.offsets = None
+        return True
+
+    # Remove a key, returns its value, or None if the key is not in the map
+    def delete_key(self, key):
+        i, j = self.locate(key)
+        if i == len(self.maxes) or self.keys[i][j] != key:
+            return None
+        keys = self.keys[i]
+        del keys[j]
+        val = self.vals[i].pop(j)
+        if not keys:
+            del self.keys[i], self.vals[i], self.maxes[i]
+        else:
+            self.maxes[i] = keys[-1]
+            if len(keys) < CHUNK_LOAD // 2 and len(self.keys) > 1:
+                self.merge(i if i + 1 < len(self.keys) else i - 1)
+        self.count -= 1
+        self.offsets = None
+        return val
+
+    # Delete the entries with keys from book_id1 to book_id2 by cutting the chunks, returns their values in order
+    # The keys need not be integers, the title index cuts ranges of (title, book ID) keys the same way.
+    def delete_range(self, book_id1, book_id2):
+        i, j = self.locate(book_id1)
+        k, l = self.locate_after(book_id2)
+        if (i, j) >= (k, l):
+            return []
+        keys, vals, maxes = self.keys, self.vals, self.maxes
+        if i == k:
+            deleted = vals[i][j:l]
+            del keys[i][j:l], vals[i][j:l]
+        else:
+            deleted = vals[i][j:]
+            for chunk in vals[i + 1:k]:
+                deleted.extend(chunk)
+            del keys[i][j:], vals[i][j:]
+            if k < len(keys):
+                deleted.extend(vals[k][:l])
+                del keys[k][:l], vals[k][:l]
+            del keys[i + 1:k], vals[i + 1:k], maxes[i + 1:k]
+        # Only the chunks at the two ends of the range are left partly cut
+        for chunk in (i + 1, i):
+            if chunk < len(keys):
+                if keys[chunk]:
+                    maxes[chunk] = keys[chunk][-1]
+                else:
+                    del keys[chunk], vals[chunk], maxes[chunk]
+        if i < len(keys) and len(keys[i]) < CHUNK_LOAD // 2 and len(keys) > 1:
+            self.merge(i if i + 1 < len(keys) else i - 1)
+        self.count -= len(deleted)
+        self.offsets = None
+        return deleted
+
+    # Replace the value of a key that is in the map
+    def replace(self, key, val):
+        i, j = self.locate(key)
+        self.vals[i][j] = val
+
+    # Split chunk i into two halves
+    def split(self, i):
+        keys = self.keys[i]
+        vals = self.vals[i]
+        half = len(keys) // 2
+        self.keys[i + 1:i + 1] = [keys[half:]]
+        self.vals[i + 1:i + 1] = [vals[half:]]
+        del keys[half:], vals[half:]
+        self.maxes[i:i + 1] = [keys[-1], self.keys[i + 1][-1]]
+
+    # Merge chunk i + 1 into chunk i, splitting the result again if it is too large
+    def merge(self, i):
+        self.keys[i].extend(self.keys[i + 1])
+        self.vals[i].extend(self.vals[i + 1])
+        del self.keys[i + 1], self.vals[i + 1], self.maxes[i]
+        if len(self.keys[i]) >= 2 * CHUNK_LOAD:
+            self.split(i)
+
+    # Replace the contents with sorted keys and their values
+    def load_sorted(self, keys, vals):
+        self.keys = [keys[i:i + CHUNK_LOAD] for i in range(0, len(keys), CHUNK_LOAD)]
+        self.vals = [vals[i:i + CHUNK_LOAD] for i in range(0, len(vals), CHUNK_LOAD)]
+        self.maxes = [chunk[-1] for chunk in self.keys]
+        self.count = len(keys)
+        self.offsets = None
+
+    # Yield (key, value) pairs from the first key not less than the given key, in order of key
+    def items_from(self, key):
+        i, j = self.locate(key)
+        while i < len(self.keys):
+            keys = self.keys[i]
+            vals = self.vals[i]
+            while j < len(keys):
+                yield keys[j], vals[j]
+                j += 1
+            i += 1
+            j = 0
+
+    def insert(self, val):
+        return self.insert_item(val.bookID, val)
+
+    def delete(self, val):
+        self.delete_key(val)
+
+    def get(self, val):
+        i = bisect.bisect_left(self.maxes, val)
+        if i == len(self.maxes):
+            return None
+        keys = self.keys[i]
+        j = bisect.bisect_left(keys, val)
+        return self.vals[i][j] if keys[j] == val else None
+
+    # An insert shifts one chunk, so batches are inserted one by one unless they are large
+    def inserts_one_by_one(self, count):
+        return count * CHUNK_LOAD < self.count
+
+    def sorted_entries(self):
+        for book in self.values():
+            yield book.bookID, book
+
+    def new_entry(self, val):
+        return val
+
+    # The chunks are rebuilt from the merged books in O(n)
+    def rebuild(self, books, existing):
+        self.load_sorted([book.bookID for book in books], books)
+
+    def values(self):
+        for chunk in self.vals:
+            yield from chunk
+
+    def values_in_range(self, book_id1, book_id2):
+        for bookID, book in self.items_from(book_id1):
+            if bookID > book_id2:
+                return
+            yield book
+
+    def floor(self, bookID):
+        i = bisect.bisect_left(self.maxes, bookID)
+        if i < len(self.maxes):
+            j = bisect.bisect_right(self.keys[i], bookID)
+            if j > 0:
+                return self.vals[i][j - 1]
+        return self.vals[i - 1][-1] if i > 0 else None
+
+    def ceiling(self, bookID):
+        i, j = self.locate(bookID)
+        return self.vals[i][j] if i < len(self.vals) else None
+
+    # Number of entries before every chunk
+    def chunk_offsets(self):
+        if self.offsets is None:
+            offsets = [0]
+            for chunk in self.keys:
+                offsets.append(offsets[-1] + len(chunk))
+            self.offsets = offsets
+        return self.offsets
+
+    def count_less(self, bookID):
+        i, j = self.locate(bookID)
+        return self.chunk_offsets()[i] + j
+
+    def select_value(self, k):
+        if k < 1 or k > self.count:
+            return None
+        offsets = self.chunk_offsets()
+        i = bisect.bisect_right(offsets, k - 1) - 1
+        return self.vals[i][k - 1 - offsets[i]]
+
+    # The books in the preorder of a balanced red-black tree, colored like Red_Black_Tree.build_balanced,
+    # so that a snapshot of this engine can be restored by every engine
+    def preorder_values(self):
+        books = list(self.values())
+        max_depth = len(books).bit_length() - 1
+        stack = [(0, len(books) - 1, 0)] if books else []
+        while stack:
+            lo, hi, depth = stack.pop()
+            mid = (lo + hi) // 2
+            yield books[mid], depth == max_depth and depth > 0
+            if mid < hi:
+                stack.append((mid + 1, hi, depth + 1))
+            if lo < mid:
+                stack.append((lo, mid - 1, depth + 1))
+
+    def restore_preorder(self, entries):
+        books = sorted((val for val, _ in entries), key=lambda book: book.bookID)
+        self.load_sorted([book.bookID for book in books], books)
+
+    def __len__(self):
+        return self.count
+
+    # The chunk index and the chunks
+    def height(self):
+        return 2 if len(self.keys) > 1 else len(self.keys)
+
+    # Every entry is at the same depth, like every leaf of a red-black tree has the same black height
+    def black_height(self):
+        return self.height()
+
+class Reservation_Node:
+    __slots__ = ('patronID', 'priority', 'sequence', 'index')
+
+    def __init__(self, patronID, priorityNum, sequence):
+        self.patronID = patronID
+        self.priority = priorityNum
+        self.sequence = sequence  # Order of the reservation, breaks ties between equal priorities
+        self.index = 0  # Position in the heap
+
+    def key(self):
+        return (self.priority, self.sequence)
+
+
+# Min heap of reservations, indexed by patron so any reservation can be found in O(1)
+# A patron that reserves a book again gets another reservation, as a repeated BorrowBook always did, so the
+# index holds a list of reservations per patron. Cancelling and changing the priority apply to all of them.
+class Binary_Min_Heap:
+    __slots__ = ('heap', 'reservations', 'next_sequence')
+
+    def __init__(self):
+        # Initialize a Binary Min Heap
+        self.heap = []
+        self.reservations = {}  # Reservations of each patron, which know their index in the heap
+        self.next_sequence = 0
+
+    def __iter__(self):
+        # Allow iteration over the heap elements
+        return iter(self.heap)
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __contains__(self, patronID):
+        return patronID in self.reservations
+
+    def insert(self, patronID, priorityNum):
+        # Insert a reservation into the heap and perform upward heapification
+        reservation = Reservation_Node(patronID, priorityNum, self.next_sequence)
+        self.next_sequence += 1
+        reservation.index = len(self.heap)
+        self.heap.append(reservation)
+        self.reservations.setdefault(patronID, []).append(reservation)
+        self.upward_heapify(reservation.index)
+        return reservation
+
+    def pop(self):
+        # Remove and return the minimum element from the heap
+        return self.remove_min()
+
+    def restore(self, reservations, next_sequence):
+        # Load reservations that are already in heap order, as saved from another heap
+        self.heap = list(reservations)
+        self.reservations = {}
+        for index, reservation in enumerate(self.heap):
+            reservation.index = index
+            self.reservations.setdefault(reservation.patronID, []).append(reservation)
+        self.next_sequence = next_sequence
+
+    def return_elements(self):
+        # Return all elements in the heap
+        return self.heap
+
+    def swap(self, i, j):
+        heap = self.heap
+        heap[i], heap[j] = heap[j], heap[i]
+        heap[i].index = i
+        heap[j].index = j
+
+    def remove_min(self):
+        # Remove and return the minimum element from the heap and perform heapification
+        if not self.heap:
+            return None
+        return self.remove_at(0)
+
+    def remove(self, patronID):
+        # Remove the reservations of a patron and return the first of them, or None if the patron has none
+        reservations = self.reservations.get(patronID)
+        if reservations is None:
+            return None
+        first = reservations[0]
+        for reservation in list(reservations):
+            self.remove_at(reservation.index)
+        return first
+
+    def remove_at(self, index):
+        # Replace the element at index with the last one and restore the heap properties around it
+        removed = self.heap[index]
+        reservations = self.reservations[removed.patronID]
+        if len(reservations) == 1:
+            del self.reservations[removed.patronID]
+        else:
+            reservations.remove(removed)
+        last_element = self.heap.pop()
+        if index < len(self.heap):
+            self.heap[index] = last_element
+            last_element.index = index
+            self.upward_heapify(index)
+            self.downward_heapify(last_element.index)
+        return removed
+
+    def update_priority(self, patronID, priorityNum):
+        # Change the priority of a patron's reservations, keeping their original order among equal priorities
+        # Returns the first of them, or None if the patron has none
+        reservations = self.reservations.get(patronID)
+        if reservations is None:
+            return None
+        for reservation in reservations:
+            reservation.priority = priorityNum
+            self.upward_heapify(reservation.index)
+            self.downward_heapify(reservation.index)
+        return reservations[0]
+
+    def upward_heapify(self, current_index):
+        # Perform upward heapification to maintain heap properties
+        while current_index > 0:
+            parent_index = (current_index - 1) // 2
+            if self.heap[parent_index].key() > self.heap[current_index].key():
+                self.swap(parent_index, current_index)
+                current_index = parent_index
+            else:
+                break
+    
+    def downward_heapify(self, current_index=0):
+        # Perform downward heapification to maintain heap properties
+        while True:
+            left_child_index = 2 * current_index + 1
+            right_child_index = 2 * current_index + 2
+            smallest = current_index
+
+            if left_child_index < len(self.heap) and self.heap[left_child_index].key() < self.heap[smallest].key():
+                smallest = left_child_index
+
+            if right_child_index < len(self.heap) and self.heap[right_child_index].key() < self.heap[smallest].key():
+                smallest = right_child_index
+
+            if smallest != current_index:
+                self.swap(current_index, smallest)
+                current_index = smallest
+            else:
+                break
+
+# Key under which a title or author name is indexed, without the surrounding quotes of the command syntax
+def index_key(name):
+    return name.strip('"') if name is not None else ""
+
+# IDs of the books closest to the target, given the closest IDs at or below and at or above it (None if there
+# is no such book). When both are equally far from the target, both are returned, lower ID first.
+def closest_book_ids(target_id, lower_id, higher_id):
+    if lower_id is not None and higher_id is not None:
+        distance_lower = abs(target_id - lower_id)
+        distance_higher = abs(target_id - higher_id)
+        if distance_lower < distance_higher:
+            return [lower_id]
+        elif distance_higher < distance_lower:
+            return [higher_id]
+        elif lower_id == higher_id:
+            return [lower_id]
+        return [lower_id, higher_id]
+    elif lower_id is not None:
+        return [lower_id]
+    elif higher_id is not None:
+        return [higher_id]
+    return []
+
+# Output of PatronStatus for the sorted IDs of the books a patron has borrowed and reserved
+def format_patron_status(patronID, borrowed, reserved):
+    return (
+        f"PatronID = {patronID}\n"
+        f"Borrowed = {borrowed}\n"
+        f"Reservations = {reserved}"
+    )
+
+# Output of DeleteBooks: the DeleteBook message of every deleted book with reservations, then the count
+def format_range_delete(book_id1, book_id2, messages, count):
+    if count == 0:
+        return f"No books between {book_id1} and {book_id2} found in the library."
+    return Output_Batch(messages + [f"Deleted {plural(count, 'book')} between {book_id1} and {book_id2}."])
+
+# Output of NextBooks for the records of the next page of a cursor
+def format_next_books(cursorID, count, records):
+    if not records and count > 0:
+        return f"Cursor {cursorID} has no more books."
+    return records
+
+# Outputs of several lookups answered together, written one after another as if they were separate commands
+class Output_Batch(list):
+    __slots__ = ()
+
+# Book record rendered as a JSON object, which JSON Lines output tells apart from messages
+class JSON_Record(str):
+    __slots__ = ()
+
+# Represents a patron and the books the patron has borrowed or reserved
+class Patron_Node:
+    __slots__ = ('patronID', 'borrowedBooks', 'reservedBooks')
+
+    def __init__(self, patronID):
+        self.patronID = patronID
+        self.borrowedBooks = set()
+        self.reservedBooks = set()
+
+    def borrow(self, bookID):
+        self.borrowedBooks.add(bookID)
+
+    def return_book(self, bookID):
+        self.borrowedBooks.discard(bookID)
+
+    def reserve(self, bookID):
+        self.reservedBooks.add(bookID)
+
+    def cancel_reservation(self, bookID):
+        self.reservedBooks.discard(bookID)
+
+    # Check whether the patron no longer holds or waits for any book
+    def is_idle(self):
+        return not self.borrowedBooks and not self.reservedBooks
+
+# Position of a paged listing of the catalog, the next page starts after the last book returned
+# The cursor keeps the lazy in-order walk of the tree, whose stack holds the path from the root to the next book,
+# so every page resumes where the last one stopped in amortized O(1) per book. A change of the catalog can rotate
+# or delete the nodes on that path, so after one the walk starts again after the last book returned, in O(log n).
+# Books inserted behind the cursor are not seen, deleted books are not returned.
+class Book_Cursor:
+    __slots__ = ('library', 'next_id', 'walk', 'version')
+
+    def __init__(self, library, bookID):
+        self.library = library
+        self.next_id = bookID  # Smallest book ID not returned yet
+        self.walk = None
+        self.version = None  # Catalog version the walk started at
+
+    # Return up to count next books
+    def next_books(self, count):
+        library = self.library
+        if self.walk is None or self.version != library.catalog_version:
+            self.walk = library.book_tree.values_in_range(self.next_id, float("inf"))
+            self.version = library.catalog_version
+        books = list(islice(self.walk, max(count, 0)))
+        if books:
+            self.next_id = books[-1].bookID + 1
+        return books
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        books = self.next_books(1)
+        if not books:
+            raise StopIteration
+        return books[0]
+
+# Represents the library system
+class Library_System:
+    def __init__(self, book_tree=None):
+        # Initialize the Library System with a Red-Black Tree for books and an empty patrons dictionary
+        self.book_tree = book_tree if book_tree is not None else Red_Black_Tree()
+        self.patrons = {}  # Patron_Node of every patron that has borrowed or reserved a book
+        self.author_index = {}  # Books of each author, keyed by author name and then by book ID
+        self.title_index = Sorted_Chunk_Map()  # (title, bookID) to Book_Node, sorted by title for prefix search
+        # Books that are borrowed or have reservations, by book ID, so DeleteBooks finds those in its range
+        # without looking at the others. The patron index lists the same books, but by patron.
+        self.held_books = Sorted_Chunk_Map()
+        # Books shared with snapshots of the tree are copied before they change
+        self.copy_on_write = hasattr(self.book_tree, "snapshot")
+        # Book records are JSON objects instead of text, set before any book is printed since records are cached
+        self.json_output = False
+        self.rendered_books = deque()  # Books holding a cached record, oldest first, at most RENDERED_BOOKS
+        self.id_mirror = None  # Sorted book IDs and their books for batch lookups, built when first needed
+        self.catalog_version = 0  # Counts the changes of the catalog, cursors restart their walk after one
+        self.cursors = {}  # Open cursors by cursor ID
+        self.cursor_count = 0
+
+    def snapshot(self):
+        # A library for reading the catalog as it is now while this one keeps changing, in O(1)
+        # Needs a tree with snapshots such as Persistent_Red_Black_Tree. Only the catalog and its books are a
+        # snapshot, the patron, author and title indexes are shared, so use it for PrintBook, PrintBooks and
+        # FindClosestBook only.
+        # Readers run in other threads while this library keeps changing, so they must not write to its state:
+        # they render records without caching them, and have no cursors.
+        reader = copy.copy(self)
+        reader.book_tree = self.book_tree.snapshot()
+        reader.rendered_books = None
+        reader.cursors = {}
+        return reader
+
+    def add_book(self, bookID, bookName, authorName, availabilityStatus):
+        # Add a new book to the library
+        new_book = Book_Node(bookID, bookName, authorName, availabilityStatus)
+        if self.book_tree.insert(new_book):
+            self.index_book(new_book)
+            self.catalog_changed()
+        
+    def catalog_changed(self):
+        # Drop what was derived from the books in the tree after books were added, deleted or replaced
+        self.id_mirror = None
+        self.catalog_version += 1
+
+    def get_patron(self, patronID):
+        # Find the patron in the index, adding the patron if needed
+        patron = self.patrons.get(patronID)
+        if patron is None:
+            patron = self.patrons[patronID] = Patron_Node(patronID)
+        return patron
+
+    def release_patron(self, patron):
+        # Drop patrons that no longer hold or wait for any book from the index
+        if patron.is_idle():
+            del self.patrons[patron.patronID]
+
+    def return_borrowed(self, patronID, bookID):
+        # Remove a borrowed book from the patron index
+        patron = self.patrons.get(patronID, None)
+        if patron is not None:
+            patron.return_book(bookID)
+            self.release_patron(patron)
+
+    def color_flip_count(self):
+        # Return the count of color flips in the book tree
+        return self.book_tree.color_flip_count
+
+    def insert_book(self, bookID, bookName, authorName, availabilityStatus, borrowedBy=None,
+                    reservation_heap=None):
+        new_book = Book_Node(bookID, bookName, authorName, availabilityStatus)
+        new_book.availabilityStatus = availabilityStatus
+        new_book.borrowedBy = borrowedBy
+        if reservation_heap:
+            # Reservations are (priorityNum, patronID) entries, in the order they were made
+            for reservation in reservation_heap:
+                new_book.make_a_reservation(reservation[1], reservation[0])
+        if not self.book_tree.insert(new_book):
+            return
+        self.index_book(new_book)
+        self.catalog_changed()
+        # Register the borrower and the waitlist
+        if borrowedBy is not None or reservation_heap:
+            self.index_loans(new_book)
+
+    def bulk_insert_books(self, books):
+        # Insert many books at once from (bookID, bookName, authorName, availabilityStatus) tuples
+        # Sorting is linear for batches that are already sorted by book ID
+        new_books = [Book_Node(bookID, bookName, authorName, availabilityStatus)
+                     for bookID, bookName, authorName, availabilityStatus in books]
+        new_books.sort(key=lambda book: book.bookID)
+        for book in self.book_tree.bulk_insert(new_books):
+            self.index_book(book)
+        self.catalog_changed()
+
+    def rebuild_indexes(self):
+        # Rebuild the patron, author, title and held book indexes from the books in the tree
+        self.patrons = {}
+        self.author_index = {}
+        self.held_books = Sorted_Chunk_Map()
+        titles = []
+        for book in self.book_tree.values():
+            books = self.author_index.get(index_key(book.authorName))
+            if books is None:
+                books = self.author_index[index_key(book.authorName)] = {}
+            books[book.bookID] = book
+            titles.append(((index_key(book.bookName), book.bookID), book))
+            self.index_loans(book)
+        titles.sort(key=lambda entry: entry[0])
+        self.title_index = Sorted_Chunk_Map()
+        self.title_index.load_sorted([title for title, _ in titles], [book for _, book in titles])
+
+    def index_loans(self, book):
+        # Add the borrower and the reservations of a book to the patron and held book indexes
+        if book.borrowedBy is not None:
+            self.get_patron(book.borrowedBy).borrow(book.bookID)
+        for patronID in book.reservation_patrons():
+            self.get_patron(patronID).reserve(book.bookID)
+        self.update_held(book)
+
+    def update_held(self, book):
+        # Keep a book in the held book index while it is borrowed or has reservations
+        if book.borrowedBy is not None or book.has_reservations():
+            self.held_books.insert_item(book.bookID, book)
+        elif self.held_books.get(book.bookID) is not None:
+            self.held_books.delete_key(book.bookID)
+
+    def index_book(self, book):
+        # Add a book to the author and title indexes
+        author = index_key(book.authorName)
+        books = self.author_index.get(author)
+        if books is None:
+            books = self.author_index[author] = {}
+        books[book.bookID] = book
+        self.title_index.insert_item((index_key(book.bookName), book.bookID), book)
+
+    def unindex_book(self, book):
+        # Remove a book from the author and title indexes
+        author = index_key(book.authorName)
+        books = self.author_index[author]
+        del books[book.bookID]
+        if not books:
+            del self.author_index[author]
+        self.title_index.delete_key((index_key(book.bookName), book.bookID))
+
+    def book_to_change(self, bookID):
+        # Find a book that is about to change
+        # With copy on write, a book shared with a snapshot is replaced by a copy that the indexes then refer to.
+        book = self.book_tree.get(bookID)
+        if book is None or not self.copy_on_write:
+            return book
+        writable_book = self.book_tree.writable_value(bookID)
+        if writable_book is not book:
+            self.author_index[index_key(book.authorName)][bookID] = writable_book
+            self.title_index.replace((index_key(book.bookName), bookID), writable_book)
+            if self.held_books.get(bookID) is not None:
+                self.held_books.replace(bookID, writable_book)
+            self.catalog_changed()
+        return writable_book
+
+    def return_book(self, patronID, bookID):
+        # Book returned after borrowing
+        book = self.book_to_change(bookID)
+        opLine = ''
+        if book is not None and book.availabilityStatus == '"No"' and book.borrowedBy == patronID:
+            self.return_borrowed(patronID, bookID)
+            if book.has_reservations():
+                # The reservation with the highest priority gets the book
+                reservation = book.reservationHeap.remove_min()
+                book.borrowedBy = reservation.patronID
+                book.rendered = None
+                patron = self.get_patron(book.borrowedBy)
+                if reservation.patronID not in book.reservationHeap:
+                    patron.cancel_reservation(bookID)
+                patron.borrow(bookID)
+                opLine = f"Book {bookID} Returned by Patron {patronID}\n" \
+                f"Book {bookID} Allotted to Patron {book.borrowedBy}" 
+            else:
+                book.availabilityStatus = '"Yes"'
+                book.borrowedBy = None
+                book.rendered = None
+                self.update_held(book)
+                opLine = f"Book {bookID} Returned by Patron {patronID}"
+        else:
+            opLine = f"Book {bookID} cannot be returned by Patron {patronID}."
+        return opLine
+
+    def delete_book(self, bookID):
+        # delete book node
+        book = self.book_to_change(bookID)
+        if book is not None:
+            opLine = self.retire_book(book)
+            self.book_tree.delete(bookID)
+            self.catalog_changed()
+        else:
+            opLine = f"Book {bookID} not found in the library."
+        return opLine
+
+    def retire_book(self, book):
+        # Return the loan, cancel the reservations and unindex a book that leaves the library
+        opLine = self.release_book(book)
+        if self.held_books.get(book.bookID) is not None:
+            self.held_books.delete_key(book.bookID)
+        self.unindex_book(book)
+        return opLine
+
+    def release_book(self, book):
+        # Return the loan and cancel the reservations of a book that leaves the library
+        bookID = book.bookID
+        if book.borrowedBy is not None:
+            self.return_borrowed(book.borrowedBy, bookID)
+        if book.has_reservations():
+            reservationHeap = book.get_reservationHeap()
+            self.cancel_reservations(bookID, reservationHeap)
+            opLine = f"Book {bookID} is no longer available. Reservations made by Patrons {', '.join(str(reservation) for reservation in reservationHeap)} have been cancelled!"
+        else:
+            opLine = f"Book {bookID} is no longer available."
+        return opLine
+
+    def delete_books(self, book_id1, book_id2):
+        # Delete all books with IDs in the range at once
+        return format_range_delete(book_id1, book_id2, *self.retire_range(book_id1, book_id2))
+
+    def retire_range(self, book_id1, book_id2):
+        # Delete the books in the range from the tree, returns the messages for books with reservations
+        # and the number of deleted books
+        # The tree drops the range in O(log n) and the loans and reservations are cleared through the held
+        # book index, O(log n) per held book. The author and title index entries still go one by one, O(log n)
+        # per deleted book: the title index is sorted by title, so an ID range is not one cut of it.
+        held = list(self.held_books.values_in_range(book_id1, book_id2))
+        if self.copy_on_write:
+            # Books shared with snapshots are copied before their loans and reservations are cleared
+            held = [self.book_to_change(book.bookID) for book in held]
+        self.held_books.delete_range(book_id1, book_id2)
+        messages = []
+        for book in held:
+            had_reservations = book.has_reservations()
+            opLine = self.release_book(book)
+            if had_reservations:
+                messages.append(opLine)
+        books = self.book_tree.delete_range(book_id1, book_id2)
+        for book in books:
+            self.unindex_book(book)
+        if books:
+            self.catalog_changed()
+        return messages, len(books)
+
+    def merge_catalog(self, other):
+        # Add the books of another library whose IDs are not in this one, with their loans and reservations
+        # The books are copied, so the two libraries do not share them. Returns the number of added books.
+        added = self.book_tree.union(book.copy() for book in other.book_tree.values())
+        for book in added:
+            self.index_book(book)
+            self.index_loans(book)
+        if added:
+            self.catalog_changed()
+        return len(added)
+    
+    def borrow_book(self, patronID, bookID, patron_reservation_priority):
+        book = self.book_to_change(bookID)
+        if book is not None:
+            if book.availabilityStatus == '"Yes"':
+                book.availabilityStatus = '"No"'
+                book.borrowedBy = patronID
+                book.rendered = None
+                self.get_patron(patronID).borrow(bookID)
+                self.update_held(book)
+                return f"Book {bookID} Borrowed by Patron {patronID}"
+
+            else:
+                reservation_added = book.make_a_reservation(patronID, patron_reservation_priority)
+                if reservation_added == "Waitlist full":
+                    return f"Waitlist for Book {bookID} is full. Cannot add reservation for Patron {patronID}"
+                else:
+                    self.get_patron(patronID).reserve(bookID)
+                    self.update_held(book)
+                    return f"Book {bookID} Reserved by Patron {patronID}"
+        else:
+            return f"Book {bookID} is not available for borrowing."
+
+    def cancel_reservations(self, bookID, patrons):
+        # Remove the book from the reservations of each patron, costs O(1) per patron
+        for patronID in patrons:
+            patron = self.patrons.get(patronID, None)
+            if patron is not None:
+                patron.cancel_reservation(bookID)
+                self.release_patron(patron)
+    
+    def cancel_reservation(self, patronID, bookID):
+        # Cancel one patron's reservation for a book
+        book = self.book_to_change(bookID)
+        if book is None:
+            return f"Book {bookID} not found in the library."
+        if book.cancel_reservation(patronID) is None:
+            return f"Patron {patronID} has no reservation for Book {bookID}."
+        self.cancel_reservations(bookID, [patronID])
+        self.update_held(book)
+        return f"Reservation made by Patron {patronID} for Book {bookID} has been cancelled!"
+
+    def change_priority(self, patronID, bookID, priorityNum):
+        # Change the priority of a patron's reservation for a book
+        book = self.book_to_change(bookID)
+        if book is None:
+            return f"Book {bookID} not found in the library."
+        if book.change_reservation_priority(patronID, priorityNum) is None:
+            return f"Patron {patronID} has no reservation for Book {bookID}."
+        return f"Priority of Patron {patronID} for Book {bookID} changed to {priorityNum}"
+
+    def patron_status(self, patronID):
+        # Print the books a patron has borrowed and is waiting for
+        patron = self.patrons.get(patronID)
+        borrowed = sorted(patron.borrowedBooks) if patron is not None else []
+        reserved = sorted(patron.reservedBooks) if patron is not None else []
+        return format_patron_status(patronID, borrowed, reserved)
+
+    def print_book(self, bookID):
+        # Print details of a specific book
+        book = self.book_tree.get(bookID)
+        if book is not None:
+            return self.get_book_details(book)
+        else:
+            return (f"Book {bookID} not found in the library.")
+
+    def print_books(self, book_id1, book_id2):
+        # Lazily yield details of the books in the range, in order of book ID
+        for book in self.book_tree.values_in_range(book_id1, book_id2):
+            yield self.scan_details(book)
+
+    def cursor(self, bookID):
+        # Iterator over the books from the given ID on, which stays valid while the catalog changes
+        return Book_Cursor(self, bookID)
+
+    def open_cursor(self, bookID):
+        # Open a cursor for NextBooks at the first book with an ID not less than the given ID
+        self.cursor_count += 1
+        self.cursors[self.cursor_count] = Book_Cursor(self, bookID)
+        return f"Cursor {self.cursor_count} opened at book ID {bookID}."
+
+    def next_books(self, cursorID, count):
+        # Print the details of the next count books of a cursor
+        cursor = self.cursors.get(cursorID)
+        if cursor is None:
+            return f"Cursor {cursorID} not found."
+        return format_next_books(cursorID, count, [self.scan_details(book) for book in cursor.next_books(count)])
+
+    def close_cursor(self, cursorID):
+        if self.cursors.pop(cursorID, None) is None:
+            return f"Cursor {cursorID} not found."
+        return f"Cursor {cursorID} closed."
+
+    def get_book_details(self, book):
+        # Output record of a book, rendered again only after the book changed
+        # Only the last RENDERED_BOOKS books rendered keep their record, the oldest one is dropped first.
+        # Snapshots have no rendered_books and use cached records without caching new ones, like scan_details.
+        details = book.rendered
+        if details is None:
+            details = self.render_book_json(book) if self.json_output else self.render_book(book)
+            rendered_books = self.rendered_books
+            if rendered_books is None:
+                return details
+            if len(rendered_books) >= RENDERED_BOOKS:
+                rendered_books.popleft().rendered = None
+            book.rendered = details
+            rendered_books.append(book)
+        return details
+
+    def scan_details(self, book):
+        # Output record of a book in a scan, which uses a cached record but does not cache a new one, so a
+        # scan neither keeps a record of every book nor evicts the records of books that are looked up often
+        details = book.rendered
+        if details is None:
+            details = self.render_book_json(book) if self.json_output else self.render_book(book)
+        return details
+
+    def render_book(self, book):
+        patron_ids = book.reservation_patrons()
+        return (
+            f"BookID = {book.bookID}\n"
+            f"Title = {book.bookName}\n"
+            f"Author = {book.authorName}\n"
+            f"Availability = {book.availabilityStatus}\n"
+            f"BorrowedBy = {book.borrowedBy}\n"
+            f"Reservations = {patron_ids}"
+        )
+
+    def render_book_json(self, book):
+        # The record as a JSON object, with the quotes of the command syntax removed
+        return JSON_Record(json.dumps({
+            "bookID": book.bookID,
+            "title": book.bookName.strip('"') if book.bookName is not None else None,
+            "author": book.authorName.strip('"') if book.authorName is not None else None,
+            "availability": book.availabilityStatus.strip('"') if book.availabilityStatus is not None else None,
+            "borrowedBy": book.borrowedBy,
+            "reservations": book.reservation_patrons(),
+        }))
+
+    def find_closest_book(self, target_id):
+        return self.closest_details(target_id, self.book_tree.floor(target_id), self.book_tree.ceiling(target_id))
+
+    def closest_details(self, target_id, closest_lower, closest_higher):
+        # Details of the closest books, given the books at or below and at or above the target
+        books = {}
+        if closest_lower is not None:
+            books[closest_lower.bookID] = closest_lower
+        if closest_higher is not None:
+            books[closest_higher.bookID] = closest_higher
+        closest = closest_book_ids(target_id,
+                                   closest_lower.bookID if closest_lower is not None else None,
+                                   closest_higher.bookID if closest_higher is not None else None)
+        return [self.get_book_details(books[bookID]) for bookID in closest]
+    
+    def find_closest_books(self, target_ids):
+        # Closest books of many targets at once, each answered like find_closest_book
+        # Only the floor and ceiling searches are batched, the choice between them is that of find_closest_book.
+        return Output_Batch(self.closest_details(target_id, closest_lower, closest_higher)
+                            for target_id, (closest_lower, closest_higher)
+                            in zip(target_ids, self.floor_ceiling_batch(target_ids)))
+
+    def floor_ceiling_batch(self, target_ids):
+        # (book at or below, book at or above) for each target ID, None where there is no such book
+        # The targets are searched together in a sorted mirror of the book IDs instead of walking the tree.
+        ids, books = self.get_id_mirror()
+        floors = None
+        if not isinstance(ids, list):
+            try:
+                targets = numpy.asarray(target_ids, dtype=numpy.int64)
+            except OverflowError:
+                pass  # Targets beyond 64 bits are searched with bisect
+            else:
+                floors = (numpy.searchsorted(ids, targets, 'right') - 1).tolist()
+                ceilings = numpy.searchsorted(ids, targets, 'left').tolist()
+        if floors is None:
+            floors = [bisect.bisect_right(ids, target_id) - 1 for target_id in target_ids]
+            ceilings = [bisect.bisect_left(ids, target_id) for target_id in target_ids]
+        count = len(books)
+        return [(books[floor] if floor >= 0 else None, books[ceiling] if ceiling < count else None)
+                for floor, ceiling in zip(floors, ceilings)]
+
+    def get_id_mirror(self):
+        # The sorted book IDs, as a NumPy array if available and the IDs fit in 64 bits, else a list, and the
+        # books in the same order. It is rebuilt in O(n) on the first batch lookup after the catalog changed.
+        if self.id_mirror is None:
+            books = list(self.book_tree.values())
+            ids = [book.bookID for book in books]
+            if numpy is not None:
+                try:
+                    ids = numpy.array(ids, dtype=numpy.int64)
+                except OverflowError:
+                    pass
+            self.id_mirror = (ids, books)
+        return self.id_mirror
+
+    def search_by_author(self, authorName):
+        # Details of the books by an author, in order of book ID
+        books = self.author_index.get(index_key(authorName))
+        if not books:
+            return f"No books by Author {authorName} found in the library."
+        return [self.get_book_details(books[bookID]) for bookID in sorted(books)]
+
+    def title_prefix_matches(self, prefix):
+        # Title index entries of the books whose title starts with the prefix, in order of title
+        key = index_key(prefix)
+        for (title, bookID), book in self.title_index.items_from((key,)):
+            if not title.startswith(key):
+                return
+            yield title, bookID, book
+
+    def search_title_prefix(self, prefix):
+        # Details of the books whose title starts with the prefix, in order of title
+        book_details = [self.get_book_details(book) for _, _, book in self.title_prefix_matches(prefix)]
+        if not book_details:
+            return f"No books with a title starting with {prefix} found in the library."
+        return book_details
+
+    def count_books(self, book_id1, book_id2):
+        # Count the books with IDs in the range using subtree sizes
+        count = max(0, self.book_tree.count_less(book_id2 + 1) - self.book_tree.count_less(book_id1))
+        return f"Book Count between {book_id1} and {book_id2}: {count}"
+
+    def rank_of(self, bookID):
+        # Position of a book in order of book ID, counting from 1
+        if self.book_tree.get(bookID) is None:
+            return f"Book {bookID} not found in the library."
+        return f"Rank of Book {bookID}: {self.book_tree.count_less(bookID) + 1}"
+
+    def kth_book(self, k):
+        # Print details of the book at the k-th position in order of book ID
+        book = self.book_tree.select_value(k)
+        if book is None:
+            return f"No book at position {k} in the library."
+        return self.get_book_details(book)
+
+    def quit(self):
+        # Exit the library system
+        exit()
+
+# Size of the buffer used when writing command output
+OUTPUT_BUFFER_SIZE = 1 << 16
+
+# Argument patterns of the compiled command patterns, a quoted argument may hold commas and parentheses
+INT_ARGUMENT = r'\s*([+-]?\d+)\s*'
+STR_ARGUMENT = r'\s*("[^"]*"|[^",]*?)\s*'
+# One argument and the comma or end of text after it, used to tokenize lines that the command pattern rejects
+ARGUMENT = re.compile(STR_ARGUMENT + r'(,|\Z)')
+
+def plural(count, noun):
+    return f"{count} {noun}" if count == 1 else f"{count} {noun}s"
+
+# Raised for a command line that cannot be parsed
+class Command_Error(ValueError):
+    pass
+
+# A command of the input language: the types of its arguments and the function that runs it
+# int arguments are converted before the command runs, str arguments are passed as written, quotes included.
+# A trailing ... repeats the type before it any number of times, the arguments are then passed as one list.
+# A tuple of types before ... repeats as a group, and each group of arguments is then passed as a tuple.
+# Commands with a fixed number of arguments get a pattern for the text after "(" that checks and splits all
+# arguments in one match, and closures over the positions of their int arguments that convert the matched
+# texts and call the command.
+class Command_Spec:
+    __slots__ = ('name', 'types', 'repeated', 'handler', 'pattern', 'converter', 'call')
+
+    def __init__(self, name, types, handler):
+        self.name = name
+        self.repeated = types[-2] if types and types[-1] is ... else None
+        self.types = types[:-2] if self.repeated is not None else types
+        self.handler = handler
+        self.pattern = None
+        self.converter = None
+        self.call = None
+        if self.repeated is None:
+            arguments = ",".join(INT_ARGUMENT if kind is int else STR_ARGUMENT for kind in types)
+            self.pattern = re.compile((arguments or r'\s*') + r'\)\s*\Z')
+            self.converter = text_converter(types)
+            self.call = command_caller(handler, self.converter)
+
+    # Arguments of the command from the text after "(", raises Command_Error if they do not fit
+    def arguments(self, text):
+        if self.pattern is not None:
+            match = self.pattern.match(text)
+            if match is not None:
+                return self.converter(match.groups())
+        # Unusual spacing or an error, tokenize the arguments and check them one by one
+        text = text.rstrip()
+        if not text.endswith(')'):
+            raise Command_Error(f"missing ) at the end of {self.name}({text}")
+        return self.convert(split_arguments(text[:-1]))
+
+    # Convert the argument texts to the argument types
+    def convert(self, args):
+        types = self.types
+        if self.repeated is not None:
+            group = self.repeated if isinstance(self.repeated, tuple) else (self.repeated,)
+            if len(args) < len(types) + len(group):
+                raise Command_Error(f"{self.name} takes at least {plural(len(types) + len(group), 'argument')}, got {len(args)}")
+            if (len(args) - len(types)) % len(group):
+                raise Command_Error(f"{self.name} takes its arguments in groups of {len(group)}, got {len(args)}")
+            types = types + group * ((len(args) - len(types)) // len(group))
+        elif len(args) != len(types):
+            raise Command_Error(f"{self.name} takes {plural(len(types), 'argument')}, got {len(args)}")
+        try:
+            values = [kind(arg) for kind, arg in zip(types, args)]
+        except ValueError:
+            # Only int conversions fail, find the argument that did
+            for position, (kind, arg) in enumerate(zip(types, args), 1):
+                try:
+                    kind(arg)
+                except ValueError:
+                    raise Command_Error(f"argument {position} of {self.name} must be an integer, got {arg!r}") from None
+        if self.repeated is not None:
+            repeated = values[len(self.types):]
+            if isinstance(self.repeated, tuple):
+                size = len(self.repeated)
+                repeated = [tuple(repeated[i:i + size]) for i in range(0, len(repeated), size)]
+            values[len(self.types):] = [repeated]
+        return values
+
+# Function that converts the matched argument texts of a command to its argument types
+def text_converter(types):
+    int_positions = [position for position, kind in enumerate(types) if kind is int]
+    if len(int_positions) == len(types):
+        # Most commands take only ints
+        return lambda texts: list(map(int, texts))
+
+    def convert(texts):
+        values = list(texts)
+        for position in int_positions:
+            values[position] = int(values[position])
+        return values
+    return convert
+
+# Function that runs a command on a library from its matched argument texts
+def command_caller(handler, converter):
+    def call(library, texts):
+        return handler(library, *converter(texts))
+    return call
+
+# Commands of the input language by name
+COMMANDS = {spec.name: spec for spec in (
+    Command_Spec("InsertBook", (int, str, str, str), Library_System.insert_book),
+    Command_Spec("BulkInsertBooks", ((int, str, str, str), ...), Library_System.bulk_insert_books),
+    Command_Spec("PrintBook", (int,), Library_System.print_book),
+    Command_Spec("PrintBooks", (int, int), Library_System.print_books),
+    Command_Spec("FindClosestBook", (int,), Library_System.find_closest_book),
+    Command_Spec("FindClosestBooks", (int, ...), Library_System.find_closest_books),
+    Command_Spec("BorrowBook", (int, int, int), Library_System.borrow_book),
+    Command_Spec("ReturnBook", (int, int), Library_System.return_book),
+    Command_Spec("DeleteBook", (int,), Library_System.delete_book),
+    Command_Spec("DeleteBooks", (int, int), Library_System.delete_books),
+    Command_Spec("CountBooks", (int, int), Library_System.count_books),
+    Command_Spec("OpenCursor", (int,), Library_System.open_cursor),
+    Command_Spec("NextBooks", (int, int), Library_System.next_books),
+    Command_Spec("CloseCursor", (int,), Library_System.close_cursor),
+    Command_Spec("RankOf", (int,), Library_System.rank_of),
+    Command_Spec("KthBook", (int,), Library_System.kth_book),
+    Command_Spec("CancelReservation", (int, int), Library_System.cancel_reservation),
+    Command_Spec("ChangePriority", (int, int, int), Library_System.change_priority),
+    Command_Spec("PatronStatus", (int,), Library_System.patron_status),
+    Command_Spec("SearchByAuthor", (str,), Library_System.search_by_author),
+    Command_Spec("SearchTitlePrefix", (str,), Library_System.search_title_prefix),
+    Command_Spec("ColorFlipCount", (), lambda library: f"Colour Flip Count: {library.book_tree.color_flip_count}"),
+    Command_Spec("Quit", (), lambda library: None),  # Handled by the caller, which stops reading commands
+)}
+
+# Split the text between the parentheses of a command line into arguments
+def split_arguments(text):
+    if '"' not in text:
+        return [arg.strip() for arg in text.split(',')] if text and not text.isspace() else []
+    args = []
+    position = 0
+    while True:
+        match = ARGUMENT.match(text, position)
+        if match is None:
+            raise Command_Error(f"unexpected quote in arguments ({text})")
+        args.append(match.group(1))
+        if not match.group(2):
+            return args
+        position = match.end()
+
+# Parse a command line into the command and its converted arguments, raises Command_Error if it is malformed
+def parse_line(line):
+    name, parenthesis, text = line.partition('(')
+    spec = COMMANDS.get(name)
+    if spec is None:
+        spec = COMMANDS.get(name.strip())
+        if spec is None:
+            if not parenthesis or not name.strip().isidentifier():
+                raise Command_Error(f"expected Command(arguments), got {line!r}")
+            raise Command_Error(f"unknown command {name.strip()}")
+    return spec, spec.arguments(text)
+
+# Split a command line into the command name and its converted arguments
+def parse_command(command_string):
+    spec, args = parse_line(command_string)
+    return spec.name, args
+
+# Execute a single command line and return its output, or None if it has no output
+# PrintBooks and FindClosestBook return an iterable of book records instead of a string
+def execute_command(library, line):
+    if not line:
+        return None
+    # Well formed lines of commands with a fixed number of arguments take the compiled path
+    name, _, text = line.partition('(')
+    spec = COMMANDS.get(name)
+    if spec is not None and spec.pattern is not None:
+        match = spec.pattern.match(text)
+        if match is not None:
+            return spec.call(library, match.groups())
+    spec, args = parse_line(line)
+    return spec.handler(library, *args)
+
+# Commands that change the state of the library and are written to the write-ahead log
+MUTATING_COMMANDS = ("InsertBook", "BulkInsertBooks", "DeleteBook", "DeleteBooks", "BorrowBook", "ReturnBook", "CancelReservation", "ChangePriority")
+
+# Yield the text written for the output of a command
+def render_output(output_line):
+    if isinstance(output_line, str):
+        yield f"{output_line}\n\n\n"
+    elif isinstance(output_line, Output_Batch):
+        for output in output_line:
+            yield from render_output(output)
+    elif output_line is not None:
+        # Book records are written one at a time, separated by a blank line
+        separator = ""
+        for record in output_line:
+            yield f"{separator}{record}\n"
+            separator = "\n"
+        yield "\n\n\n"
+
+# Output written for Quit()
+def render_quit(json_output=False):
+    if json_output:
+        return '{"command": "Quit", "message": "Program Terminated!!"}\n'
+    return "Program Terminated!!\n"
+
+# Yield the JSON Lines output of a command: its book records, or its message
+def render_json_output(line, output_line):
+    if output_line is None:
+        return
+    command = json.dumps(line.split('(', 1)[0].strip())
+    if isinstance(output_line, Output_Batch):
+        for output in output_line:
+            yield from render_json_output(line, output)
+    elif isinstance(output_line, JSON_Record):
+        yield f'{{"command": {command}, "books": [{output_line}]}}\n'
+    elif isinstance(output_line, str):
+        yield f'{{"command": {command}, "message": {json.dumps(output_line)}}}\n'
+    else:
+        # Records are streamed like in the text output
+        yield f'{{"command": {command}, "books": ['
+        separator = ""
+        for record in output_line:
+            yield f"{separator}{record}"
+            separator = ", "
+        yield "]}\n"
+
+# Lazily execute command lines and yield the text written for each of them
+# A malformed line is skipped, and its error, naming the line, is appended to errors if given.
+# Mutating commands are appended to the write-ahead log, if one is given, once they have run, so a line that
+# cannot be parsed never reaches the log.
+# With stats, the time from the start of each command to the end of its output is recorded.
+def run_commands(library, lines, log=None, stats=None, errors=None):
+    json_output = library.json_output
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+
+        if line == "Quit()":
+            yield render_quit(json_output)
+            return
+
+        if stats is not None:
+            start = time.perf_counter_ns()
+        try:
+            output_line = execute_command(library, line)
+        except Command_Error as e:
+            if errors is not None:
+                errors.append(f"line {number}: {e}")
+            continue
+        if log is not None and line.startswith(MUTATING_COMMANDS):
+            log.append(line)
+        if json_output:
+            yield from render_json_output(line, output_line)
+        else:
+            yield from render_output(output_line)
+        if stats is not None:
+            stats.record(line, time.perf_counter_ns() - start)
+
+# Counters kept by a tree while statistics are enabled
+TREE_COUNTERS = (
+    "left_rotations", "right_rotations",
+    "insert_case_1", "insert_case_2", "insert_case_3", "insert_case_4",
+    "delete_case_1", "delete_case_2", "delete_case_3", "delete_case_4",
+)
+
+# Statistics of a run, collected when main() is started with --stats
+# Command latencies go into histograms with power of two buckets in microseconds.
+# Reports are written as JSON lines, every interval commands if given and at the end of the run.
+class Library_Stats:
+    def __init__(self, library, output, interval=None):
+        self.library = library
+        self.output = output
+        self.interval = interval
+        self.commands = 0
+        self.latencies = {}  # Command name to [count, total ns, bucket counts]
+        library.book_tree.stats = dict.fromkeys(TREE_COUNTERS, 0)
+
+    def record(self, line, elapsed_ns):
+        command = line.split('(', 1)[0].strip()
+        latency = self.latencies.get(command)
+        if latency is None:
+            latency = self.latencies[command] = [0, 0, []]
+        latency[0] += 1
+        latency[1] += elapsed_ns
+        bucket = (elapsed_ns // 1000).bit_length()
+        buckets = latency[2]
+        if bucket >= len(buckets):
+            buckets.extend([0] * (bucket + 1 - len(buckets)))
+        buckets[bucket] += 1
+        self.commands += 1
+        if self.interval and self.commands % self.interval == 0:
+            self.emit()
+
+    def report(self):
+        tree = self.library.book_tree
+        heap_sizes = {}
+        for book in tree.values():
+            size = len(book.reservationHeap) if book.reservationHeap is not None else 0
+            heap_sizes[size] = heap_sizes.get(size, 0) + 1
+        lookup_cache = None
+        if tree.lookup_cache is not None:
+            cache = tree.lookup_cache
+            lookup_cache = {"size": len(cache), "capacity": cache.capacity, "hits": cache.hits, "misses": cache.misses}
+        latency = {}
+        for command, (count, total, buckets) in sorted(self.latencies.items()):
+            latency[command] = {
+                "count": count,
+                "mean_us": total / count / 1000,
+                "histogram_us": {f"<{1 << bucket}": hits for bucket, hits in enumerate(buckets) if hits},
+            }
+        return {
+            "commands": self.commands,
+            "latency": latency,
+            "tree": {
+                "books": len(tree),
+                "height": tree.height(),
+                "black_height": tree.black_height(),
+                "color_flip_count": tree.color_flip_count,
+                "counters": dict(tree.stats),
+                "lookup_cache": lookup_cache,
+            },
+            "reservation_heap_sizes": {str(size): heap_sizes[size] for size in sorted(heap_sizes)},
+        }
+
+    def emit(self):
+        self.output.write(json.dumps(self.report()) + "\n")
+        self.output.flush()
+
+# Snapshot layout, all integers little endian
+# Header: magic, log generation, color flip count, number of books, number of shared strings
+# Shared strings: author names and availability values, which repeat across books, stored once
+# Each book, in preorder of the tree: the fixed fields, the title, then its reservations in heap order
+SNAPSHOT_MAGIC = b"GLSNAP02"
+SNAPSHOT_HEADER = struct.Struct('<8sqqqq')
+# bookID, red, has borrower, borrowedBy, reservation count, next sequence, author and availability
+# string numbers, title length
+SNAPSHOT_BOOK = struct.Struct('<qBBqIqiii')
+SNAPSHOT_STRING = struct.Struct('<i')  # length of the UTF-8 string that follows
+SNAPSHOT_RESERVATION = struct.Struct('<qqq')  # patronID, priority, sequence
+SNAPSHOT_FILENAME = "snapshot.bin"
+WAL_FILENAME = "wal.log"
+WAL_HEADER = "#WAL generation {}\n"
+# Number of logged commands written to disk together, a crash loses at most this many
+WAL_BATCH_SIZE = 1000
+
+# Write the state of the library to a binary snapshot, replacing the old snapshot atomically
+def save_snapshot(library, path, generation=0):
+    tree = library.book_tree
+    # Number the shared strings, -1 stands for None
+    shared = {}
+    for book in tree.values():
+        for value in (book.authorName, book.availabilityStatus):
+            if value is not None and value not in shared:
+                shared[value] = len(shared)
+
+    temporary_path = path + ".tmp"
+    with open(temporary_path, 'wb', buffering=OUTPUT_BUFFER_SIZE) as file:
+        file.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, generation, tree.color_flip_count, len(tree), len(shared)))
+        for value in shared:
+            data = value.encode()
+            file.write(SNAPSHOT_STRING.pack(len(data)))
+            file.write(data)
+        for book, red in tree.preorder_values():
+            heap = book.reservationHeap
+            reservations = heap.heap if heap is not None else []
+            title = book.bookName.encode() if book.bookName is not None else b""
+            file.write(SNAPSHOT_BOOK.pack(book.bookID, red, book.borrowedBy is not None,
+                                          book.borrowedBy if book.borrowedBy is not None else 0,
+                                          len(reservations), heap.next_sequence if heap is not None else 0,
+                                          shared.get(book.authorName, -1), shared.get(book.availabilityStatus, -1),
+                                          len(title) if book.bookName is not None else -1))
+            file.write(title)
+            for reservation in reservations:
+                file.write(SNAPSHOT_RESERVATION.pack(reservation.patronID, reservation.priority, reservation.sequence))
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary_path, path)
+
+# Read a snapshot through mmap, returns the restored library and the log generation it covers
+def load_snapshot(path, book_tree=None):
+    library = Library_System(book_tree)
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        magic, generation, color_flip_count, count, shared_count = SNAPSHOT_HEADER.unpack_from(data, 0)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError(f"{path} is not a library snapshot")
+        offset = SNAPSHOT_HEADER.size
+        shared = []
+        for _ in range(shared_count):
+            length, = SNAPSHOT_STRING.unpack_from(data, offset)
+            offset += SNAPSHOT_STRING.size
+            shared.append(data[offset:offset + length].decode())
+            offset += length
+        shared.append(None)  # Index -1
+
+        def entries(offset):
+            unpack_book = SNAPSHOT_BOOK.unpack_from
+            book_size = SNAPSHOT_BOOK.size
+            for _ in range(count):
+                bookID, red, has_borrower, borrowedBy, reservation_count, next_sequence, author, availability, \
+                    title_length = unpack_book(data, offset)
+                offset += book_size
+                if title_length >= 0:
+                    bookName = data[offset:offset + title_length].decode()
+                    offset += title_length
+                else:
+                    bookName = None
+                book = Book_Node(bookID, bookName, shared[author], shared[availability])
+                if has_borrower:
+                    book.borrowedBy = borrowedBy
+                if reservation_count:
+                    reservations = []
+                    for _ in range(reservation_count):
+                        patronID, priority, sequence = SNAPSHOT_RESERVATION.unpack_from(data, offset)
+                        offset += SNAPSHOT_RESERVATION.size
+                        reservations.append(Reservation_Node(patronID, priority, sequence))
+                    book.reservationHeap = Binary_Min_Heap()
+                    book.reservationHeap.restore(reservations, next_sequence)
+                yield book, bool(red)
+
+        library.book_tree.restore_preorder(entries(offset))
+        library.book_tree.color_flip_count = color_flip_count
+    library.rebuild_indexes()
+    return library, generation
+
+# Append-only log of the mutating commands run since the last snapshot
+# The first line names the snapshot generation the log applies to
+class Write_Ahead_Log:
+    def __init__(self, path, generation, batch_size=WAL_BATCH_SIZE):
+        self.path = path
+        self.batch_size = batch_size
+        self.pending = 0
+        self.file = open(path, 'a', buffering=OUTPUT_BUFFER_SIZE)
+        if self.file.tell() == 0:
+            self.reset(generation)
+
+    def append(self, line):
+        self.file.write(line + "\n")
+        self.pending += 1
+        if self.pending >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        # Write the pending batch of commands to disk
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.pending = 0
+
+    def reset(self, generation):
+        # Empty the log and start it for a new snapshot generation
+        self.file.seek(0)
+        self.file.truncate()
+        self.file.write(WAL_HEADER.format(generation))
+        self.flush()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+# Replay the commands of a write-ahead log that belongs to the given snapshot generation
+# Lines that cannot be parsed, written by older versions that logged commands before running them, are
+# reported on stderr and skipped.
+# Returns the number of replayed commands, or None if the log belongs to another generation
+def replay_log(library, path, generation):
+    count = 0
+    with open(path, 'rb+') as file:
+        if file.readline().decode() != WAL_HEADER.format(generation):
+            return None
+        offset = file.tell()
+        for number, raw_line in enumerate(file, 2):
+            if not raw_line.endswith(b"\n"):
+                # A torn write at the end of the log, the command never completed
+                file.truncate(offset)
+                break
+            offset += len(raw_line)
+            try:
+                output_line = execute_command(library, raw_line.decode().strip())
+            except Command_Error as e:
+                print(f"Error: {path}, line {number}: {e}, skipped", file=sys.stderr)
+                continue
+            if output_line is not None and not isinstance(output_line, str):
+                for _ in output_line:
+                    pass
+            count += 1
+    return count
+
+# Restore a library from the snapshot and write-ahead log in a state directory
+# Returns the library and the log that new mutating commands should be appended to
+def open_library(state_dir, book_tree=None):
+    os.makedirs(state_dir, exist_ok=True)
+    snapshot_path = os.path.join(state_dir, SNAPSHOT_FILENAME)
+    wal_path = os.path.join(state_dir, WAL_FILENAME)
+    if os.path.exists(snapshot_path):
+        library, generation = load_snapshot(snapshot_path, book_tree)
+    else:
+        library, generation = Library_System(book_tree), 0
+    stale = False
+    if os.path.exists(wal_path) and os.path.getsize(wal_path) > 0:
+        # A log of an older generation was already folded into the snapshot before a crash
+        stale = replay_log(library, wal_path, generation) is None
+    log = Write_Ahead_Log(wal_path, generation)
+    if stale:
+        log.reset(generation)
+    return library, log
+
+# Write a new snapshot of the library and start an empty log for it
+def checkpoint_library(library, state_dir, log):
+    snapshot_path = os.path.join(state_dir, SNAPSHOT_FILENAME)
+    generation = 0
+    if os.path.exists(snapshot_path):
+        with open(snapshot_path, 'rb') as file:
+            generation = SNAPSHOT_HEADER.unpack(file.read(SNAPSHOT_HEADER.size))[1]
+    log.flush()
+    save_snapshot(library, snapshot_path, generation + 1)
+    log.reset(generation + 1)
+
+# Number of commands a client can have in flight before the server stops reading from it
+MAX_PIPELINED_COMMANDS = 256
+# Number of queued commands from all clients before clients have to wait
+MAX_QUEUED_COMMANDS = 4096
+
+# Commands that only read the catalog and can run on a snapshot of it, "PrintBook" also matches PrintBooks
+SNAPSHOT_READ_COMMANDS = ("PrintBook", "FindClosestBook")
+
+# Run a read command on a library snapshot in a reader thread, returns its output text or the error it raised
+def command_response(library, line):
+    try:
+        return "".join(render_output(execute_command(library, line)))
     except Exception as e:
-        print(f"Error: {e}")
+        return f"Error: {e}"
 
+# Serves the command language over TCP to many clients at once
+# Each line a client sends is one command. Clients may pipeline commands, the responses come back in order.
+# A response is the output of the command as it would be written to the output file, without the blank
+# lines that follow it, and ends with a line holding a single "."; output lines starting with "." get an
+# extra "." in front. Quit() ends the connection of that client.
+# All commands from all clients run one at a time on a single Library_System in one executor task.
+# With readers, the library tree must support snapshots. PrintBook, PrintBooks and FindClosestBook then run on
+# a snapshot in a pool of reader threads, and the commands queued behind them do not wait for them.
+class Library_Server:
+    def __init__(self, library, log=None, readers=None):
+        self.library = library
+        self.log = log
+        self.readers = concurrent.futures.ThreadPoolExecutor(readers) if readers else None
+        self.queue = None
+        self.executor = None
 
-if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python3 gatorLibrary.py input_filename")
-        sys.exit(1)
+    async def start(self, host, port):
+        self.queue = asyncio.Queue(MAX_QUEUED_COMMANDS)
+        self.executor = asyncio.get_running_loop().create_task(self.execute_commands())
+        return await asyncio.start_server(self.handle_client, host, port)
+
+    async def execute_commands(self):
+        # The single writer: runs queued commands in the order they arrived
+        loop = asyncio.get_running_loop()
+        while True:
+            line, response = await self.queue.get()
+            if self.readers is not None and line.startswith(SNAPSHOT_READ_COMMANDS):
+                reading = loop.run_in_executor(self.readers, command_response, self.library.snapshot(), line)
+                reading.add_done_callback(lambda reading, response=response: response.set_result(reading.result()))
+                continue
+            try:
+                output_line = execute_command(self.library, line)
+                if self.log is not None and line.startswith(MUTATING_COMMANDS):
+                    self.log.append(line)
+                text = "".join(render_output(output_line))
+            except Exception as e:
+                text = f"Error: {e}"
+            response.set_result(text)
+
+    async def handle_client(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        # Responses in the order of the commands, bounded so a client that stops reading stops being read
+        responses = asyncio.Queue(MAX_PIPELINED_COMMANDS)
+        sender = loop.create_task(self.send_responses(responses, writer))
+        try:
+            while True:
+                raw_line = await reader.readline()
+                if not raw_line:
+                    break
+                line = raw_line.decode().strip()
+                response = loop.create_future()
+                if line == "Quit()":
+                    response.set_result("Program Terminated!!")
+                    await responses.put(response)
+                    break
+                await self.queue.put((line, response))
+                await responses.put(response)
+        except (ConnectionError, UnicodeDecodeError):
+            pass
+        finally:
+            await responses.put(None)
+            await sender
+
+    async def send_responses(self, responses, writer):
+        connected = True
+        while True:
+            response = await responses.get()
+            if response is None:
+                break
+            text = (await response).rstrip("\n")
+            if not connected:
+                # Keep taking responses so the reading side never waits on a client that is gone
+                continue
+            lines = ["." + line if line.startswith(".") else line for line in text.split("\n")] if text else []
+            lines.append(".")
+            try:
+                writer.write(("\n".join(lines) + "\n").encode())
+                # Wait for the client to read when the transport buffer is full
+                await writer.drain()
+            except ConnectionError:
+                connected = False
+        writer.close()
+
+# Run the library server until it is interrupted
+def serve(address, library, log=None, readers=None):
+    host, _, port = address.rpartition(":")
+
+    async def run():
+        server = await Library_Server(library, log, readers).start(host or "127.0.0.1", int(port))
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+# Tree engines that can hold the book catalog
+TREE_ENGINES = {
+    "object": Red_Black_Tree,
+    "topdown": lambda: Red_Black_Tree(top_down=True),
+    "array": Array_Red_Black_Tree,
+    "persistent": Persistent_Red_Black_Tree,
+    "chunks": Sorted_Chunk_Map,
+}
+
+# Tree engines with a lookup cache in front of their search, used with --cache
+CACHED_ENGINES = {
+    "object": lambda: Red_Black_Tree(cache=True),
+    "topdown": lambda: Red_Black_Tree(top_down=True, cache=True),
+    "array": lambda: Array_Red_Black_Tree(cache=True),
+}
+
+# New empty tree of an engine, with a lookup cache if cache is set
+def new_tree(engine, cache=False):
+    return (CACHED_ENGINES if cache else TREE_ENGINES)[engine]()
+
+# Number of commands sent to a shard worker together
+SHARD_BATCH_SIZE = 256
+# Number of batches a shard may have in flight before the router waits for its results
+SHARD_BATCHES_IN_FLIGHT = 8
+# Default upper end of the book ID space divided between the shards
+SHARD_ID_RANGE = 1000000
+
+# Position of the book ID argument of commands that act on a single book
+POINT_COMMANDS = {
+    "InsertBook": 0, "PrintBook": 0, "DeleteBook": 0,
+    "BorrowBook": 1, "ReturnBook": 1, "CancelReservation": 1, "ChangePriority": 1,
+}
+
+# Raised in the router for a command that failed in a shard worker
+class Shard_Error(Exception):
+    pass
+
+# Run one request of the router against the library of a shard
+# ("run", line) executes a command line, the other requests return the parts of a result the router merges.
+def run_shard_request(library, request):
+    kind = request[0]
+    tree = library.book_tree
+    if kind == "run":
+        output_line = execute_command(library, request[1])
+        if output_line is not None and not isinstance(output_line, str):
+            output_line = list(output_line)
+        return output_line
+    elif kind == "closest":
+        closest_lower = tree.floor(request[1])
+        closest_higher = tree.ceiling(request[1])
+        return tuple((book.bookID, library.get_book_details(book)) if book is not None else None
+                     for book in (closest_lower, closest_higher))
+    elif kind == "closest_batch":
+        return [tuple((book.bookID, library.get_book_details(book)) if book is not None else None
+                      for book in closest)
+                for closest in library.floor_ceiling_batch(request[1])]
+    elif kind == "delete_range":
+        return library.retire_range(request[1], request[2])
+    elif kind == "bulk_insert":
+        return library.bulk_insert_books(request[1])
+    elif kind == "after":
+        return [(book.bookID, library.scan_details(book))
+                for book in islice(tree.values_in_range(request[1], float("inf")), request[2])]
+    elif kind == "count":
+        return max(0, tree.count_less(request[2] + 1) - tree.count_less(request[1]))
+    elif kind == "rank":
+        return tree.get(request[1]) is not None, tree.count_less(request[1])
+    elif kind == "patron":
+        patron = library.patrons.get(request[1])
+        if patron is None:
+            return [], []
+        return sorted(patron.borrowedBooks), sorted(patron.reservedBooks)
+    elif kind == "title":
+        matches = [(title, bookID, library.get_book_details(book))
+                   for title, bookID, book in library.title_prefix_matches(request[1])]
+        return matches, None if matches else library.search_title_prefix(request[1])
+    elif kind == "size":
+        return len(tree)
+    elif kind == "flips":
+        return tree.color_flip_count
+    raise ValueError(f"Unknown shard request {kind}")
+
+# Main loop of a shard worker process: runs batches of requests in order and sends back their results
+def shard_worker(requests, results, engine, json_output=False, cache=False):
+    library = Library_System(new_tree(engine, cache))
+    library.json_output = json_output
+    while True:
+        batch = requests.get()
+        if batch is None:
+            break
+        outputs = []
+        for request in batch:
+            try:
+                outputs.append(run_shard_request(library, request))
+            except Exception as e:
+                outputs.append(Shard_Error(f"{request[1]}: {e}"))
+        results.put(outputs)
+
+# A worker process owning one range of book IDs, as seen from the router
+class Shard:
+    def __init__(self, engine, json_output=False, cache=False):
+        self.requests = multiprocessing.Queue()
+        self.results = multiprocessing.Queue()
+        self.batch = []  # Requests not sent yet
+        self.in_flight = 0  # Batches sent whose results have not come back
+        self.ready = deque()  # Results not yet taken by a command, in request order
+        self.process = multiprocessing.Process(target=shard_worker,
+                                               args=(self.requests, self.results, engine, json_output, cache),
+                                               daemon=True)
+        self.process.start()
+
+# Runs commands on a catalog split by book ID range across worker processes
+# Commands on one book go to the shard owning it; range and catalog wide commands are sent to the shards they
+# cover and their results merged in order of book ID. Shards work on their batches in parallel while the router
+# keeps reading commands, and outputs are written in the order of the commands.
+# Every output matches a single Library_System except ColorFlipCount, which is the sum over the shard trees.
+class Shard_Router:
+    def __init__(self, shard_count, id_range=SHARD_ID_RANGE, engine="object", json_output=False, cache=False):
+        # Shard i owns the IDs from boundaries[i - 1] up to boundaries[i], the first and last are open ended
+        self.boundaries = [1 + id_range * i // shard_count for i in range(1, shard_count)]
+        self.shards = [Shard(engine, json_output, cache) for _ in range(shard_count)]
+        self.json_output = json_output
+        self.cursors = {}  # Smallest book ID not returned yet of every open cursor
+        self.cursor_count = 0
+
+    def shard_of(self, bookID):
+        return self.shards[bisect.bisect_right(self.boundaries, bookID)]
+
+    def shards_between(self, book_id1, book_id2):
+        if book_id1 > book_id2:
+            return []
+        return self.shards[bisect.bisect_right(self.boundaries, book_id1):
+                           bisect.bisect_right(self.boundaries, book_id2) + 1]
+
+    def submit(self, shard, request):
+        shard.batch.append(request)
+        if len(shard.batch) >= SHARD_BATCH_SIZE:
+            self.send(shard)
+
+    def send(self, shard):
+        if shard.in_flight >= SHARD_BATCHES_IN_FLIGHT:
+            self.receive(shard)
+        shard.requests.put(shard.batch)
+        shard.batch = []
+        shard.in_flight += 1
+
+    def receive(self, shard):
+        shard.ready.extend(shard.results.get())
+        shard.in_flight -= 1
+
+    def route(self, line):
+        # Send the requests for a command line, returns the shards they went to and how to merge their results
+        if not line:
+            return [], lambda results: None
+        command, args = parse_command(line)
+        position = POINT_COMMANDS.get(command)
+        if position is not None:
+            shard = self.shard_of(args[position])
+            self.submit(shard, ("run", line))
+            return [shard], first_result
+
+        if command == "BulkInsertBooks":
+            # Each shard bulk loads its part of the batch
+            batches = {}
+            for book in args[0]:
+                batches.setdefault(bisect.bisect_right(self.boundaries, book[0]), []).append(book)
+            shards = []
+            for index in sorted(batches):
+                shards.append(self.shards[index])
+                self.submit(self.shards[index], ("bulk_insert", batches[index]))
+            return shards, lambda results: None
+
+        if command == "PrintBooks":
+            shards = self.shards_between(args[0], args[1])
+            request = ("run", line)
+            merge = lambda results: [record for records in results for record in records]
+        elif command == "FindClosestBook":
+            target_id = args[0]
+            shards, request = self.shards, ("closest", target_id)
+            merge = lambda results: merge_closest(target_id, results)
+        elif command == "FindClosestBooks":
+            target_ids = args[0]
+            shards, request = self.shards, ("closest_batch", target_ids)
+            merge = lambda results: Output_Batch(merge_closest(target_id, [result[index] for result in results])
+                                                 for index, target_id in enumerate(target_ids))
+        elif command == "DeleteBooks":
+            book_id1, book_id2 = args
+            shards, request = self.shards_between(book_id1, book_id2), ("delete_range", book_id1, book_id2)
+            merge = lambda results: format_range_delete(book_id1, book_id2,
+                                                        [message for messages, _ in results for message in messages],
+                                                        sum(count for _, count in results))
+        elif command == "CountBooks":
+            book_id1, book_id2 = args
+            shards, request = self.shards_between(book_id1, book_id2), ("count", book_id1, book_id2)
+            merge = lambda results: f"Book Count between {book_id1} and {book_id2}: {sum(results)}"
+        elif command == "RankOf":
+            bookID = args[0]
+            shards, request = self.shards, ("rank", bookID)
+            merge = lambda results: merge_rank(bookID, results)
+        elif command == "PatronStatus":
+            patronID = args[0]
+            shards, request = self.shards, ("patron", patronID)
+            merge = lambda results: format_patron_status(patronID, [b for r in results for b in r[0]],
+                                                         [b for r in results for b in r[1]])
+        elif command == "SearchByAuthor":
+            shards, request = self.shards, ("run", line)
+            merge = merge_author
+        elif command == "SearchTitlePrefix":
+            shards, request = self.shards, ("title", args[0])
+            merge = merge_title
+        elif command == "ColorFlipCount":
+            shards, request = self.shards, ("flips",)
+            merge = lambda results: f"Colour Flip Count: {sum(results)}"
+        elif command == "OpenCursor":
+            # Cursors live in the router, the shards only list the books after a position
+            self.cursor_count += 1
+            self.cursors[self.cursor_count] = args[0]
+            message = f"Cursor {self.cursor_count} opened at book ID {args[0]}."
+            return [], lambda results: message
+        elif command == "CloseCursor":
+            cursorID = args[0]
+            message = f"Cursor {cursorID} closed." if self.cursors.pop(cursorID, None) is not None \
+                else f"Cursor {cursorID} not found."
+            return [], lambda results: message
+        else:
+            return [], lambda results: None
+        for shard in shards:
+            self.submit(shard, request)
+        return shards, merge
+
+    def query_all(self, request):
+        # Results of a request from every shard, once all earlier commands have finished
+        for shard in self.shards:
+            self.submit(shard, request)
+            self.send(shard)
+        results = []
+        for shard in self.shards:
+            while not shard.ready:
+                self.receive(shard)
+            results.append(shard.ready.popleft())
+        return results
+
+    def kth_book(self, line):
+        # The shard holding the k-th book depends on the sizes of the shards before it
+        k = parse_command(line)[1][0]
+        position = k
+        for shard, size in zip(self.shards, self.query_all(("size",))):
+            if 1 <= position <= size:
+                self.submit(shard, ("run", f"KthBook({position})"))
+                return [shard], first_result
+            position -= size
+        return [], lambda results: f"No book at position {k} in the library."
 
-    input_filename = sys.argv[1]
-    main(input_filename)
+    def next_books(self, line):
+        # A page takes books from the shards in order of book ID, asking one shard at a time until it is full
+        cursorID, count = parse_command(line)[1]
+        position = self.cursors.get(cursorID)
+        if position is None:
+            return [], lambda results: f"Cursor {cursorID} not found."
+        books = []
+        for shard in self.shards[bisect.bisect_right(self.boundaries, position):]:
+            if len(books) >= count:
+                break
+            self.submit(shard, ("after", position, count - len(books)))
+            self.send(shard)
+            while not shard.ready:
+                self.receive(shard)
+            result = shard.ready.popleft()
+            if isinstance(result, Shard_Error):
+                raise result
+            books.extend(result)
+        if books:
+            self.cursors[cursorID] = books[-1][0] + 1
+        records = [details for _, details in books]
+        return [], lambda results: format_next_books(cursorID, count, records)
+
+    def finished(self, pending, keep):
+        # Yield the outputs of the pending commands in order, as long as their results are in
+        # While more than keep commands are pending, wait for results instead of stopping.
+        while pending:
+            line, shards, merge = pending[0]
+            block = keep is not None and len(pending) > keep
+            for shard in shards:
+                while not shard.ready:
+                    if not block and (shard.in_flight == 0 or shard.results.empty()):
+                        return
+                    if shard.in_flight == 0:
+                        self.send(shard)
+                    else:
+                        self.receive(shard)
+            pending.popleft()
+            results = [shard.ready.popleft() for shard in shards]
+            for result in results:
+                if isinstance(result, Shard_Error):
+                    raise result
+            if self.json_output:
+                yield from render_json_output(line, merge(results))
+            else:
+                yield from render_output(merge(results))
+
+    def run_commands(self, lines, errors=None):
+        # Same output as run_commands() on a single library, malformed lines are skipped the same way
+        pending = deque()
+        max_pending = SHARD_BATCH_SIZE * SHARD_BATCHES_IN_FLIGHT * len(self.shards)
+        for count, line in enumerate(lines, 1):
+            line = line.strip()
+
+            if line == "Quit()":
+                yield from self.finished(pending, 0)
+                yield render_quit(self.json_output)
+                return
+
+            try:
+                if line.startswith("KthBook"):
+                    yield from self.finished(pending, 0)
+                    pending.append((line, *self.kth_book(line)))
+                elif line.startswith("NextBooks"):
+                    yield from self.finished(pending, 0)
+                    pending.append((line, *self.next_books(line)))
+                else:
+                    pending.append((line, *self.route(line)))
+            except Command_Error as e:
+                if errors is not None:
+                    errors.append(f"line {count}: {e}")
+                continue
+            if count % SHARD_BATCH_SIZE == 0 or len(pending) > max_pending:
+                yield from self.finished(pending, max_pending)
+        yield from self.finished(pending, 0)
+
+    def close(self):
+        for shard in self.shards:
+            shard.requests.put(None)
+        for shard in self.shards:
+            shard.process.join()
+
+def first_result(results):
+    return results[0]
+
+# Nearest books over all shards: the highest floor and lowest ceiling of the shards
+def merge_closest(target_id, results):
+    lowers = [lower for lower, _ in results if lower is not None]
+    highers = [higher for _, higher in results if higher is not None]
+    closest_lower = max(lowers) if lowers else None
+    closest_higher = min(highers) if highers else None
+    details = dict(book for book in (closest_lower, closest_higher) if book is not None)
+    return [details[bookID] for bookID in closest_book_ids(target_id,
+                                                           closest_lower[0] if closest_lower else None,
+                                                           closest_higher[0] if closest_higher else None)]
+
+def merge_rank(bookID, results):
+    if not any(found for found, _ in results):
+        return f"Book {bookID} not found in the library."
+    return f"Rank of Book {bookID}: {sum(count for _, count in results) + 1}"
+
+def merge_author(results):
+    # Shards without books by the author answer with the message for no books
+    records = [record for result in results if not isinstance(result, str) for record in result]
+    return records if records else results[0]
+
+def merge_title(results):
+    matches = list(heapq.merge(*(matches for matches, _ in results)))
+    if not matches:
+        return results[0][1]
+    return [details for _, _, details in matches]
+
+# Runs the commands of one input file and returns its errors, if any
+# Malformed lines are reported on stderr and skipped, the run goes on with the next line.
+def main(input_filename, engine="object", state_dir=None, checkpoint=False, stats_filename=None, stats_interval=None,
+         shards=None, id_range=SHARD_ID_RANGE, output_format="text", cache=False):
+    json_output = output_format == "jsonl"
+    log = None
+    router = None
+    if shards is not None:
+        # The catalog lives in the shard worker processes
+        library = None
+        router = Shard_Router(shards, id_range, engine, json_output, cache)
+    elif state_dir is not None:
+        # Continue from the saved state instead of an empty library
+        library, log = open_library(state_dir, new_tree(engine, cache))
+    else:
+        library = Library_System(new_tree(engine, cache))
+    if library is not None:
+        library.json_output = json_output
+    stats = None
+    if stats_filename is not None:
+        stats_output = sys.stderr if stats_filename == "-" else open(stats_filename, 'w')
+        stats = Library_Stats(library, stats_output, stats_interval)
+    output_filename = splitext(input_filename)[0] + ("_output_file.jsonl" if json_output else "_output_file.txt")
+    errors = []
+    try:
+        # Commands are read lazily and their output is streamed through a bounded buffer
+        with open(input_filename, "r") as file, \
+                open(output_filename, 'w', buffering=OUTPUT_BUFFER_SIZE) as output_file:
+            if router is not None:
+                outputs = router.run_commands(file, errors)
+            else:
+                outputs = run_commands(library, file, log, stats, errors)
+            for output in outputs:
+                output_file.write(output)
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return str(e)
+    finally:
+        if router is not None:
+            router.close()
+        if log is not None:
+            if checkpoint:
+                checkpoint_library(library, state_dir, log)
+            log.close()
+        if stats is not None:
+            stats.emit()
+            if stats.output is not sys.stderr:
+                stats.output.close()
+    for error in errors:
+        print(f"Error: {input_filename}, {error}", file=sys.stderr)
+    if errors:
+        return errors[0] if len(errors) == 1 else f"{errors[0]}, and {plural(len(errors) - 1, 'more malformed line')}"
+
+def expand_input_filenames(patterns):
+    filenames = []
+    for pattern in patterns:
+        # Patterns the shell left alone, such as quoted ones, are expanded here
+        if os.path.exists(pattern):
+            filenames.append(pattern)
+        else:
+            # Output files of an earlier run match patterns such as *.txt but are not input
+            matches = [filename for filename in sorted(glob.glob(pattern))
+                       if not splitext(filename)[0].endswith("_output_file")]
+            filenames.extend(matches or [pattern])
+    return filenames
+
+# Runs one file of a batch in a pool worker, returns its time and the error that stopped it, if any
+def run_batch_file(input_filename, engine="object", output_format="text", cache=False):
+    start = time.perf_counter()
+    try:
+        error = main(input_filename, engine, output_format=output_format, cache=cache)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    return time.perf_counter() - start, error
+
+def run_pool(input_filenames, workers, engine, output_format, cache, results):
+    with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+        futures = {filename: pool.submit(run_batch_file, filename, engine, output_format, cache)
+                   for filename in input_filenames}
+        for filename, future in futures.items():
+            try:
+                results[filename] = future.result()
+            except concurrent.futures.process.BrokenProcessPool:
+                pass
+
+# Runs independent input files in a process pool with one Library_System per file, so each file pays no
+# interpreter startup. Every file writes its output file exactly as main() does. Errors in a file are caught in
+# its worker, and if a worker process dies the files it left unfinished are run again, each in a pool of its own,
+# so a failure in one file never stops the others. Prints the time of every file and returns the failures.
+def run_batch(input_filenames, workers=None, engine="object", output_format="text", cache=False, summary=sys.stdout):
+    input_filenames = list(dict.fromkeys(input_filenames))
+    workers = max(1, min(workers or os.cpu_count() or 1, len(input_filenames)))
+    start = time.perf_counter()
+    results = {}
+    run_pool(input_filenames, workers, engine, output_format, cache, results)
+    for filename in input_filenames:
+        if filename not in results:
+            run_pool([filename], 1, engine, output_format, cache, results)
+            results.setdefault(filename, (None, "worker process died"))
+    elapsed = time.perf_counter() - start
+
+    width = max(len(filename) for filename in input_filenames)
+    failures = 0
+    for filename in input_filenames:
+        seconds, error = results[filename]
+        timing = "-" if seconds is None else f"{seconds:.3f}s"
+        if error is None:
+            print(f"{filename:<{width}}  {timing:>9}  ok", file=summary)
+        else:
+            failures += 1
+            print(f"{filename:<{width}}  {timing:>9}  failed: {error}", file=summary)
+    busy = sum(seconds for seconds, _ in results.values() if seconds is not None)
+    print(f"{plural(len(input_filenames), 'file')}, {failures} failed, {elapsed:.3f}s elapsed, "
+          f"{busy:.3f}s in files on {plural(workers, 'worker')}", file=summary)
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="gatorLibrary.py", description="Run library commands from an input file")
+    parser.add_argument("input_filenames", nargs="*", metavar="input_filename",
+                        help="input files or glob patterns, several files run as a batch in a process pool")
+    parser.add_argument("--serve", metavar="HOST:PORT",
+                        help="serve commands over TCP instead of reading an input file")
+    parser.add_argument("--engine", choices=sorted(TREE_ENGINES), default="object",
+                        help="tree engine used for the book catalog (default: object)")
+    parser.add_argument("--cache", action="store_true",
+                        help="put a lookup cache in front of the tree search, faster when a few books get most "
+                             "lookups and slower otherwise (engines object, topdown and array)")
+    parser.add_argument("--state", dest="state_dir", metavar="DIR",
+                        help="restore the library from a snapshot and write-ahead log in DIR and log new changes there")
+    parser.add_argument("--checkpoint", action="store_true",
+                        help="with --state, write a new snapshot and empty the log when the run ends")
+    parser.add_argument("--stats", dest="stats_filename", metavar="FILE",
+                        help="write command latency histograms and tree statistics as JSON lines to FILE ('-' for stderr)")
+    parser.add_argument("--stats-interval", type=int, metavar="N",
+                        help="with --stats, also write a report every N commands")
+    parser.add_argument("--readers", type=int, metavar="N",
+                        help="with --serve and --engine persistent, run catalog reads on snapshots in N threads")
+    parser.add_argument("--output-format", choices=("text", "jsonl"), default="text",
+                        help="write the output as text or as JSON Lines to <input>_output_file.jsonl (default: text)")
+    parser.add_argument("--shards", type=int, metavar="N",
+                        help="split the catalog by book ID range across N worker processes")
+    parser.add_argument("--id-range", type=int, default=SHARD_ID_RANGE, metavar="MAX",
+                        help=f"with --shards, book IDs 1 to MAX are divided evenly between the shards "
+                             f"(default: {SHARD_ID_RANGE})")
+    parser.add_argument("--workers", type=int, metavar="N",
+                        help="run the input files as a batch in N worker processes (default: one per CPU)")
+    args = parser.parse_args()
+    input_filenames = expand_input_filenames(args.input_filenames)
+    batch = len(input_filenames) > 1 or args.workers is not None
+    if batch and (args.serve is not None or args.state_dir is not None or args.stats_filename or args.shards):
+        parser.error("a batch of input files cannot be combined with --serve, --state, --stats or --shards")
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.shards is not None and (args.serve is not None or args.state_dir is not None or args.stats_filename):
+        parser.error("--shards cannot be combined with --serve, --state or --stats")
+    if args.shards is not None and args.shards < 1:
+        parser.error("--shards must be at least 1")
+    if args.readers and (args.serve is None or args.engine != "persistent"):
+        parser.error("--readers needs --serve and --engine persistent")
+    if args.cache and args.engine not in CACHED_ENGINES:
+        parser.error(f"--cache needs --engine {', '.join(sorted(CACHED_ENGINES))}")
+    if args.serve is not None:
+        if args.state_dir is not None:
+            library, log = open_library(args.state_dir, new_tree(args.engine, args.cache))
+        else:
+            library, log = Library_System(new_tree(args.engine, args.cache)), None
+        try:
+            serve(args.serve, library, log, args.readers)
+        finally:
+            if log is not None:
+                if args.checkpoint:
+                    checkpoint_library(library, args.state_dir, log)
+                log.close()
+    elif not input_filenames:
+        parser.error("an input file or --serve is required")
+    elif batch:
+        sys.exit(1 if run_batch(input_filenames, args.workers, args.engine, args.output_format, args.cache) else 0)
+    else:
+        sys.exit(1 if main(input_filenames[0], args.engine, args.state_dir, args.checkpoint, args.stats_filename,
+                           args.stats_interval, args.shards, args.id_range, args.output_format, args.cache) else 0)
@@ -0,0 +1,48 @@
+# Tests of the array engine on book IDs the other engines accept
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gatorLibrary import Library_System, TREE_ENGINES, run_commands
+
+
+def run(library, lines):
+    return "".join(run_commands(library, lines))
+
+
+# IDs at and beyond both ends of the 64-bit range, next to small ones
+LARGE_IDS = [5, 2 ** 63 - 1, 2 ** 63, 10 ** 30, -2 ** 63, -2 ** 63 - 1, -10 ** 30, 7, 3]
+
+COMMANDS = [f'InsertBook({bookID}, "Book{bookID}", "Author", "Yes")' for bookID in LARGE_IDS] + [
+    f"PrintBooks({-10 ** 40}, {10 ** 40})", f"PrintBook({10 ** 30})", f"FindClosestBook({2 ** 63 + 5})",
+    f"RankOf({2 ** 63})", "KthBook(9)", f"CountBooks({-2 ** 64}, 0)", f"DeleteBook({-2 ** 63 - 1})",
+    f"BorrowBook(1, {2 ** 63}, 1)", f"DeleteBooks(6, {2 ** 63 - 1})", f'InsertBook({2 ** 64}, "Again", "Author", "Yes")',
+    f"PrintBooks({-10 ** 40}, {10 ** 40})", "ColorFlipCount()",
+]
+
+
+class Array_Tree_Test(unittest.TestCase):
+    def test_ids_beyond_64_bits(self):
+        expected = run(Library_System(), COMMANDS)
+        self.assertIn(f"BookID = {10 ** 30}", expected)
+        for engine in ("array", "persistent", "topdown", "chunks"):
+            with self.subTest(engine=engine):
+                output = run(Library_System(TREE_ENGINES[engine]()), COMMANDS)
+                if engine in ("topdown", "chunks"):
+                    output, expected_output = output.rsplit("Colour", 1)[0], expected.rsplit("Colour", 1)[0]
+                else:
+                    expected_output = expected
+                self.assertEqual(output, expected_output)
+
+    def test_keys_stay_typed_for_64_bit_ids(self):
+        library = Library_System(TREE_ENGINES["array"]())
+        run(library, [f'InsertBook({bookID}, "Book", "Author", "Yes")' for bookID in (1, 2 ** 63 - 1, -2 ** 63)])
+        self.assertEqual(library.book_tree.keys.typecode, "q")
+        run(library, [f'InsertBook({2 ** 63}, "Book", "Author", "Yes")'])
+        self.assertIsInstance(library.book_tree.keys, list)
+        self.assertEqual([book.bookID for book in library.book_tree.values()], [-2 ** 63, 1, 2 ** 63 - 1, 2 ** 63])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+# Tests of BulkInsertBooks and the color flip accounting of bulk loads
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gatorLibrary import (Array_Red_Black_Tree, Library_System, Shard_Router, Sorted_Chunk_Map, TREE_ENGINES,
+                          run_commands)
+
+
+def run(library, lines, errors=None):
+    return "".join(run_commands(library, lines, errors=errors))
+
+
+def insert_lines(ids):
+    return [f'InsertBook({bookID}, "Book{bookID}", "Author{bookID % 7}", "Yes")' for bookID in ids]
+
+
+def bulk_line(ids):
+    return "BulkInsertBooks(" + ", ".join(f'{bookID}, "Book{bookID}", "Author{bookID % 7}", "Yes"'
+                                          for bookID in ids) + ")"
+
+
+# Color of every node by book ID
+def node_colors(tree):
+    if isinstance(tree, Array_Red_Black_Tree):
+        return {tree.keys[node]: bool(tree.red[node]) for node in tree.inorder_nodes()}
+    return {node.val.bookID: node.red for node in tree.inorder_nodes()}
+
+
+QUERIES = ["PrintBooks(1, 5000)", 'SearchByAuthor("Author3")', 'SearchTitlePrefix("Book1")', "RankOf(400)",
+           "KthBook(17)", "FindClosestBook(2500)"]
+
+
+class Bulk_Load_Test(unittest.TestCase):
+    def test_replay_matches_insert_lines(self):
+        # Same books and indexes as InsertBook lines, and no color flips for a load into an empty library
+        ids = list(range(1, 3000, 3))
+        for engine, new_tree in TREE_ENGINES.items():
+            with self.subTest(engine=engine):
+                inserted = run(Library_System(new_tree()), insert_lines(ids) + QUERIES)
+                bulk = Library_System(new_tree())
+                loaded = run(bulk, [bulk_line(ids)] + QUERIES + ["ColorFlipCount()"])
+                self.assertEqual(loaded, inserted + "Colour Flip Count: 0\n\n\n")
+                self.assertEqual(len(bulk.title_index), len(ids))
+
+    def test_small_batch_counts_like_inserts(self):
+        # A batch that is small next to the tree goes through insert, with its color flips
+        catalog = insert_lines(random.Random(1).sample(range(1, 10000), 2000))
+        batch = [10001, 10003, 10005]
+        for engine, new_tree in TREE_ENGINES.items():
+            with self.subTest(engine=engine):
+                inserted = run(Library_System(new_tree()), catalog + insert_lines(batch) + ["ColorFlipCount()"])
+                loaded = run(Library_System(new_tree()), catalog + [bulk_line(batch), "ColorFlipCount()"])
+                self.assertEqual(loaded, inserted)
+
+    def test_large_batch_counts_recolored_nodes(self):
+        # A rebuild counts one flip per existing node whose color changed, and none for the new nodes
+        ids = random.Random(2).sample(range(1, 2000), 300)
+        batch = sorted(set(range(1, 2000, 4)) | set(ids[:20]))
+        for engine, new_tree in TREE_ENGINES.items():
+            with self.subTest(engine=engine):
+                library = Library_System(new_tree())
+                run(library, insert_lines(ids))
+                tree = library.book_tree
+                if isinstance(tree, Sorted_Chunk_Map):
+                    run(library, [bulk_line(batch)])
+                    self.assertEqual(tree.color_flip_count, 0)
+                    continue
+                before, colors = tree.color_flip_count, node_colors(tree)
+                run(library, [bulk_line(batch)])
+                after = node_colors(tree)
+                recolored = sum(after[bookID] != red for bookID, red in colors.items())
+                self.assertEqual(tree.color_flip_count, before + recolored)
+                self.assertEqual(len(tree), len(set(ids) | set(batch)))
+
+    def test_repeated_ids_keep_the_first_book(self):
+        library = Library_System()
+        output = run(library, ['InsertBook(2, "Old", "A", "Yes")',
+                               'BulkInsertBooks(1, "First", "A", "Yes", 1, "Second", "B", "No", 2, "New", "A", "Yes")',
+                               "PrintBooks(1, 2)"])
+        self.assertIn('Title = "First"', output)
+        self.assertIn('Title = "Old"', output)
+        self.assertNotIn('"Second"', output)
+        self.assertNotIn('"New"', output)
+
+    def test_malformed_batches(self):
+        errors = []
+        output = run(Library_System(), ['BulkInsertBooks(1, "A", "B", "Yes", 2)', "BulkInsertBooks()",
+                                        'BulkInsertBooks(x, "A", "B", "Yes")', "PrintBooks(1, 2)"], errors)
+        self.assertEqual(output, "\n\n\n")
+        self.assertEqual(errors, ["line 1: BulkInsertBooks takes its arguments in groups of 4, got 5",
+                                  "line 2: BulkInsertBooks takes at least 4 arguments, got 0",
+                                  "line 3: argument 1 of BulkInsertBooks must be an integer, got 'x'"])
+
+    def test_sharded_load(self):
+        ids = list(range(1, 3000, 7))
+        expected = run(Library_System(), [bulk_line(ids)] + QUERIES)
+        router = Shard_Router(3, 3000)
+        try:
+            output = "".join(router.run_commands([bulk_line(ids)] + QUERIES))
+        finally:
+            router.close()
+        self.assertEqual(output, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+# Tests of the sorted chunk map with the integer keys of the catalog and the string keys of the title index
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gatorLibrary import CHUNK_LOAD, Sorted_Chunk_Map
+
+
+def check_chunks(test, chunks):
+    keys = [key for chunk in chunks.keys for key in chunk]
+    test.assertEqual(keys, sorted(set(keys)))
+    test.assertEqual(chunks.maxes, [chunk[-1] for chunk in chunks.keys])
+    test.assertTrue(all(chunks.keys))
+    test.assertEqual(chunks.count, len(keys))
+
+
+class Chunk_Map_Test(unittest.TestCase):
+    def run_ranges(self, new_key, bounds):
+        # Random range deletes against a dict, with inclusive bounds that are or are not keys of the map
+        rng = random.Random(5)
+        chunks = Sorted_Chunk_Map()
+        model = {}
+        for _ in range(8 * CHUNK_LOAD):
+            key = new_key(rng)
+            if chunks.insert_item(key, key):
+                model[key] = key
+        for _ in range(200):
+            low, high = sorted(bounds(rng) for _ in range(2))
+            expected = sorted(key for key in model if low <= key <= high)
+            self.assertEqual(chunks.delete_range(low, high), expected)
+            for key in expected:
+                del model[key]
+            check_chunks(self, chunks)
+            for _ in range(20):
+                key = new_key(rng)
+                if chunks.insert_item(key, key):
+                    model[key] = key
+        self.assertEqual([key for chunk in chunks.keys for key in chunk], sorted(model))
+
+    def test_integer_ranges(self):
+        self.run_ranges(lambda rng: rng.randrange(100000), lambda rng: rng.randrange(-10, 100010))
+
+    def test_title_ranges(self):
+        # Keys of the title index: (title, book ID)
+        def title_key(rng):
+            return f"Book{rng.randrange(2000)}", rng.randrange(100)
+
+        def title_bound(rng):
+            key = title_key(rng)
+            return key if rng.random() < 0.5 else key[:1]
+        self.run_ranges(title_key, title_bound)
+
+    def test_inclusive_upper_bound(self):
+        chunks = Sorted_Chunk_Map()
+        for key in ("a", "b", "b\0", "c"):
+            chunks.insert_item(key, key)
+        self.assertEqual(chunks.delete_range("a", "b"), ["a", "b"])
+        self.assertEqual(chunks.delete_range("c", "b"), [])
+        self.assertEqual(chunks.delete_range("b\0", "z"), ["b\0", "c"])
+        self.assertEqual(len(chunks), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
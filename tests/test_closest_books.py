@@ -0,0 +1,58 @@
+# Tests of batch FindClosestBooks against FindClosestBook, with and without NumPy
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import gatorLibrary
+from gatorLibrary import Library_System
+
+# IDs 10 apart, so targets halfway between two books are ties, and IDs next to each other
+IDS = list(range(10, 200, 10)) + [500, 501, 503]
+# Ties, IDs in the catalog, neighbors of the first and last book and targets beyond both ends
+TARGETS = [15, 25, 185, 10, 190, 500, 501, 502, 503, 504, 350, 345, 9, 0, -5, 11, 189, 191, 1000, 10 ** 6]
+
+
+def library_with(ids):
+    library = Library_System()
+    library.bulk_insert_books((bookID, f'"Book{bookID}"', '"Author"', '"Yes"') for bookID in ids)
+    return library
+
+
+def batch(library, targets):
+    library.id_mirror = None
+    return [list(records) for records in library.find_closest_books(targets)]
+
+
+class Closest_Books_Test(unittest.TestCase):
+    def test_batch_matches_single_lookups(self):
+        for ids in (IDS, [7], []):
+            with self.subTest(ids=ids):
+                library = library_with(ids)
+                with mock.patch.object(gatorLibrary, "numpy", None):
+                    self.assertEqual(batch(library, TARGETS),
+                                     [library.find_closest_book(target_id) for target_id in TARGETS])
+
+    def test_ties_list_both_books(self):
+        library = library_with(IDS)
+        with mock.patch.object(gatorLibrary, "numpy", None):
+            records = batch(library, [15, 502, 9, 1000])
+        self.assertEqual([[record.split("\n")[0] for record in found] for found in records],
+                         [["BookID = 10", "BookID = 20"], ["BookID = 501", "BookID = 503"], ["BookID = 10"],
+                          ["BookID = 503"]])
+
+    @unittest.skipIf(gatorLibrary.numpy is None, "NumPy is not installed")
+    def test_numpy_matches_bisect(self):
+        for ids in (IDS, [7], [], [-2 ** 63, 2 ** 63 - 1], [1, 2 ** 64]):
+            with self.subTest(ids=ids):
+                library = library_with(ids)
+                targets = TARGETS + [-2 ** 63, 2 ** 63 - 1]
+                with mock.patch.object(gatorLibrary, "numpy", None):
+                    expected = batch(library, targets)
+                self.assertEqual(batch(library, targets), expected)
+                self.assertEqual(batch(library, targets + [2 ** 70]), expected + [library.find_closest_book(2 ** 70)])
+
+
+if __name__ == "__main__":
+    unittest.main()
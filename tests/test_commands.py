@@ -0,0 +1,174 @@
+# Expected output of the commands added to the input language, and the errors of malformed lines
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gatorLibrary import Library_System, TREE_ENGINES, run_commands
+
+CATALOG = ['InsertBook(10, "Dune", "Frank Herbert", "Yes")', 'InsertBook(20, "Dune Messiah", "Frank Herbert", "Yes")',
+           'InsertBook(30, "Emma", "Jane Austen", "Yes")', 'InsertBook(40, "Persuasion", "Jane Austen", "Yes")',
+           "BorrowBook(1, 20, 2)", "BorrowBook(3, 20, 3)"]
+
+
+def run(lines, json_output=False, errors=None, engine="object"):
+    library = Library_System(TREE_ENGINES[engine]())
+    library.json_output = json_output
+    return "".join(run_commands(library, lines, errors=errors))
+
+
+def record(bookID, title, author, borrowedBy=None, reservations=()):
+    return (f'BookID = {bookID}\nTitle = "{title}"\nAuthor = "{author}"\n'
+            f'Availability = "{"Yes" if borrowedBy is None else "No"}"\nBorrowedBy = {borrowedBy}\n'
+            f"Reservations = {list(reservations)}")
+
+
+# Records of a command that prints a list of books, which ends with a blank line before the usual three newlines
+def books(*records):
+    return "\n\n".join(records) + "\n\n\n\n"
+
+
+def messages(*lines):
+    return "".join(f"{line}\n\n\n" for line in lines)
+
+
+DUNE = record(10, "Dune", "Frank Herbert")
+MESSIAH = record(20, "Dune Messiah", "Frank Herbert", 1, [3])
+EMMA = record(30, "Emma", "Jane Austen")
+PERSUASION = record(40, "Persuasion", "Jane Austen")
+
+
+class Command_Output_Test(unittest.TestCase):
+    def test_reservation_commands(self):
+        output = run(CATALOG[:2] + ["BorrowBook(1, 20, 2)", "BorrowBook(2, 20, 1)", "BorrowBook(3, 20, 3)",
+                                    "ChangePriority(3, 20, 0)", "ChangePriority(4, 20, 1)", "CancelReservation(2, 20)",
+                                    "CancelReservation(2, 20)", "CancelReservation(2, 99)", "ChangePriority(2, 99, 1)",
+                                    "PatronStatus(1)", "PatronStatus(3)", "PatronStatus(7)"])
+        self.assertEqual(output, messages(
+            "Book 20 Borrowed by Patron 1",
+            "Book 20 Reserved by Patron 2",
+            "Book 20 Reserved by Patron 3",
+            "Priority of Patron 3 for Book 20 changed to 0",
+            "Patron 4 has no reservation for Book 20.",
+            "Reservation made by Patron 2 for Book 20 has been cancelled!",
+            "Patron 2 has no reservation for Book 20.",
+            "Book 99 not found in the library.",
+            "Book 99 not found in the library.",
+            "PatronID = 1\nBorrowed = [20]\nReservations = []",
+            "PatronID = 3\nBorrowed = []\nReservations = [20]",
+            "PatronID = 7\nBorrowed = []\nReservations = []",
+        ))
+
+    def test_order_statistics(self):
+        for engine in TREE_ENGINES:
+            with self.subTest(engine=engine):
+                output = run(CATALOG + ["CountBooks(15, 40)", "CountBooks(41, 50)", "CountBooks(40, 15)",
+                                        "RankOf(30)", "RankOf(31)", "KthBook(2)", "KthBook(5)", "KthBook(0)"],
+                             engine=engine)
+                self.assertEqual(output, messages(
+                    "Book 20 Borrowed by Patron 1",
+                    "Book 20 Reserved by Patron 3",
+                    "Book Count between 15 and 40: 3",
+                    "Book Count between 41 and 50: 0",
+                    "Book Count between 40 and 15: 0",
+                    "Rank of Book 30: 3",
+                    "Book 31 not found in the library.",
+                    MESSIAH,
+                    "No book at position 5 in the library.",
+                    "No book at position 0 in the library.",
+                ))
+
+    def test_searches(self):
+        output = run(CATALOG + ["FindClosestBooks(25, 9, 45)", 'SearchByAuthor("Jane Austen")',
+                                'SearchByAuthor("Nobody")', 'SearchTitlePrefix("Dune")', 'SearchTitlePrefix("Zz")'])
+        self.assertEqual(output, messages("Book 20 Borrowed by Patron 1", "Book 20 Reserved by Patron 3")
+                         + books(MESSIAH, EMMA) + books(DUNE) + books(PERSUASION)
+                         + books(EMMA, PERSUASION)
+                         + messages('No books by Author "Nobody" found in the library.')
+                         + books(DUNE, MESSIAH)
+                         + messages('No books with a title starting with "Zz" found in the library.'))
+
+    def test_cursors(self):
+        # A book inserted behind the cursor's position shows up on the next page
+        output = run(CATALOG[:4] + ["OpenCursor(15)", "NextBooks(1, 2)",
+                                    'InsertBook(35, "Sanditon", "Jane Austen", "Yes")', "NextBooks(1, 5)",
+                                    "NextBooks(1, 1)", "NextBooks(1, 0)", "NextBooks(2, 1)", "CloseCursor(1)",
+                                    "CloseCursor(1)", "NextBooks(1, 1)"])
+        self.assertEqual(output, messages("Cursor 1 opened at book ID 15.")
+                         + books(record(20, "Dune Messiah", "Frank Herbert"), EMMA)
+                         + books(record(35, "Sanditon", "Jane Austen"), PERSUASION)
+                         + messages("Cursor 1 has no more books.")
+                         + "\n\n\n"  # A page of no books is an empty list
+                         + messages("Cursor 2 not found.", "Cursor 1 closed.", "Cursor 1 not found.",
+                                    "Cursor 1 not found."))
+
+    def test_range_delete(self):
+        for engine in TREE_ENGINES:
+            with self.subTest(engine=engine):
+                output = run(CATALOG + ["DeleteBooks(15, 30)", "DeleteBooks(15, 30)", "DeleteBooks(40, 40)",
+                                        "PatronStatus(1)", "PatronStatus(3)", "PrintBooks(1, 100)"], engine=engine)
+                self.assertEqual(output, messages(
+                    "Book 20 Borrowed by Patron 1",
+                    "Book 20 Reserved by Patron 3",
+                    "Book 20 is no longer available. Reservations made by Patrons 3 have been cancelled!",
+                    "Deleted 2 books between 15 and 30.",
+                    "No books between 15 and 30 found in the library.",
+                    "Deleted 1 book between 40 and 40.",
+                    "PatronID = 1\nBorrowed = []\nReservations = []",
+                    "PatronID = 3\nBorrowed = []\nReservations = []",
+                ) + books(DUNE))
+
+    def test_bulk_insert(self):
+        output = run(['BulkInsertBooks(45, "C", "D", "Yes", 5, "A", "B", "Yes")', "PrintBooks(1, 100)"])
+        self.assertEqual(output, books(record(5, "A", "B"), record(45, "C", "D")))
+
+    def test_json_lines(self):
+        output = run(CATALOG[:2] + ["BorrowBook(1, 20, 2)", "BorrowBook(2, 20, 1)", "PrintBook(20)",
+                                    "FindClosestBooks(15, 30)", "OpenCursor(1)", "NextBooks(1, 5)", "NextBooks(1, 5)",
+                                    'SearchTitlePrefix("Zz")', "DeleteBooks(1, 100)", "ColorFlipCount()", "Quit()"],
+                     json_output=True)
+        dune = ('{"bookID": 10, "title": "Dune", "author": "Frank Herbert", "availability": "Yes", '
+                '"borrowedBy": null, "reservations": []}')
+        messiah = ('{"bookID": 20, "title": "Dune Messiah", "author": "Frank Herbert", "availability": "No", '
+                   '"borrowedBy": 1, "reservations": [2]}')
+        self.assertEqual(output.split("\n"), [
+            '{"command": "BorrowBook", "message": "Book 20 Borrowed by Patron 1"}',
+            '{"command": "BorrowBook", "message": "Book 20 Reserved by Patron 2"}',
+            f'{{"command": "PrintBook", "books": [{messiah}]}}',
+            f'{{"command": "FindClosestBooks", "books": [{dune}, {messiah}]}}',
+            f'{{"command": "FindClosestBooks", "books": [{messiah}]}}',
+            '{"command": "OpenCursor", "message": "Cursor 1 opened at book ID 1."}',
+            f'{{"command": "NextBooks", "books": [{dune}, {messiah}]}}',
+            '{"command": "NextBooks", "message": "Cursor 1 has no more books."}',
+            '{"command": "SearchTitlePrefix", "message": "No books with a title starting with \\"Zz\\" found in the '
+            'library."}',
+            '{"command": "DeleteBooks", "message": "Book 20 is no longer available. Reservations made by Patrons 2 '
+            'have been cancelled!"}',
+            '{"command": "DeleteBooks", "message": "Deleted 2 books between 1 and 100."}',
+            '{"command": "ColorFlipCount", "message": "Colour Flip Count: 0"}',
+            '{"command": "Quit", "message": "Program Terminated!!"}',
+            "",
+        ])
+
+    def test_malformed_lines(self):
+        # Malformed lines are skipped with an error naming the line, and the lines after them still run
+        errors = []
+        output = run(['InsertBook(1, "A", "B", "Yes")', "Frobnicate(1)", "PrintBook(1", "PrintBooks(1)",
+                      "KthBook(one)", "NextBooks(1, 2, 3)", 'PatronStatus("1")', "PrintBook 1",
+                      "FindClosestBooks()", 'CancelReservation(1, "2")', "CountBooks(1, 2)"], errors=errors)
+        self.assertEqual(output, messages("Book Count between 1 and 2: 1"))
+        self.assertEqual(errors, [
+            "line 2: unknown command Frobnicate",
+            "line 3: missing ) at the end of PrintBook(1",
+            "line 4: PrintBooks takes 2 arguments, got 1",
+            "line 5: argument 1 of KthBook must be an integer, got 'one'",
+            "line 6: NextBooks takes 2 arguments, got 3",
+            "line 7: argument 1 of PatronStatus must be an integer, got '\"1\"'",
+            "line 8: expected Command(arguments), got 'PrintBook 1'",
+            "line 9: FindClosestBooks takes at least 1 argument, got 0",
+            "line 10: argument 2 of CancelReservation must be an integer, got '\"2\"'",
+        ])
+
+
+if __name__ == "__main__":
+    unittest.main()
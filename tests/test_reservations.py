@@ -0,0 +1,94 @@
+# Tests of the reservation heap and the reservation commands
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gatorLibrary import Binary_Min_Heap, Library_System, run_commands
+
+
+def run(lines):
+    return "".join(run_commands(Library_System(), lines))
+
+
+def record(bookID, borrowedBy, reservations, availability="No"):
+    return (f'BookID = {bookID}\nTitle = "A"\nAuthor = "X"\nAvailability = "{availability}"\n'
+            f"BorrowedBy = {borrowedBy}\nReservations = {reservations}\n\n\n")
+
+
+def status(patronID, borrowed, reserved):
+    return f"PatronID = {patronID}\nBorrowed = {borrowed}\nReservations = {reserved}\n\n\n"
+
+
+class Reservation_Test(unittest.TestCase):
+    def test_repeated_reservation(self):
+        # A patron reserving a book again gets a second reservation, with the output the program always wrote
+        output = run(['InsertBook(1, "A", "X", "Yes")', "BorrowBook(1, 1, 1)", "BorrowBook(2, 1, 3)",
+                      "BorrowBook(2, 1, 2)", "BorrowBook(3, 1, 5)", "PrintBook(1)", "ReturnBook(1, 1)",
+                      "PatronStatus(2)", "ReturnBook(2, 1)", "PrintBook(1)", "DeleteBook(1)", "PatronStatus(3)"])
+        self.assertEqual(output, (
+            "Book 1 Borrowed by Patron 1\n\n\n"
+            "Book 1 Reserved by Patron 2\n\n\n"
+            "Book 1 Reserved by Patron 2\n\n\n"
+            "Book 1 Reserved by Patron 3\n\n\n"
+            + record(1, 1, [2, 2, 3]) +
+            "Book 1 Returned by Patron 1\nBook 1 Allotted to Patron 2\n\n\n"
+            + status(2, [1], [1]) +
+            "Book 1 Returned by Patron 2\nBook 1 Allotted to Patron 2\n\n\n"
+            + record(1, 2, [3]) +
+            "Book 1 is no longer available. Reservations made by Patrons 3 have been cancelled!\n\n\n"
+            + status(3, [], [])))
+
+    def test_cancel_and_change_priority(self):
+        output = run(['InsertBook(1, "A", "X", "Yes")', "BorrowBook(1, 1, 1)", "BorrowBook(2, 1, 3)",
+                      "BorrowBook(2, 1, 4)", "BorrowBook(3, 1, 2)", "ChangePriority(2, 1, 1)", "PrintBook(1)",
+                      "CancelReservation(2, 1)", "CancelReservation(2, 1)", "ChangePriority(4, 1, 1)",
+                      "CancelReservation(1, 7)", "PrintBook(1)", "PatronStatus(2)"])
+        self.assertEqual(output, (
+            "Book 1 Borrowed by Patron 1\n\n\n"
+            "Book 1 Reserved by Patron 2\n\n\n"
+            "Book 1 Reserved by Patron 2\n\n\n"
+            "Book 1 Reserved by Patron 3\n\n\n"
+            "Priority of Patron 2 for Book 1 changed to 1\n\n\n"
+            + record(1, 1, [2, 2, 3]) +
+            "Reservation made by Patron 2 for Book 1 has been cancelled!\n\n\n"
+            "Patron 2 has no reservation for Book 1.\n\n\n"
+            "Patron 4 has no reservation for Book 1.\n\n\n"
+            "Book 7 not found in the library.\n\n\n"
+            + record(1, 1, [3])
+            + status(2, [], [])))
+
+    def test_full_waitlist(self):
+        lines = ['InsertBook(1, "A", "X", "Yes")', "BorrowBook(100, 1, 1)"]
+        lines += [f"BorrowBook({patronID}, 1, 1)" for patronID in range(1, 22)]
+        output = run(lines)
+        self.assertTrue(output.endswith("Waitlist for Book 1 is full. Cannot add reservation for Patron 21\n\n\n"))
+        self.assertEqual(output.count("Reserved by Patron"), 20)
+
+    def test_heap_order_and_index(self):
+        # Random inserts, removals and priority changes keep the heap order and the index of every reservation
+        rng = random.Random(3)
+        heap = Binary_Min_Heap()
+        for _ in range(3000):
+            choice = rng.random()
+            patronID = rng.randrange(30)
+            if choice < 0.5:
+                heap.insert(patronID, rng.randrange(10))
+            elif choice < 0.65:
+                heap.remove(patronID)
+                self.assertNotIn(patronID, heap)
+            elif choice < 0.8:
+                heap.update_priority(patronID, rng.randrange(10))
+            else:
+                heap.remove_min()
+            for index, reservation in enumerate(heap.heap):
+                self.assertEqual(reservation.index, index)
+                if index:
+                    self.assertLessEqual(heap.heap[(index - 1) // 2].key(), reservation.key())
+            self.assertEqual(sorted(id(r) for rs in heap.reservations.values() for r in rs),
+                             sorted(id(r) for r in heap.heap))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+# Tests of snapshot readers running next to the writer, as the server runs them with --readers
+import concurrent.futures
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gatorLibrary import RENDERED_BOOKS, Library_System, Persistent_Red_Black_Tree, command_response, execute_command
+
+CATALOG_SIZE = 3000
+
+
+class Snapshot_Reader_Test(unittest.TestCase):
+    def test_readers_do_not_change_the_library(self):
+        library = Library_System(Persistent_Red_Black_Tree())
+        for bookID in range(1, CATALOG_SIZE + 1):
+            library.insert_book(bookID, f'"Book{bookID}"', '"Author"', '"Yes"')
+        for bookID in range(1, RENDERED_BOOKS + 1):
+            library.print_book(bookID)
+        cached = list(library.rendered_books)
+        reader = library.snapshot()
+        for bookID in range(RENDERED_BOOKS + 1, CATALOG_SIZE + 1):
+            self.assertEqual(reader.print_book(bookID), library.render_book(reader.book_tree.get(bookID)))
+        list(reader.print_books(1, CATALOG_SIZE))
+        reader.find_closest_book(CATALOG_SIZE + 5)
+        self.assertEqual(list(library.rendered_books), cached)
+        self.assertIsNot(reader.cursors, library.cursors)
+
+    def test_print_book_from_readers_while_writing(self):
+        # The writer borrows, returns, inserts and deletes while reader threads print books of snapshots.
+        # Every reader sees the catalog of its snapshot, and the record cache of the library stays consistent.
+        rng = random.Random(4)
+        library = Library_System(Persistent_Red_Black_Tree())
+        for bookID in range(1, CATALOG_SIZE + 1):
+            library.insert_book(bookID, f'"Book{bookID}"', '"Author"', '"Yes"')
+        readings = []
+        with concurrent.futures.ThreadPoolExecutor(4) as readers:
+            for step in range(4000):
+                bookID = rng.randrange(1, CATALOG_SIZE + 1)
+                kind = rng.random()
+                if kind < 0.3:
+                    line = f"BorrowBook({rng.randrange(1, 50)}, {bookID}, {rng.randrange(1, 5)})"
+                elif kind < 0.55:
+                    book = library.book_tree.get(bookID)
+                    patronID = book.borrowedBy if book is not None and book.borrowedBy is not None else 1
+                    line = f"ReturnBook({patronID}, {bookID})"
+                elif kind < 0.65:
+                    line = f"DeleteBook({bookID})"
+                elif kind < 0.75:
+                    line = f'InsertBook({bookID}, "Book{bookID}", "Author", "Yes")'
+                else:
+                    line = f"PrintBook({bookID})"
+                execute_command(library, line)
+                if step % 4 == 0:
+                    reader = library.snapshot()
+                    targets = [rng.randrange(1, CATALOG_SIZE + 1) for _ in range(20)]
+                    # What the snapshot holds now, rendered without the record cache
+                    expected = ["".join(f"{reader.render_book(book)}\n\n\n" if book is not None
+                                        else f"Book {target} not found in the library.\n\n\n"
+                                        for book in [reader.book_tree.get(target)])
+                                for target in targets]
+                    readings.append((expected, [readers.submit(command_response, reader, f"PrintBook({target})")
+                                                for target in targets]))
+        for expected, futures in readings:
+            self.assertEqual([future.result() for future in futures], expected)
+        rendered_books = library.rendered_books
+        self.assertLessEqual(len(rendered_books), RENDERED_BOOKS)
+        self.assertEqual(len(set(map(id, rendered_books))), len(rendered_books))
+        for book in rendered_books:
+            self.assertEqual(book.rendered, library.render_book(book))
+
+
+if __name__ == "__main__":
+    unittest.main()